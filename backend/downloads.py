@@ -0,0 +1,128 @@
+# backend/downloads.py
+"""
+Service de fichiers protégés après vérification des permissions :
+réponse en flux (jamais chargée en mémoire), requêtes Range (une plage) pour
+les reprises de téléchargement, validateurs ETag / Last-Modified avec 304,
+et délégation optionnelle au proxy (X-Accel-Redirect pour nginx, X-Sendfile
+pour Apache / lighttpd) selon le réglage PROTECTED_FILES_OFFLOAD.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat):
+    """ETag fort dérivé de la date de modification (ns) et de la taille"""
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def _parse_range(header, size):
+    """
+    (début, fin) inclusifs pour une plage unique, None si l'en-tête est absent,
+    invalide ou multiple (réponse complète), 'unsatisfiable' hors limites.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffixe : les N derniers octets
+        length = int(last)
+        # Aucun octet à renvoyer, y compris pour un fichier vide
+        if length == 0 or size == 0:
+            return 'unsatisfiable'
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and int(last_modified) <= date
+
+
+def _iter_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _offload_response(path):
+    mode = getattr(settings, 'PROTECTED_FILES_OFFLOAD', None)
+    if mode == 'x-accel-redirect':
+        relative = os.path.relpath(path, settings.MEDIA_ROOT)
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = getattr(settings, 'PROTECTED_FILES_INTERNAL_URL', '/protected-media/') \
+            + quote(relative.replace(os.sep, '/'))
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def serve_file(request, path, filename=None, as_attachment=True):
+    """Réponse HTTP pour le fichier `path` (déjà autorisé par l'appelant)"""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = file_etag(stat)
+    filename = filename or os.path.basename(path)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    # Requêtes conditionnelles : 304 / 412 avant tout accès au contenu
+    validators = HttpResponse()
+    validators['ETag'] = etag
+    validators['Last-Modified'] = http_date(stat.st_mtime)
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime),
+                                           response=validators)
+    if conditional is not validators:
+        return conditional
+
+    response = _offload_response(path)
+    if response is None:
+        byte_range = None
+        if _if_range_matches(request, etag, stat.st_mtime):
+            byte_range = _parse_range(request.META.get('HTTP_RANGE'), size)
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(_iter_range(path, start, end), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(path, 'rb'), as_attachment=as_attachment, filename=filename)
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
@@ -0,0 +1,163 @@
+# backend/events.py
+"""
+Publication / abonnement d'événements pour les flux temps réel (SSE).
+
+Le code synchrone (signaux, vues DRF) publie un message JSON sur un canal ;
+les vues asynchrones servies par ASGI s'y abonnent. Le courtier est choisi par
+EVENTS_BROKER (chemin pointé) avec EVENTS_BROKER_OPTIONS :
+
+- InProcessBroker (défaut) : diffusion en mémoire, limitée au processus ;
+  suffit avec un seul worker ASGI.
+- RedisBroker : diffusion Redis PUBLISH/SUBSCRIBE entre tous les workers
+  (paquet redis requis, option url).
+
+Un abonné trop lent (file pleine) reçoit l'événement OVERFLOW puis est
+déconnecté : le client recharge alors la ressource et se réabonne.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW = {'event': 'overflow', 'data': None}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class InProcessSubscription:
+    def __init__(self, broker, channel, queue_size):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, message):
+        """Appelé dans la boucle de l'abonné"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            # Place réservée au signal de débordement
+            self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    async def get(self, timeout=None):
+        """Prochain message, None si aucun n'arrive avant `timeout` secondes"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Diffusion en mémoire entre les threads et boucles d'un même processus"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Abonnement au canal ; à appeler depuis une boucle asyncio"""
+        subscription = InProcessSubscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, message):
+        """Diffuse le message ; sûr depuis n'importe quel thread"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Boucle fermée : l'abonné a disparu sans se désabonner
+                self.unsubscribe(subscription)
+
+
+class RedisSubscription:
+    def __init__(self, client, pubsub, channel):
+        self.client = client
+        self.pubsub = pubsub
+        self.channel = channel
+
+    async def get(self, timeout=None):
+        if not self.pubsub.subscribed:
+            await self.pubsub.subscribe(self.channel)
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    async def close(self):
+        await self.pubsub.unsubscribe(self.channel)
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisBroker:
+    """Diffusion entre processus via Redis PUBLISH / SUBSCRIBE"""
+
+    def __init__(self, url='redis://localhost:6379/0'):
+        import redis
+
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    def subscribe(self, channel):
+        from redis import asyncio as aioredis
+
+        client = aioredis.from_url(self.url)
+        return RedisSubscription(client, client.pubsub(), channel)
+
+    def publish(self, channel, message):
+        self._client.publish(channel, json.dumps(message, cls=JSONEncoder))
+
+
+def get_broker():
+    """Courtier configuré (instance partagée par le processus)"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_class = import_string(getattr(settings, 'EVENTS_BROKER', 'backend.events.InProcessBroker'))
+                _broker = broker_class(**getattr(settings, 'EVENTS_BROKER_OPTIONS', {}))
+    return _broker
+
+
+def publish(channel, event, data):
+    """Publie {'event', 'data'} après la validation de la transaction courante"""
+    message = json.loads(json.dumps({'event': event, 'data': data}, cls=JSONEncoder))
+
+    def send():
+        try:
+            get_broker().publish(channel, message)
+        except Exception:
+            # Un courtier indisponible ne doit pas faire échouer l'écriture
+            logger.exception("Échec de publication sur %s", channel)
+
+    transaction.on_commit(send)
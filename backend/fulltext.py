@@ -0,0 +1,219 @@
+# backend/fulltext.py
+"""
+Index plein texte d'une table, partagé par signalement/search.py et
+projects/search.py.
+
+SQLite : table FTS5 à contenu externe <table>_fts, synchronisée par triggers,
+avec repliement des accents (unicode61 remove_diacritics) et recherche par
+préfixe ; pertinence par bm25.
+PostgreSQL : colonne search_vector (tsvector) indexée en GIN, alimentée par
+trigger avec une configuration française (racinisation) combinée à unaccent ;
+pertinence par ts_rank_cd.
+Les autres moteurs n'ont pas d'index : l'appelant se rabat sur icontains.
+
+Chaque application déclare son FullTextIndex (table, colonnes, préfixe des
+triggers) et garde ses annotations propres (extraits, tri).
+"""
+import re
+
+from django.db import connection as default_connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+PG_CONFIG = 'fr_unaccent'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Configuration française + unaccent, commune à tous les index
+POSTGRES_CONFIG_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{PG_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {PG_CONFIG} (COPY = french);
+            ALTER TEXT SEARCH CONFIGURATION {PG_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem;
+        END IF;
+    END
+    $$""",
+]
+
+# Poids tsvector des colonnes, dans l'ordre de déclaration
+PG_WEIGHTS = 'ABCD'
+
+
+def fts5_query(text):
+    """Transforme la saisie libre en requête FTS5 : chaque mot devient un préfixe requis"""
+    words = WORD_RE.findall(text)
+    return ' '.join('"%s"*' % word.replace('"', '') for word in words)
+
+
+def is_indexed(connection=None):
+    """Le moteur dispose-t-il d'un index plein texte ?"""
+    return (connection or default_connection).vendor in ('sqlite', 'postgresql')
+
+
+class FullTextIndex:
+    """
+    Index plein texte sur `columns` de `table`. `prefix` nomme les triggers,
+    la fonction et l'index GIN ; `bm25_weights` pondère les colonnes sous SQLite
+    (la première, la plus importante, pèse le plus par défaut).
+    """
+
+    def __init__(self, table, columns, prefix, bm25_weights=None, config=PG_CONFIG):
+        self.table = table
+        self.columns = tuple(columns)
+        self.prefix = prefix
+        self.fts_table = f'{table}_fts'
+        self.bm25_weights = bm25_weights or (10.0,) + (1.0,) * (len(self.columns) - 1)
+        self.config = config
+
+    # Schéma
+
+    def _tsvector(self, row=''):
+        return ' ||\n            '.join(
+            f"setweight(to_tsvector('{self.config}', coalesce({row}{column}, '')), '{weight}')"
+            for column, weight in zip(self.columns, PG_WEIGHTS)
+        )
+
+    def sqlite_triggers(self):
+        columns = ', '.join(self.columns)
+        new_values = ', '.join(f'new.{column}' for column in self.columns)
+        old_values = ', '.join(f'old.{column}' for column in self.columns)
+        table, fts = self.table, self.fts_table
+        return {
+            f'{self.prefix}_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {self.prefix}_fts_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+            f'{self.prefix}_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {self.prefix}_fts_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END""",
+            f'{self.prefix}_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {self.prefix}_fts_au AFTER UPDATE OF {columns} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+        }
+
+    def postgres_setup(self):
+        function = f'{self.prefix}_search_update'
+        return [
+            *POSTGRES_CONFIG_SETUP,
+            f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS search_vector tsvector",
+            f"CREATE INDEX IF NOT EXISTS {self.prefix}_search_gin ON {self.table} USING GIN (search_vector)",
+            f"""
+    CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            {self._tsvector('NEW.')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+            f"DROP TRIGGER IF EXISTS {function} ON {self.table}",
+            f"""
+    CREATE TRIGGER {function}
+        BEFORE INSERT OR UPDATE OF {', '.join(self.columns)} ON {self.table}
+        FOR EACH ROW EXECUTE FUNCTION {function}()""",
+            f"""
+    UPDATE {self.table} SET search_vector =
+            {self._tsvector()}
+    WHERE search_vector IS NULL""",
+        ]
+
+    def install(self, connection=None):
+        """
+        Crée (ou complète) l'index. Idempotent : appelé par la migration et
+        après chaque migrate, car la reconstruction d'une table par le schema
+        editor SQLite supprime les triggers qui y sont attachés.
+        """
+        connection = connection or default_connection
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                triggers = self.sqlite_triggers()
+                names = [self.fts_table, *triggers]
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s)"
+                    % ', '.join(['%s'] * len(names)),
+                    names,
+                )
+                existing = {row[0] for row in cursor.fetchall()}
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5("
+                    f"{', '.join(self.columns)}, content='{self.table}', content_rowid='id', "
+                    f"tokenize='unicode61 remove_diacritics 2')"
+                )
+                for sql in triggers.values():
+                    cursor.execute(sql)
+                if not existing.issuperset(names):
+                    # Index absent ou triggers perdus : resynchronisation complète
+                    cursor.execute(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')")
+            elif connection.vendor == 'postgresql':
+                for sql in self.postgres_setup():
+                    cursor.execute(sql)
+
+    def drop(self, connection=None):
+        connection = connection or default_connection
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                for name in self.sqlite_triggers():
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(f"DROP TABLE IF EXISTS {self.fts_table}")
+            elif connection.vendor == 'postgresql':
+                function = f'{self.prefix}_search_update'
+                cursor.execute(f"DROP TRIGGER IF EXISTS {function} ON {self.table}")
+                cursor.execute(f"DROP FUNCTION IF EXISTS {function}()")
+                cursor.execute(f"ALTER TABLE {self.table} DROP COLUMN IF EXISTS search_vector")
+
+    # Requêtes
+
+    @property
+    def tsquery(self):
+        """Requête PostgreSQL construite depuis la saisie (un paramètre %s)"""
+        return f"websearch_to_tsquery('{self.config}', %s)"
+
+    def fts_expression(self, sql, params, match, output_field):
+        """Valeur calculée dans la table FTS5 pour la ligne courante (SQLite)"""
+        return RawSQL(
+            f"SELECT {sql} FROM {self.fts_table} WHERE {self.fts_table} MATCH %s AND rowid = {self.table}.id",
+            [*params, match], output_field=output_field,
+        )
+
+    def icontains(self, text):
+        """Repli sans index : chaque mot doit figurer dans l'une des colonnes"""
+        condition = Q()
+        for word in WORD_RE.findall(text):
+            word_condition = Q()
+            for column in self.columns:
+                word_condition |= Q(**{f'{column}__icontains': word})
+            condition &= word_condition
+        return condition
+
+    def apply(self, queryset, text):
+        """
+        Restreint le queryset aux lignes correspondant à `text` (non vide) et
+        annote 'search_rank' (plus grand = plus pertinent). Réservé aux moteurs
+        indexés (voir is_indexed).
+        """
+        if default_connection.vendor == 'sqlite':
+            match = fts5_query(text)
+            if not match:
+                # Aucun mot : rien ne correspond, search_rank reste disponible pour le tri
+                return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+            weights = ', '.join(str(weight) for weight in self.bm25_weights)
+            return queryset.filter(id__in=RawSQL(
+                f"SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH %s", [match]
+            )).annotate(
+                # bm25 : plus petit = plus pertinent
+                search_rank=self.fts_expression(f"-bm25({self.fts_table}, {weights})", [], match, FloatField()),
+            )
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT id FROM {self.table} WHERE search_vector @@ {self.tsquery}", [text]
+        )).annotate(search_rank=RawSQL(
+            # ts_rank_cd renvoie un real : converti en double precision pour que la
+            # valeur stockée dans le curseur (JSON) soit comparée à l'identique
+            f"ts_rank_cd({self.table}.search_vector, {self.tsquery})::float8",
+            [text], output_field=FloatField(),
+        ))
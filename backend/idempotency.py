@@ -0,0 +1,162 @@
+# backend/idempotency.py
+"""
+Prise en charge de l'en-tête Idempotency-Key sur les endpoints de création.
+
+La première requête portant une clé est exécutée normalement et sa réponse
+(succès uniquement) est conservée dans le cache IDEMPOTENCY_CACHE pendant
+IDEMPOTENCY_TTL secondes. Une nouvelle tentative avec la même clé, par le
+même utilisateur et sur le même endpoint, rejoue la réponse sans refaire
+l'écriture. Les doublons concurrents sont sérialisés par un verrou cache.add :
+ils attendent la fin de la première requête, puis rejouent sa réponse.
+L'empreinte du corps est conservée avec la réponse : la même clé réutilisée
+avec un autre contenu est refusée (422) au lieu de rejouer une réponse qui ne
+lui correspond pas.
+
+Le cache doit être partagé entre les processus (Redis, Memcached, base de
+données) : avec LocMemCache, chaque worker a ses propres clés et verrous.
+"""
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+# Durée de vie du verrou : au-delà, une requête bloquée est considérée comme perdue
+LOCK_TIMEOUT = 60
+# Attente maximale d'un doublon concurrent avant de répondre 409
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.1
+
+
+def _cache():
+    return caches[getattr(settings, 'IDEMPOTENCY_CACHE', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'IDEMPOTENCY_TTL', 24 * 3600)
+
+
+def _cache_key(request, key):
+    user_id = getattr(request.user, 'pk', None) or 'anonyme'
+    digest = hashlib.sha256(f'{user_id}:{request.method}:{request.path}:{key}'.encode()).hexdigest()
+    return f'idempotency:{digest}'
+
+
+def _fingerprint(request):
+    """
+    SHA-256 du corps analysé, indépendant de l'ordre des champs ; les fichiers
+    envoyés sont lus par blocs puis rembobinés pour la vue.
+    """
+    digest = hashlib.sha256()
+    data = request.data
+    if hasattr(data, 'lists'):
+        # Formulaire ou multipart : champs simples puis fichiers
+        fields = sorted(
+            (name, value) for name, values in data.lists() for value in values
+            if not hasattr(value, 'chunks')
+        )
+        digest.update(json.dumps(fields, cls=JSONEncoder).encode())
+        for name in sorted(request.FILES):
+            for uploaded in request.FILES.getlist(name):
+                digest.update(f'{name}:{uploaded.name}:{uploaded.size}'.encode())
+                for chunk in uploaded.chunks():
+                    digest.update(chunk)
+                uploaded.seek(0)
+    else:
+        digest.update(json.dumps(data, sort_keys=True, cls=JSONEncoder).encode())
+    return digest.hexdigest()
+
+
+def _snapshot(response, fingerprint):
+    """Forme compacte et sérialisable de la réponse"""
+    if isinstance(response, Response):
+        return {
+            'status': response.status_code,
+            'data': json.loads(json.dumps(response.data, cls=JSONEncoder)),
+            'location': response.get('Location'),
+            'fingerprint': fingerprint,
+        }
+    return {
+        'status': response.status_code,
+        'content': response.content,
+        'content_type': response.get('Content-Type'),
+        'location': response.get('Location'),
+        'fingerprint': fingerprint,
+    }
+
+
+def _replay(snapshot, fingerprint):
+    if snapshot.get('fingerprint') != fingerprint:
+        return Response({'error': f'Cette clé {HEADER} a déjà été utilisée avec un autre contenu'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if 'data' in snapshot:
+        response = Response(snapshot['data'], status=snapshot['status'])
+    else:
+        response = HttpResponse(snapshot['content'], status=snapshot['status'],
+                                content_type=snapshot['content_type'])
+    if snapshot.get('location'):
+        response['Location'] = snapshot['location']
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Décorateur de vue (fonction DRF placée sous @api_view, ou méthode d'APIView)
+    honorant l'en-tête Idempotency-Key.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        request = args[0] if hasattr(args[0], 'method') else args[1]
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'En-tête {HEADER} trop long (au plus {MAX_KEY_LENGTH} caractères)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = _fingerprint(request)
+        cache = _cache()
+        cache_key = _cache_key(request, key)
+        lock_key = f'{cache_key}:verrou'
+
+        snapshot = cache.get(cache_key)
+        if snapshot is not None:
+            return _replay(snapshot, fingerprint)
+
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            # Même clé en cours de traitement : on attend son résultat
+            deadline = time.monotonic() + WAIT_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                snapshot = cache.get(cache_key)
+                if snapshot is not None:
+                    return _replay(snapshot, fingerprint)
+                if cache.add(lock_key, 1, LOCK_TIMEOUT):
+                    # La première requête a échoué sans réponse conservée : on la rejoue
+                    break
+            else:
+                response = Response({'error': 'Une requête avec la même clé d\'idempotence est en cours'},
+                                    status=status.HTTP_409_CONFLICT)
+                response['Retry-After'] = str(WAIT_TIMEOUT)
+                return response
+
+        try:
+            response = view(*args, **kwargs)
+            # Seuls les succès sont conservés : une erreur peut être corrigée et retentée
+            if 200 <= response.status_code < 300:
+                cache.set(cache_key, _snapshot(response, fingerprint), _ttl())
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from datetime import timedelta
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from decouple import config
 from dotenv import load_dotenv
 
@@ -88,6 +89,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+# Flux temps réel (SSE) : servis uniquement par l'application ASGI (ex. uvicorn backend.asgi:application)
+ASGI_APPLICATION = 'backend.asgi.application'
 TIME_ZONE = 'Africa/Douala'
 
 
@@ -152,6 +155,12 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Fichiers protégés (voir backend/downloads.py) : None = servis par Django en flux,
+# 'x-accel-redirect' (nginx, location internal sur PROTECTED_FILES_INTERNAL_URL)
+# ou 'x-sendfile' (Apache mod_xsendfile / lighttpd)
+PROTECTED_FILES_OFFLOAD = os.environ.get('PROTECTED_FILES_OFFLOAD') or None
+PROTECTED_FILES_INTERNAL_URL = os.environ.get('PROTECTED_FILES_INTERNAL_URL', '/protected-media/')
+
 # Configuration des fichiers statiques
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
@@ -159,10 +168,26 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 # Ajoutez ces headers pour CORS si nécessaire
 CORS_ALLOW_ALL_ORIGINS = True  # Pour le développement uniquement
 CORS_ALLOW_CREDENTIALS = True
+# En-tête des nouvelles tentatives des clients mobiles (voir backend/idempotency.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'upload-offset', 'x-chunk-checksum')
+CORS_EXPOSE_HEADERS = ['idempotent-replayed', 'upload-offset', 'accept-ranges', 'content-range', 'content-disposition', 'etag', 'last-modified']
 
 # Configuration des types de fichiers autorisés
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024   # 10MB
+
+# Envoi par morceaux des fichiers de projets (voir projects/uploads.py).
+# La finalisation recopie le fichier reçu dans le stockage (MEDIA_ROOT) ; le
+# répertoire temporaire peut donc être sur un autre volume, mais doit avoir
+# la place de PROJECT_UPLOAD_MAX_SIZE octets par envoi en cours.
+PROJECT_UPLOAD_TEMP_DIR = os.environ.get('PROJECT_UPLOAD_TEMP_DIR', os.path.join(BASE_DIR, 'uploads_tmp'))
+PROJECT_UPLOAD_MAX_SIZE = 500 * 1024 * 1024       # 500MB
+PROJECT_UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 * 1024   # 8MB par morceau
+PROJECT_UPLOAD_TTL = 24 * 3600
+
+# Aperçus des fichiers de projets (voir projects/previews.py) ; le rendu des PDF
+# nécessite PyMuPDF (paquet pymupdf), sans quoi seules les métadonnées sont enregistrées
+PROJECT_PREVIEW_SIZE = 480
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
@@ -200,6 +225,27 @@ EMAIL_HOST_PASSWORD   = os.environ.get('EMAIL_HOST_PASSWORD', 'oejj qvgs htph cm
 DEFAULT_FROM_EMAIL    = EMAIL_HOST_USER
 
 
+# Cache partagé entre processus en production (ex. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'ecovert'),
+    }
+}
+
+# Réponses rejouées pour l'en-tête Idempotency-Key (voir backend/idempotency.py).
+# Le cache 'default' est un LocMemCache propre à chaque processus : avec
+# plusieurs workers, définir CACHE_BACKEND / CACHE_LOCATION vers un cache
+# partagé (Redis, Memcached, base de données), sans quoi un doublon traité par
+# un autre worker n'est ni rejoué ni verrouillé.
+IDEMPOTENCY_CACHE = 'default'
+IDEMPOTENCY_TTL = 24 * 3600
+
+# Courtier des événements temps réel (voir backend/events.py). Avec plusieurs
+# workers ASGI : EVENTS_BROKER=backend.events.RedisBroker et EVENTS_BROKER_URL
+EVENTS_BROKER = os.environ.get('EVENTS_BROKER', 'backend.events.InProcessBroker')
+EVENTS_BROKER_OPTIONS = {'url': os.environ['EVENTS_BROKER_URL']} if os.environ.get('EVENTS_BROKER_URL') else {}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -228,3 +274,18 @@ SIMPLE_JWT = {
 
 # SESSION_COOKIE_AGE =1800
 AUTHENTICATION_BACKENDS = ['accounts.backends.EmailBackend']
+
+# Score de priorité des signalements ouverts (voir signalement/priority.py)
+SIGNALEMENT_PRIORITE = {
+    'poids_type': {'pollution': 30, 'dechets': 20, 'climat': 10},
+    'poids_age_par_jour': 2,
+    'age_max_jours': 30,
+    'poids_voisin': 5,
+    'voisins_max': 10,
+    'rayon_voisins_m': 500,
+    'poids_zone_risque': 25,
+}
+
+# Marge de relecture (secondes) du flux /signalements/changes/ (voir signalement/sync.py) ;
+# à porter au-delà de la durée de la plus longue transaction d'écriture
+SIGNALEMENT_SYNC_SAFETY_LAG = 60
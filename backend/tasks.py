@@ -0,0 +1,48 @@
+# backend/tasks.py
+"""
+Exécution de traitements hors du thread de la requête (réduction des photos,
+aperçus...). Un pool de threads par processus suffit pour ces tâches courtes
+et idempotentes ; une tâche perdue à l'arrêt du processus est rejouée par
+la commande de rattrapage correspondante (process_pending_photos,
+build_project_previews).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+            thread_name_prefix='ecovert-tasks',
+        )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Échec de la tâche %s", getattr(func, '__name__', func))
+        raise
+    finally:
+        # Chaque thread du pool ouvre sa propre connexion : on la libère
+        close_old_connections()
+
+
+def submit(func, *args, **kwargs):
+    """Exécute func(*args, **kwargs) dans le pool ; retourne un Future"""
+    return _get_executor().submit(_run, func, args, kwargs)
+
+
+def submit_on_commit(func, *args, **kwargs):
+    """Planifie la tâche après la validation de la transaction courante"""
+    transaction.on_commit(lambda: submit(func, *args, **kwargs))
@@ -98,14 +98,35 @@ class CommuneViewSet(viewsets.ModelViewSet):
         from signalement.models import Signalement
         from signalement.serializers import SignalementListSerializer
 
-        signalements = Signalement.objects.filter(commune=commune)
+        signalements = Signalement.objects.filter(commune=commune).select_related('utilisateur')
         serializer = SignalementListSerializer(signalements, many=True)
+        data = serializer.data
         
         return Response({
-            'count': signalements.count(),
-            'results': serializer.data
+            'count': len(data),
+            'results': data
         })
 
+    @action(detail=True, methods=['get'])
+    def statistiques(self, request, pk=None):
+        """
+        Statistiques des signalements d'une commune, lues depuis les compteurs
+        dénormalisés (coût constant quel que soit le nombre de signalements).
+        """
+        commune = self.get_object()
+
+        if request.user.role == 'ctd' and request.user.commune != commune:
+            return Response(
+                {'detail': 'Accès non autorisé à cette commune'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        # Import ici pour éviter les imports circulaires
+        from signalement.counters import read_cross_tab
+        from signalement.stats import format_statistics
+
+        return Response(format_statistics(read_cross_tab(commune)))
+
     def create(self, request, *args, **kwargs):
         """
         Crée une nouvelle commune.
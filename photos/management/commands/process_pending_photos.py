@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from photos.models import Photo
+from photos.processing import process_photo
+
+
+class Command(BaseCommand):
+    help = "Normalise les photos non encore traitées (tâches perdues, photos antérieures au traitement)"
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        pending = Photo.objects.filter(processed=False).order_by('id').values_list('id', flat=True)
+        for photo_id in pending.iterator():
+            try:
+                process_photo(photo_id)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Photo {photo_id} : {e}")
+            else:
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(f"{processed} photo(s) traitée(s), {failed} échec(s)"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='processed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -6,3 +6,5 @@ class Photo(models.Model):
     latitude = models.FloatField()
     longitude = models.FloatField()
     date_uploaded = models.DateTimeField(auto_now_add=True)
+    # Image normalisée (orientation, taille, métadonnées) par processing.process_photo
+    processed = models.BooleanField(default=False, editable=False)
@@ -0,0 +1,74 @@
+#photos/processing.py
+import io
+import os
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageOps
+
+from .models import Photo
+
+# Plus grand côté conservé après réduction, en pixels
+MAX_DIMENSION = 2048
+JPEG_QUALITY = 85
+
+
+def _encode(image):
+    """
+    Réécrit l'image dans son format d'origine (JPEG si Pillow ne sait pas
+    l'écrire) : le nom du fichier, donc l'URL déjà renvoyée, ne change pas.
+    """
+    Image.init()
+    image_format = image.format if image.format in Image.SAVE else 'JPEG'
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((MAX_DIMENSION, MAX_DIMENSION))
+    options = {}
+    if image_format == 'JPEG':
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        options = {'quality': JPEG_QUALITY, 'optimize': True}
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def _replace(storage, name, content):
+    """
+    Remplace le contenu du fichier `name` ; retourne le nom final.
+    La version traitée est d'abord enregistrée à part : l'original n'est
+    jamais supprimé avant qu'une copie complète existe.
+    """
+    root, extension = os.path.splitext(name)
+    temp_name = storage.save(f'{root}.{uuid.uuid4().hex[:8]}{extension}', ContentFile(content))
+    if isinstance(storage, FileSystemStorage):
+        # Stockage local : remplacement atomique
+        os.replace(storage.path(temp_name), storage.path(name))
+        return name
+    storage.delete(name)
+    try:
+        # Le stockage peut retourner un autre nom si `name` a été recréé entre-temps
+        new_name = storage.save(name, ContentFile(content))
+    except Exception:
+        # La copie traitée remplace l'original supprimé
+        return temp_name
+    storage.delete(temp_name)
+    return new_name
+
+
+def process_photo(photo_id):
+    """
+    Normalise l'image envoyée : orientation EXIF appliquée, métadonnées
+    (dont la position) retirées et réduction à MAX_DIMENSION.
+    Exécuté hors du thread de la requête (voir backend/tasks.py).
+    """
+    photo = Photo.objects.filter(pk=photo_id, processed=False).first()
+    if photo is None or not photo.image:
+        return
+
+    with photo.image.open('rb') as source:
+        content = _encode(Image.open(source))
+
+    new_name = _replace(photo.image.storage, photo.image.name, content)
+    # update() : ne pas écraser une modification concurrente des autres champs
+    Photo.objects.filter(pk=photo.pk).update(image=new_name, processed=True)
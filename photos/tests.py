@@ -1,3 +1,165 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.storage import InMemoryStorage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+from .models import Photo
+from .processing import MAX_DIMENSION, process_photo
+
+
+def image_bytes(image_format, size=(3000, 1500), orientation=None):
+    image = Image.new('RGB', size, 'green')
+    buffer = io.BytesIO()
+    options = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        # Position GPS factice, à retirer par le traitement
+        exif[0x8825] = {1: 'N', 2: (4.0, 0.0, 0.0)}
+        options['exif'] = exif
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+class ProcessPhotoTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def make_photo(self, name, content):
+        return Photo.objects.create(image=SimpleUploadedFile(name, content), latitude=5.47, longitude=10.42)
+
+    def test_jpeg_is_oriented_stripped_and_resized_in_place(self):
+        photo = self.make_photo('terrain.jpg', image_bytes('JPEG', orientation=6))
+        name = photo.image.name
+        process_photo(photo.pk)
+
+        photo.refresh_from_db()
+        self.assertTrue(photo.processed)
+        self.assertEqual(photo.image.name, name)
+        with photo.image.open('rb') as f:
+            image = Image.open(f)
+            # Orientation 6 : rotation de 90°, donc portrait
+            self.assertEqual(image.size, (MAX_DIMENSION // 2, MAX_DIMENSION))
+            self.assertNotIn(0x8825, image.getexif())
+
+    def test_other_formats_keep_their_name(self):
+        for name, image_format in (('carte.gif', 'GIF'), ('plan.bmp', 'BMP'), ('scan.png', 'PNG')):
+            with self.subTest(image_format=image_format):
+                photo = self.make_photo(name, image_bytes(image_format))
+                stored = photo.image.name
+                process_photo(photo.pk)
+                photo.refresh_from_db()
+                self.assertEqual(photo.image.name, stored)
+                with photo.image.open('rb') as f:
+                    image = Image.open(f)
+                    self.assertEqual(image.format, image_format)
+                    self.assertEqual(max(image.size), MAX_DIMENSION)
+
+    def test_processed_photo_is_skipped(self):
+        photo = self.make_photo('terrain.jpg', image_bytes('JPEG'))
+        Photo.objects.filter(pk=photo.pk).update(processed=True)
+        process_photo(photo.pk)
+        with photo.image.open('rb') as f:
+            self.assertEqual(Image.open(f).size, (3000, 1500))
+
+    def test_pending_photos_are_caught_up(self):
+        pending = self.make_photo('terrain.jpg', image_bytes('JPEG'))
+        broken = self.make_photo('casse.jpg', b'pas une image')
+        done = self.make_photo('fait.jpg', image_bytes('JPEG'))
+        Photo.objects.filter(pk=done.pk).update(processed=True)
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command('process_pending_photos', stdout=out, stderr=err)
+        self.assertIn('1 photo(s) traitée(s), 1 échec(s)', out.getvalue())
+        self.assertIn(f'Photo {broken.pk}', err.getvalue())
+        self.assertEqual(set(Photo.objects.filter(processed=False).values_list('id', flat=True)), {broken.pk})
+        with done.image.open('rb') as f:
+            self.assertEqual(Image.open(f).size, (3000, 1500))
+        pending.refresh_from_db()
+        with pending.image.open('rb') as f:
+            self.assertEqual(max(Image.open(f).size), MAX_DIMENSION)
+
+    def test_remote_storage_replaces_without_losing_the_file(self):
+        storage = InMemoryStorage()
+        with mock.patch.object(Photo._meta.get_field('image'), 'storage', storage):
+            photo = self.make_photo('terrain.jpg', image_bytes('JPEG'))
+            name = photo.image.name
+            process_photo(photo.pk)
+            photo.refresh_from_db()
+            self.assertEqual(photo.image.name, name)
+            self.assertEqual(storage.listdir('photos')[1], [name.split('/')[-1]])
+
+    def test_failed_rewrite_keeps_the_processed_copy(self):
+        storage = InMemoryStorage()
+        with mock.patch.object(Photo._meta.get_field('image'), 'storage', storage):
+            photo = self.make_photo('terrain.jpg', image_bytes('JPEG'))
+            save = storage.save
+            calls = []
+
+            def flaky_save(name, content, **kwargs):
+                calls.append(name)
+                if len(calls) > 1:
+                    raise OSError('stockage indisponible')
+                return save(name, content, **kwargs)
+
+            with mock.patch.object(storage, 'save', flaky_save):
+                process_photo(photo.pk)
+            photo.refresh_from_db()
+            self.assertTrue(photo.processed)
+            self.assertTrue(storage.exists(photo.image.name))
+            with photo.image.open('rb') as f:
+                self.assertEqual(max(Image.open(f).size), MAX_DIMENSION)
+
+
+def run_now(func, *args, **kwargs):
+    """Remplace backend.tasks.submit : la tâche s'exécute dans le thread du test"""
+    return func(*args, **kwargs)
+
+
+class UploadPhotoTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        user = User.objects.create_user(
+            email='citoyen@example.com', password='secret', nom='Nom', prenom='Prénom',
+            role='citoyen', is_active=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_uploaded_photo_is_normalized_after_commit(self):
+        upload = SimpleUploadedFile('terrain.jpg', image_bytes('JPEG', orientation=6), content_type='image/jpeg')
+        with mock.patch('backend.tasks.submit', run_now), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/photos/upload-photo/',
+                                        {'image': upload, 'latitude': 5.47, 'longitude': 10.42})
+        self.assertEqual(response.status_code, 201)
+
+        photo = Photo.objects.get(pk=response.json()['id'])
+        self.assertTrue(photo.processed)
+        self.assertTrue(response.json()['image'].endswith(photo.image.name))
+        with photo.image.open('rb') as f:
+            image = Image.open(f)
+            self.assertEqual(max(image.size), MAX_DIMENSION)
+            self.assertNotIn(0x8825, image.getexif())
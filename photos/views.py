@@ -7,16 +7,28 @@ from .models import Photo
 from .serializers import PhotoSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from backend.idempotency import idempotent
+from backend.tasks import submit_on_commit
+from .processing import process_photo
 
 # POST : Envoie une photo avec lat/lon
 class UploadPhotoView(APIView):
+    """
+    Enregistre une photo. Comme pour create/with-photo/, l'image est ensuite
+    normalisée hors de la requête (voir processing.process_photo) : orientation
+    EXIF appliquée, métadonnées dont la position GPS retirées, réduction à
+    MAX_DIMENSION. Le nom du fichier, donc l'URL renvoyée, est conservé.
+    """
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
 
+    @idempotent
     def post(self, request):
         serializer = PhotoSerializer(data=request.data)
         if serializer.is_valid():
             photo = serializer.save()
+            # Réduction et nettoyage de l'image hors du thread de la requête
+            submit_on_commit(process_photo, photo.id)
             # Retourne les données du serializer, notamment l'id
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         print("Erreurs serializer :", serializer.errors)
@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using='default', **kwargs):
+    from django.db import connections
+    from .search import install_search_index
+    install_search_index(connections[using])
+
+
+class ProjectsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'projects'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Les triggers de l'index plein texte sont recréés après chaque migrate
+        post_migrate.connect(ensure_search_index, sender=self)
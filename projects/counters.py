@@ -0,0 +1,61 @@
+#projects/counters.py
+"""
+Compteurs dénormalisés de Project (comments_count, accountability_count).
+Les lignes créées par bulk_create ou supprimées par queryset.delete() en
+dehors des signaux doivent être suivies d'un appel explicite à adjust_counter
+ou à reconcile_counters.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Accountability, Comment, Project
+
+# Champ compteur de Project -> modèle enfant compté
+COUNTED = {
+    'comments_count': Comment,
+    'accountability_count': Accountability,
+}
+
+
+def adjust_counter(project_id, field, delta):
+    """
+    Incrémente (ou décrémente) atomiquement le compteur d'un projet avec F().
+    Le résultat est borné à 0 : un compteur déjà faux ne viole pas la contrainte
+    du PositiveIntegerField (reconcile_counters le corrige).
+    """
+    if delta:
+        Project.objects.filter(pk=project_id).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def compute_counts():
+    """Valeurs attendues {(project_id, champ): total} à partir des tables enfants"""
+    expected = {}
+    for field, model in COUNTED.items():
+        rows = model.objects.order_by().values('project_id').annotate(total=Count('pk'))
+        for row in rows.iterator():
+            expected[(row['project_id'], field)] = row['total']
+    return expected
+
+
+def verify_counters():
+    """Écarts {(project_id, champ): (attendu, stocké)} entre compteurs et tables enfants"""
+    expected = compute_counts()
+    differences = {}
+    stored_rows = Project.objects.order_by().values_list('id', *COUNTED)
+    for row in stored_rows.iterator():
+        project_id, stored = row[0], dict(zip(COUNTED, row[1:]))
+        for field, value in stored.items():
+            wanted = expected.get((project_id, field), 0)
+            if value != wanted:
+                differences[(project_id, field)] = (wanted, value)
+    return differences
+
+
+def reconcile_counters():
+    """Corrige les compteurs incohérents ; retourne les écarts corrigés"""
+    with transaction.atomic():
+        differences = verify_counters()
+        for (project_id, field), (expected, _stored) in differences.items():
+            Project.objects.filter(pk=project_id).update(**{field: expected})
+    return differences
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from projects.models import Project
+from projects.previews import generate_preview
+
+
+class Command(BaseCommand):
+    help = "Génère les aperçus manquants ou périmés des fichiers de projets"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Régénère tous les aperçus")
+        parser.add_argument('--retry-failed', action='store_true', help="Relance les aperçus en échec")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.exclude(file='').exclude(file__isnull=True)
+        if not options['force']:
+            stale = Q(preview__isnull=True) | ~Q(preview__source_name=F('file'))
+            if options['retry_failed']:
+                stale |= Q(preview__status='FAILED')
+            projects = projects.filter(stale)
+
+        counts = {}
+        for project_id in projects.order_by('id').values_list('id', flat=True).iterator():
+            preview = generate_preview(project_id)
+            if preview is not None:
+                counts[preview.status] = counts.get(preview.status, 0) + 1
+
+        summary = ', '.join(f"{status} : {total}" for status, total in sorted(counts.items())) or 'aucun'
+        self.stdout.write(self.style.SUCCESS(f"Aperçus générés ({summary})"))
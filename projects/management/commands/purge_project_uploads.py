@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from projects.uploads import purge_uploads
+
+
+class Command(BaseCommand):
+    help = "Supprime les sessions d'envoi de fichiers expirées et leurs fichiers temporaires"
+
+    def handle(self, *args, **options):
+        purged = purge_uploads()
+        self.stdout.write(self.style.SUCCESS(f"{purged} session(s) d'envoi supprimée(s)"))
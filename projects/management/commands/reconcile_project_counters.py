@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.counters import reconcile_counters, verify_counters
+
+
+class Command(BaseCommand):
+    help = "Vérifie les compteurs de commentaires et de demandes de comptes des projets, puis corrige les écarts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Vérifie seulement les compteurs sans les corriger",
+        )
+
+    def handle(self, *args, **options):
+        differences = verify_counters() if options['check'] else reconcile_counters()
+        for (project_id, field), (expected, stored) in sorted(differences.items()):
+            self.stderr.write(f"projet={project_id} {field} : attendu {expected}, stocké {stored}")
+
+        if options['check'] and differences:
+            raise CommandError(f"{len(differences)} compteur(s) incohérent(s)")
+        if differences:
+            self.stdout.write(self.style.SUCCESS(f"{len(differences)} compteur(s) corrigé(s)"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Compteurs cohérents"))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 04:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communes', '0003_commune_latitude_commune_longitude'),
+        ('projects', '0004_comment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['commune', '-created_at', '-id'], name='project_commune_created_idx'),
+        ),
+    ]
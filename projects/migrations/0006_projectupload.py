@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-17 04:58
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_project_commune_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Nom du fichier')),
+                ('size', models.BigIntegerField(verbose_name='Taille totale (octets)')),
+                ('checksum', models.CharField(blank=True, max_length=64, verbose_name='SHA-256 attendu du fichier complet')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Octets reçus')),
+                ('status', models.CharField(choices=[('ACTIVE', 'En cours'), ('COMPLETED', 'Terminée'), ('ABORTED', 'Abandonnée')], default='ACTIVE', max_length=20, verbose_name="État de l'envoi")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière modification')),
+                ('expires_at', models.DateTimeField(verbose_name='Expiration')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_uploads', to=settings.AUTH_USER_MODEL, verbose_name='Envoyé par')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='projects.project', verbose_name='Projet')),
+            ],
+            options={
+                'verbose_name': 'Envoi de fichier',
+                'verbose_name_plural': 'Envois de fichiers',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='project_upload_expiry_idx')],
+            },
+        ),
+    ]
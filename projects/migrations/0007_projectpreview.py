@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 04:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_projectupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectPreview',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='preview', serialize=False, to='projects.project', verbose_name='Projet')),
+                ('source_name', models.CharField(max_length=255, verbose_name='Fichier source')),
+                ('image', models.ImageField(blank=True, null=True, upload_to='projects/previews/', verbose_name='Aperçu')),
+                ('status', models.CharField(choices=[('READY', 'Disponible'), ('UNSUPPORTED', 'Format sans aperçu'), ('FAILED', 'Échec')], max_length=20, verbose_name="État de l'aperçu")),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='Type MIME')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Taille (octets)')),
+                ('page_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Nombre de pages')),
+                ('width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Largeur (px)')),
+                ('height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Hauteur (px)')),
+                ('error', models.TextField(blank=True, verbose_name='Erreur')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière génération')),
+            ],
+            options={
+                'verbose_name': 'Aperçu de fichier',
+                'verbose_name_plural': 'Aperçus de fichiers',
+            },
+        ),
+    ]
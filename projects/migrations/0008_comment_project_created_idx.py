@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 05:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_projectpreview'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['project', '-created_at', '-id'], name='comment_project_created_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-17 05:01
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    counted = {
+        'comments_count': apps.get_model('projects', 'Comment'),
+        'accountability_count': apps.get_model('projects', 'Accountability'),
+    }
+    # Un seul UPDATE par compteur, avec une sous-requête corrélée
+    for field, model in counted.items():
+        counts = (
+            model.objects.filter(project=OuterRef('pk'))
+            .order_by().values('project').annotate(n=Count('pk')).values('n')
+        )
+        Project.objects.update(**{field: Coalesce(Subquery(counts, output_field=IntegerField()), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_comment_project_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='accountability_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nombre de demandes de comptes'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nombre de commentaires'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
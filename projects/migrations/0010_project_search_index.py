@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from projects.search import drop_search_index, install_search_index
+
+
+def install(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_project_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -1,5 +1,7 @@
 # projects/models.py
 
+import uuid
+
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
@@ -77,15 +79,195 @@ class Project(models.Model):
         related_name='created_projects',
         verbose_name="Créé par"
     )
+    # Compteurs dénormalisés, maintenus par projects/signals.py
+    # (vérifiés par la commande reconcile_project_counters)
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Nombre de commentaires"
+    )
+    accountability_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Nombre de demandes de comptes"
+    )
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Projet"
         verbose_name_plural = "Projets"
+        indexes = [
+            # Liste des projets d'une commune, du plus récent au plus ancien
+            models.Index(fields=['commune', '-created_at', '-id'], name='project_commune_created_idx'),
+        ]
+
+    # Écrits uniquement par projects/counters.py (mises à jour F() atomiques)
+    COUNTER_FIELDS = ('comments_count', 'accountability_count')
 
     def __str__(self):
         return f"{self.title} ({self.commune.nom})"
 
+    def save(self, *args, **kwargs):
+        # Une sauvegarde complète d'un projet existant ne réécrit pas les
+        # compteurs : la valeur chargée en mémoire peut être périmée.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class ProjectPreview(models.Model):
+    """
+    Aperçu et métadonnées du fichier d'un projet, générés hors du thread de la
+    requête (voir projects/previews.py).
+    """
+    STATUS_CHOICES = [
+        ('READY', 'Disponible'),
+        ('UNSUPPORTED', 'Format sans aperçu'),
+        ('FAILED', 'Échec'),
+    ]
+
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='preview',
+        verbose_name="Projet"
+    )
+    source_name = models.CharField(
+        max_length=255,
+        verbose_name="Fichier source"
+    )
+    image = models.ImageField(
+        upload_to='projects/previews/',
+        null=True,
+        blank=True,
+        verbose_name="Aperçu"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        verbose_name="État de l'aperçu"
+    )
+    content_type = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Type MIME"
+    )
+    size = models.BigIntegerField(
+        default=0,
+        verbose_name="Taille (octets)"
+    )
+    page_count = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Nombre de pages"
+    )
+    width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Largeur (px)"
+    )
+    height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Hauteur (px)"
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name="Erreur"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Dernière génération"
+    )
+
+    class Meta:
+        verbose_name = "Aperçu de fichier"
+        verbose_name_plural = "Aperçus de fichiers"
+
+    def __str__(self):
+        return f"Aperçu de {self.source_name}"
+
+
+class ProjectUpload(models.Model):
+    """
+    Session d'envoi par morceaux du fichier d'un projet (voir projects/uploads.py).
+    Les morceaux sont ajoutés à un fichier temporaire sur disque ; le fichier
+    n'est rattaché au projet qu'à la finalisation.
+    """
+    STATUS_CHOICES = [
+        ('ACTIVE', 'En cours'),
+        ('COMPLETED', 'Terminée'),
+        ('ABORTED', 'Abandonnée'),
+    ]
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='uploads',
+        verbose_name="Projet"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='project_uploads',
+        verbose_name="Envoyé par"
+    )
+    filename = models.CharField(
+        max_length=255,
+        verbose_name="Nom du fichier"
+    )
+    size = models.BigIntegerField(
+        verbose_name="Taille totale (octets)"
+    )
+    checksum = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name="SHA-256 attendu du fichier complet"
+    )
+    offset = models.BigIntegerField(
+        default=0,
+        verbose_name="Octets reçus"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='ACTIVE',
+        verbose_name="État de l'envoi"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Date de création"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Dernière modification"
+    )
+    expires_at = models.DateTimeField(
+        verbose_name="Expiration"
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Envoi de fichier"
+        verbose_name_plural = "Envois de fichiers"
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='project_upload_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size}) pour {self.project.title}"
+
 
 class Comment(models.Model):
     """
@@ -119,6 +301,10 @@ class Comment(models.Model):
         verbose_name = "Commentaire"
         verbose_name_plural = "Commentaires"
         ordering = ['-created_at'] # Trier les commentaires du plus récent au plus ancien
+        indexes = [
+            # Pagination par curseur et derniers commentaires d'un projet
+            models.Index(fields=['project', '-created_at', '-id'], name='comment_project_created_idx'),
+        ]
 
     def __str__(self):
         return f"Commentaire de {self.author.username} sur {self.project.title}"
@@ -0,0 +1,159 @@
+# projects/previews.py
+"""
+Aperçus des fichiers de projets.
+
+Après l'enregistrement de Project.file, generate_preview est exécuté dans le
+pool de backend/tasks.py : miniature WebP (PNG à défaut) de la première page
+des PDF ou de l'image réduite, et métadonnées (type, taille, pages,
+dimensions) dans ProjectPreview. Le rendu des PDF utilise PyMuPDF s'il est
+installé ; sans lui, seules les métadonnées de base sont enregistrées.
+La commande build_project_previews rattrape les fichiers existants.
+"""
+import hashlib
+import io
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+from backend.tasks import submit_on_commit
+
+from .models import Project, ProjectPreview
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+WEBP = features.check('webp')
+PREVIEW_FORMAT, PREVIEW_EXTENSION = ('WEBP', '.webp') if WEBP else ('PNG', '.png')
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+
+
+def preview_size():
+    """Plus grand côté de l'aperçu, en pixels"""
+    return getattr(settings, 'PROJECT_PREVIEW_SIZE', 480)
+
+
+def schedule_preview(project):
+    """Planifie la génération de l'aperçu après la validation de la transaction"""
+    if project.file:
+        submit_on_commit(generate_preview, project.pk)
+
+
+def _render_image(source):
+    size = preview_size()
+    image = Image.open(source)
+    width, height = image.size
+    page_count = getattr(image, 'n_frames', 1)
+    # Décodage JPEG directement à une résolution réduite
+    image.draft('RGB', (size, size))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((size, size))
+    return image, {'width': width, 'height': height, 'page_count': page_count}
+
+
+def _render_pdf(field_file):
+    size = preview_size()
+    try:
+        document = fitz.open(field_file.path)
+    except NotImplementedError:
+        # Stockage distant : pas de chemin local
+        with field_file.open('rb') as source:
+            document = fitz.open(stream=source.read(), filetype='pdf')
+    with document:
+        page = document.load_page(0)
+        zoom = size / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        return image, {
+            'width': round(page.rect.width),
+            'height': round(page.rect.height),
+            'page_count': document.page_count,
+        }
+
+
+def _preview_name(project, source_name):
+    token = hashlib.sha1(source_name.encode()).hexdigest()[:12]
+    return f'{project.pk}-{token}{PREVIEW_EXTENSION}'
+
+
+def _save_preview(project, source_name, values, image=None):
+    """Enregistre l'aperçu si le fichier du projet n'a pas changé entre-temps"""
+    if not Project.objects.filter(pk=project.pk, file=source_name).exists():
+        return None
+    preview = ProjectPreview.objects.filter(pk=project.pk).first() or ProjectPreview(project=project)
+    old_image = preview.image.name if preview.image else None
+    preview.source_name = source_name
+    for field, value in values.items():
+        setattr(preview, field, value)
+    if image is not None:
+        buffer = io.BytesIO()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        image.save(buffer, PREVIEW_FORMAT, quality=80)
+        preview.image.save(_preview_name(project, source_name), ContentFile(buffer.getvalue()), save=False)
+    else:
+        preview.image = None
+    preview.save()
+    if old_image and old_image != preview.image.name:
+        preview.image.storage.delete(old_image)
+    return preview
+
+
+def generate_preview(project_id):
+    """Génère (ou régénère) l'aperçu et les métadonnées du fichier d'un projet"""
+    project = Project.objects.filter(pk=project_id).only('id', 'file').first()
+    if project is None:
+        return None
+    if not project.file:
+        delete_preview(project)
+        return None
+
+    source_name = project.file.name
+    extension = os.path.splitext(source_name)[1].lower()
+    values = {
+        'content_type': mimetypes.guess_type(source_name)[0] or 'application/octet-stream',
+        'page_count': None, 'width': None, 'height': None, 'error': '',
+    }
+    image = None
+    try:
+        values['size'] = project.file.size
+        if extension in IMAGE_EXTENSIONS:
+            with project.file.open('rb') as source:
+                image, metadata = _render_image(source)
+        elif extension == '.pdf' and fitz is not None:
+            image, metadata = _render_pdf(project.file)
+        else:
+            metadata = {}
+        values.update(metadata)
+        values['status'] = 'READY' if image is not None else 'UNSUPPORTED'
+    except Exception as e:
+        values.update(status='FAILED', error=str(e))
+        values.setdefault('size', 0)
+        image = None
+    return _save_preview(project, source_name, values, image)
+
+
+def delete_preview(project):
+    """Supprime l'aperçu d'un projet et son image"""
+    preview = ProjectPreview.objects.filter(pk=project.pk).first()
+    if preview is None:
+        return
+    if preview.image:
+        preview.image.storage.delete(preview.image.name)
+    preview.delete()
+
+
+def preview_url(project, request=None):
+    """URL de l'aperçu prêt d'un projet, None sinon (relation `preview` préchargée de préférence)"""
+    try:
+        preview = project.preview
+    except ProjectPreview.DoesNotExist:
+        return None
+    if preview.status != 'READY' or not preview.image:
+        return None
+    url = preview.image.url
+    return request.build_absolute_uri(url) if request is not None else url
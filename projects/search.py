@@ -0,0 +1,84 @@
+#projects/search.py
+"""
+Recherche plein texte sur titre + description des projets (index :
+backend/fulltext.py), avec extraits : snippet()/highlight() sous SQLite,
+ts_headline sous PostgreSQL. Les moteurs sans index se rabattent sur un
+filtre icontains, sans extraits.
+
+Les extraits sont délimités par HIGHLIGHT_START / HIGHLIGHT_STOP puis échappés
+et convertis en <mark> par format_highlight : le texte saisi par les
+utilisateurs n'est jamais renvoyé comme HTML brut.
+"""
+import html
+
+from django.db import connection as default_connection
+from django.db.models import CharField
+from django.db.models.expressions import RawSQL
+
+from backend.fulltext import FullTextIndex, fts5_query, is_indexed
+
+INDEX = FullTextIndex('projects_project', ('title', 'description'), 'project')
+
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+ELLIPSIS = '…'
+# Nombre de mots de l'extrait de description
+SNIPPET_WORDS = 24
+
+
+def install_search_index(connection=None):
+    """Crée (ou complète) l'index plein texte ; voir FullTextIndex.install"""
+    INDEX.install(connection)
+
+
+def drop_search_index(connection=None):
+    INDEX.drop(connection)
+
+
+def apply_search(queryset, text):
+    """
+    Restreint le queryset aux projets correspondant à la recherche, annote
+    'search_rank' (plus grand = plus pertinent), 'search_title' et
+    'search_snippet' (extraits délimités, voir format_highlight), et trie par
+    pertinence. Les filtres déjà appliqués sont conservés.
+    """
+    text = (text or '').strip()
+    if not text:
+        return queryset
+    if not is_indexed():
+        return queryset.filter(INDEX.icontains(text))
+    queryset = INDEX.apply(queryset, text)
+    marks = [HIGHLIGHT_START, HIGHLIGHT_STOP]
+
+    if default_connection.vendor == 'sqlite':
+        match = fts5_query(text)
+        fts_table = INDEX.fts_table
+        queryset = queryset.annotate(
+            search_title=INDEX.fts_expression(f"highlight({fts_table}, 0, %s, %s)", marks, match, CharField()),
+            search_snippet=INDEX.fts_expression(
+                f"snippet({fts_table}, 1, %s, %s, %s, {SNIPPET_WORDS})", [*marks, ELLIPSIS], match, CharField()
+            ),
+        )
+    else:
+        selectors = f'StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_STOP}"'
+        queryset = queryset.annotate(
+            search_title=RawSQL(
+                f"ts_headline('{INDEX.config}', {INDEX.table}.title, {INDEX.tsquery}, %s)",
+                [text, f'{selectors}, HighlightAll=true'], output_field=CharField(),
+            ),
+            search_snippet=RawSQL(
+                f"ts_headline('{INDEX.config}', {INDEX.table}.description, {INDEX.tsquery}, %s)",
+                [text, f'{selectors}, MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}, '
+                       f'MaxFragments=2, FragmentDelimiter=" {ELLIPSIS} "'],
+                output_field=CharField(),
+            ),
+        )
+
+    return queryset.order_by('-search_rank', '-created_at', '-id')
+
+
+def format_highlight(value):
+    """Extrait délimité -> HTML échappé avec les correspondances entre <mark>"""
+    if value is None:
+        return None
+    return html.escape(value).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
@@ -1,11 +1,18 @@
 # projects/serializers.py
 
 from rest_framework import serializers
-from .models import Project, Accountability, Comment
+import os
+import re
+
+from .models import Project, Accountability, Comment, ProjectPreview, ProjectUpload
+from .previews import preview_url
+from .search import format_highlight
+from .uploads import max_size
 # Assurez-vous d'importer le sérialiseur de votre application `communes`
 from communes.serializers import CommuneSerializer
 # Importez get_user_model pour obtenir le modèle User actif dans votre projet Django
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 
 User = get_user_model()
 
@@ -94,57 +101,134 @@ class ProjectListSerializer(serializers.ModelSerializer):
     """
     Sérialiseur pour l'affichage d'une liste de projets.
     Il inclut des informations relationnelles imbriquées (commune, created_by)
-    et des champs calculés (nombre de demandes de comptes, nombre de commentaires).
+    et les compteurs dénormalisés (nombre de demandes de comptes, nombre de commentaires).
     """
     commune = CommuneSerializer(read_only=True)
     created_by = UserBasicSerializer(read_only=True)
     
-    # Champ calculé pour le nombre de demandes de comptes associées au projet.
-    accountability_count = serializers.SerializerMethodField()
-    # Champ calculé pour le nombre de commentaires associés au projet.
-    comments_count = serializers.SerializerMethodField()
+    # Nombres de demandes de comptes et de commentaires : colonnes dénormalisées
+    # du projet (voir projects/counters.py), sans requête sur les tables enfants.
+    accountability_count = serializers.IntegerField(read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
+    # URL de la miniature du fichier (None tant qu'elle n'est pas générée)
+    preview_url = serializers.SerializerMethodField()
+    # Titre et extrait de description surlignés (<mark>) lors d'une recherche, None sinon
+    highlight = serializers.SerializerMethodField()
 
     class Meta:
         model = Project
         fields = [
             'id', 'title', 'description', 'status', 'commune',
             'start_date', 'end_date', 'budget', 'avancement',
-            'file', 'created_at', 'created_by',
-            'accountability_count', 'comments_count',
+            'file', 'preview_url', 'created_at', 'created_by',
+            'accountability_count', 'comments_count', 'highlight',
         ]
 
-    def get_accountability_count(self, obj):
-        # Utilise le related_name 'accountability_requests' défini sur la relation ForeignKey dans votre modèle Project
-        return obj.accountability_requests.count()
+    def get_preview_url(self, obj):
+        # Relation `preview` chargée par select_related dans les vues de liste
+        return preview_url(obj, self.context.get('request'))
 
-    def get_comments_count(self, obj):
-        # Utilise le related_name 'comments' défini sur la relation ForeignKey dans votre modèle Project
-        return obj.comments.count()
+    def get_highlight(self, obj):
+        # Annotations posées par projects.search.apply_search
+        if getattr(obj, 'search_snippet', None) is None and getattr(obj, 'search_title', None) is None:
+            return None
+        return {
+            'title': format_highlight(obj.search_title),
+            'description': format_highlight(obj.search_snippet),
+        }
+
+
+class ProjectListLightSerializer(ProjectListSerializer):
+    """
+    Projection allégée pour l'index des projets : sans description ni objets
+    imbriqués (commune et créateur sont donnés par leur id).
+    """
+    commune = serializers.PrimaryKeyRelatedField(read_only=True)
+    created_by = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta(ProjectListSerializer.Meta):
+        fields = [
+            'id', 'title', 'status', 'commune',
+            'start_date', 'end_date', 'budget', 'avancement',
+            'preview_url', 'created_at', 'created_by',
+            'accountability_count', 'comments_count', 'highlight',
+        ]
+
+    # Colonnes à charger (queryset.only) pour cette projection
+    LOAD_FIELDS = [
+        'id', 'title', 'status', 'commune_id', 'start_date', 'end_date',
+        'budget', 'avancement', 'created_at', 'created_by_id',
+        'accountability_count', 'comments_count', 'preview__status', 'preview__image',
+    ]
+
+
+class ProjectPreviewSerializer(serializers.ModelSerializer):
+    """Métadonnées du fichier d'un projet (voir projects/previews.py)"""
+    class Meta:
+        model = ProjectPreview
+        fields = ['status', 'content_type', 'size', 'page_count', 'width', 'height', 'updated_at']
 
 
 class ProjectDetailSerializer(ProjectListSerializer):
     """
     Sérialiseur pour l'affichage détaillé d'un projet.
     Il hérite de ProjectListSerializer et ajoute des champs supplémentaires,
-    notamment la liste complète des commentaires du projet.
+    notamment les COMMENTS_LIMIT commentaires les plus récents du projet ; la
+    discussion complète se parcourt via `comments_url` (pagination par curseur).
     """
-    # Le champ 'comments' est imbriqué en utilisant `CommentSerializer` pour afficher
-    # tous les détails de chaque commentaire associé au projet.
-    comments = CommentSerializer(many=True, read_only=True) 
+    COMMENTS_LIMIT = 10
+
+    comments = serializers.SerializerMethodField()
+    comments_url = serializers.SerializerMethodField()
+    preview = serializers.SerializerMethodField()
 
     class Meta(ProjectListSerializer.Meta):
-        # Utilise les champs de la classe parente et ajoute 'updated_at' et 'comments'.
-        fields = ProjectListSerializer.Meta.fields + ['updated_at', 'comments']
+        # Utilise les champs de la classe parente et ajoute 'updated_at', les commentaires et 'preview'.
+        fields = ProjectListSerializer.Meta.fields + ['updated_at', 'comments', 'comments_url', 'preview']
+
+    def get_comments(self, obj):
+        # Commentaires préchargés par la vue (Prefetch vers `latest_comments`) si disponibles
+        comments = getattr(obj, 'latest_comments', None)
+        if comments is None:
+            comments = obj.comments.select_related('author').order_by('-created_at', '-id')[:self.COMMENTS_LIMIT]
+        return CommentSerializer(comments, many=True, context=self.context).data
+
+    def get_comments_url(self, obj):
+        url = reverse('comment-list-create', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_preview(self, obj):
+        try:
+            return ProjectPreviewSerializer(obj.preview).data
+        except ProjectPreview.DoesNotExist:
+            return None
+
+
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    """
+    Représentation compacte d'un projet imbriquée dans d'autres ressources
+    (demandes de comptes) : sans description, créateur ni compteurs.
+    Le projet et sa commune doivent être chargés par select_related('project__commune').
+    """
+    commune_nom = serializers.CharField(source='commune.nom', read_only=True)
+
+    class Meta:
+        model = Project
+        fields = ['id', 'title', 'status', 'avancement', 'commune', 'commune_nom']
+
+    # Colonnes du projet à charger (queryset.only, préfixées par la relation)
+    LOAD_FIELDS = ['id', 'title', 'status', 'avancement', 'commune_id', 'commune__nom']
 
 
 class AccountabilitySerializer(serializers.ModelSerializer):
     """
     Sérialiseur pour les demandes de comptes, incluant les détails du citoyen,
-    du répondeur et du projet associé.
+    du répondeur et un résumé du projet associé.
     """
     citizen = UserBasicSerializer(read_only=True)
     responded_by = UserBasicSerializer(read_only=True)
-    project = ProjectListSerializer(read_only=True) # Utilise ProjectListSerializer pour les détails du projet
+    project = ProjectSummarySerializer(read_only=True) # Résumé du projet (voir ProjectSummarySerializer)
 
     class Meta:
         model = Accountability
@@ -185,3 +269,36 @@ class AccountabilityResponseSerializer(serializers.ModelSerializer):
         # L'utilisateur faisant la requête est automatiquement défini comme le répondeur.
         validated_data['responded_by'] = self.context['request'].user
         return super().update(instance, validated_data)
+
+
+class ProjectUploadSerializer(serializers.ModelSerializer):
+    """
+    Session d'envoi par morceaux du fichier d'un projet.
+    `offset` indique le nombre d'octets déjà reçus, à partir duquel reprendre.
+    """
+    class Meta:
+        model = ProjectUpload
+        fields = [
+            'id', 'project', 'filename', 'size', 'checksum', 'offset',
+            'status', 'created_at', 'updated_at', 'expires_at',
+        ]
+        read_only_fields = ['project', 'offset', 'status', 'created_at', 'updated_at', 'expires_at']
+
+    def validate_filename(self, value):
+        # Seul le nom de base est conservé (pas de chemin fourni par le client)
+        name = os.path.basename(value.replace('\\', '/')).strip()
+        if not name or name in ('.', '..'):
+            raise serializers.ValidationError("Nom de fichier invalide.")
+        return name
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("La taille doit être positive.")
+        if value > max_size():
+            raise serializers.ValidationError(f"Fichier trop volumineux (au plus {max_size()} octets).")
+        return value
+
+    def validate_checksum(self, value):
+        if value and not re.fullmatch(r'[0-9a-fA-F]{64}', value):
+            raise serializers.ValidationError("SHA-256 attendu en hexadécimal (64 caractères).")
+        return value.lower()
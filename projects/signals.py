@@ -0,0 +1,48 @@
+#projects/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.events import publish
+
+from .counters import adjust_counter
+from .models import Accountability, Comment, Project
+from .serializers import CommentSerializer
+
+COUNTER_FIELDS = {Comment: 'comments_count', Accountability: 'accountability_count'}
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Accountability)
+def child_saved(sender, instance, created, raw=False, **kwargs):
+    # Chargement de fixtures : les compteurs sont fournis avec le projet
+    if created and not raw:
+        adjust_counter(instance.project_id, COUNTER_FIELDS[sender], 1)
+
+
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Accountability)
+def child_deleted(sender, instance, origin=None, **kwargs):
+    # Suppression en cascade du projet : inutile de mettre à jour une ligne supprimée
+    if isinstance(origin, Project):
+        return
+    adjust_counter(instance.project_id, COUNTER_FIELDS[sender], -1)
+
+
+def comments_channel(project_id):
+    """Canal des événements de commentaires d'un projet (voir project_comments_stream)"""
+    return f'project-comments:{project_id}'
+
+
+@receiver(post_save, sender=Comment)
+def comment_published(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    publish(comments_channel(instance.project_id), 'created' if created else 'updated',
+            CommentSerializer(instance).data)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_unpublished(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Project):
+        return
+    publish(comments_channel(instance.project_id), 'deleted', {'id': instance.pk, 'project': instance.project_id})
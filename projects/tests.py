@@ -0,0 +1,656 @@
+import asyncio
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import serializers
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from backend.events import get_broker
+from communes.models import Commune
+
+from projects.counters import adjust_counter, reconcile_counters, verify_counters
+from projects.models import Accountability, Comment, Project, ProjectPreview, ProjectUpload
+from projects.previews import generate_preview
+from projects.signals import comments_channel
+
+
+def make_user(email, role, commune=None):
+    return User.objects.create_user(
+        email=email, password='secret', nom='Nom', prenom='Prénom',
+        role=role, commune=commune, is_active=True,
+    )
+
+
+class ProjectTestMixin:
+    """Commune, CTD, citoyen et projet communs aux tests de l'application"""
+
+    def setUp(self):
+        self.commune = Commune.objects.get(pk=1)
+        self.ctd = make_user('ctd@example.com', 'ctd', self.commune)
+        self.citizen = make_user('citoyen@example.com', 'citoyen', self.commune)
+        self.project = Project.objects.create(
+            title='Reboisement', description='Plantation d\'arbres', commune=self.commune, created_by=self.ctd,
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def counts(self):
+        self.project.refresh_from_db(fields=['comments_count', 'accountability_count'])
+        return self.project.comments_count, self.project.accountability_count
+
+
+class ProjectCountersTests(ProjectTestMixin, TestCase):
+
+    def test_counters_follow_create_and_delete(self):
+        client = self.client_for(self.citizen)
+        ids = [
+            client.post(f'/api/projects/{self.project.pk}/comments/', {'text': f'c{i}'}, format='json').json()['id']
+            for i in range(3)
+        ]
+        response = client.post('/api/projects/accountability/create/',
+                               {'project': self.project.pk, 'question': 'Budget ?'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counts(), (3, 1))
+
+        client.delete(f'/api/projects/{self.project.pk}/comments/{ids[0]}/')
+        Comment.objects.get(pk=ids[1]).delete()
+        self.assertEqual(self.counts(), (1, 1))
+        self.assertEqual(verify_counters(), {})
+
+    def test_updating_a_child_does_not_count_twice(self):
+        comment = Comment.objects.create(project=self.project, author=self.citizen, text='a')
+        comment.text = 'b'
+        comment.save()
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_full_project_save_keeps_concurrent_counts(self):
+        stale = Project.objects.get(pk=self.project.pk)
+        Comment.objects.create(project=self.project, author=self.citizen, text='a')
+        stale.title = 'Reboisement urbain'
+        stale.save()
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_update_view_keeps_concurrent_counts(self):
+        Comment.objects.create(project=self.project, author=self.citizen, text='a')
+        response = self.client_for(self.ctd).patch(
+            f'/api/projects/{self.project.pk}/update/', {'title': 'Nouveau titre'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.title, self.project.comments_count), ('Nouveau titre', 1))
+
+    def test_decrement_is_clamped_at_zero(self):
+        adjust_counter(self.project.pk, 'comments_count', -1)
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_bulk_changes_are_reconciled(self):
+        Comment.objects.bulk_create([Comment(project=self.project, author=self.citizen, text='b')] * 2)
+        Accountability.objects.create(project=self.project, citizen=self.citizen, question='q')
+        self.assertEqual(verify_counters(), {(self.project.pk, 'comments_count'): (2, 0)})
+        reconcile_counters()
+        self.assertEqual(self.counts(), (2, 1))
+        self.assertEqual(verify_counters(), {})
+
+    def test_raw_fixture_load_is_not_counted(self):
+        comment = Comment.objects.create(project=self.project, author=self.citizen, text='a')
+        dump = serializers.serialize('json', [comment])
+        comment.delete()
+        Project.objects.filter(pk=self.project.pk).update(comments_count=1)
+        for obj in serializers.deserialize('json', dump):
+            obj.save()
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_project_delete_cascades_without_counter_updates(self):
+        Comment.objects.create(project=self.project, author=self.citizen, text='a')
+        self.project.delete()
+        self.assertFalse(Comment.objects.exists())
+
+
+class ProjectUploadTests(ProjectTestMixin, TestCase):
+    CHUNK = 1024
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, PROJECT_UPLOAD_TEMP_DIR=self.temp_dir,
+            PROJECT_UPLOAD_CHUNK_MAX_SIZE=self.CHUNK,
+        )
+        self.settings_override.enable()
+        preview_patcher = mock.patch('projects.uploads.schedule_preview')
+        preview_patcher.start()
+        self.addCleanup(preview_patcher.stop)
+        self.client = self.client_for(self.ctd)
+        self.data = os.urandom(2 * self.CHUNK + 100)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def start(self, **values):
+        values.setdefault('filename', 'budget.pdf')
+        values.setdefault('size', len(self.data))
+        values.setdefault('checksum', hashlib.sha256(self.data).hexdigest())
+        response = self.client.post(f'/api/projects/{self.project.pk}/uploads/', values, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response['Location']
+
+    def send(self, location, offset, body, checksum=None):
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        if checksum:
+            headers['HTTP_X_CHUNK_CHECKSUM'] = checksum
+        return self.client.generic('PATCH', location, body, content_type='application/octet-stream', **headers)
+
+    def send_all(self, location):
+        for offset in range(0, len(self.data), self.CHUNK):
+            response = self.send(location, offset, self.data[offset:offset + self.CHUNK])
+            self.assertEqual(response.status_code, 200)
+
+    def test_complete_upload(self):
+        location = self.start()
+        self.send_all(location)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(location + 'complete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['upload']['status'], 'COMPLETED')
+        self.project.refresh_from_db()
+        with self.project.file.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_retried_chunk_is_ignored(self):
+        location = self.start()
+        chunk = self.data[:self.CHUNK]
+        self.assertEqual(self.send(location, 0, chunk)['Upload-Offset'], str(self.CHUNK))
+        response = self.send(location, 0, chunk)
+        self.assertEqual((response.status_code, response['Upload-Offset']), (200, str(self.CHUNK)))
+
+    def test_offset_mismatch(self):
+        location = self.start()
+        response = self.send(location, self.CHUNK, self.data[self.CHUNK:2 * self.CHUNK])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+    def test_chunk_checksum_failure(self):
+        location = self.start()
+        response = self.send(location, 0, self.data[:self.CHUNK], checksum='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(location).json()['offset'], 0)
+
+    def test_file_checksum_failure(self):
+        location = self.start(checksum='0' * 64)
+        self.send_all(location)
+        response = self.client.post(location + 'complete/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(location).json()['status'], 'ACTIVE')
+
+    def test_incomplete_upload_cannot_complete(self):
+        location = self.start()
+        self.send(location, 0, self.data[:self.CHUNK])
+        self.assertEqual(self.client.post(location + 'complete/').status_code, 409)
+
+    def test_failed_database_write_keeps_the_session_resumable(self):
+        location = self.start()
+        self.send_all(location)
+        with mock.patch.object(ProjectUpload, 'save', side_effect=DatabaseError('base indisponible')):
+            response = self.client.post(location + 'complete/')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.client.get(location).json()['status'], 'ACTIVE')
+        self.assertEqual(len(os.listdir(self.temp_dir)), 1)
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'projects', 'files')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(location + 'complete/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_copy_is_dropped_when_the_session_ends_meanwhile(self):
+        location = self.start()
+        self.send_all(location)
+        storage = Project._meta.get_field('file').storage
+        save = storage.save
+
+        def save_then_finalize_elsewhere(name, content, **kwargs):
+            # La copie précède le verrou : une autre finalisation peut passer entre-temps
+            stored = save(name, content, **kwargs)
+            ProjectUpload.objects.filter(project=self.project).update(status='COMPLETED')
+            return stored
+
+        with mock.patch.object(storage, 'save', save_then_finalize_elsewhere):
+            response = self.client.post(location + 'complete/')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'projects', 'files')))
+        self.project.refresh_from_db()
+        self.assertFalse(self.project.file)
+
+    def test_other_user_cannot_resume(self):
+        location = self.start()
+        other = make_user('autre@example.com', 'ctd', self.commune)
+        self.assertEqual(self.client_for(other).get(location).status_code, 403)
+
+
+class CommentStreamTests(ProjectTestMixin, TestCase):
+
+    def ticket_for(self, user, project=None):
+        project = project or self.project
+        return self.client_for(user).post(f'/api/projects/{project.pk}/comments/stream/ticket/')
+
+    def stream_url(self, project=None):
+        return f'/api/projects/{(project or self.project).pk}/comments/stream/'
+
+    def test_ticket_is_scoped_to_the_commune(self):
+        response = self.ticket_for(self.citizen)
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('ticket=', response.json()['url'])
+        outsider = make_user('ailleurs@example.com', 'citoyen', Commune.objects.get(pk=2))
+        self.assertEqual(self.ticket_for(outsider).status_code, 403)
+        self.assertEqual(self.client_for(self.citizen).post('/api/projects/999999/comments/stream/ticket/').status_code,
+                         404)
+
+    def test_stream_requires_asgi(self):
+        self.assertEqual(self.client_for(self.citizen).get(self.stream_url()).status_code, 501)
+
+    async def test_ticket_opens_the_stream(self):
+        ticket = (await sync_to_async(self.ticket_for)(self.citizen)).json()['ticket']
+        response = await AsyncClient().get(self.stream_url(), {'ticket': ticket})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = response.streaming_content.__aiter__()
+        try:
+            self.assertEqual(await events.__anext__(), b'retry: 3000\n\n')
+            get_broker().publish(comments_channel(self.project.pk), {'event': 'created', 'data': {'id': 1}})
+            chunk = await asyncio.wait_for(events.__anext__(), 5)
+            self.assertEqual(chunk, b'event: created\ndata: {"id": 1}\n\n')
+        finally:
+            await events.aclose()
+
+    async def test_invalid_credentials_are_refused(self):
+        other = await sync_to_async(Project.objects.create)(
+            title='Autre', description='Autre projet', commune=self.commune, created_by=self.ctd,
+        )
+        ticket = (await sync_to_async(self.ticket_for)(self.citizen, other)).json()['ticket']
+        access = str(AccessToken.for_user(self.citizen))
+        client = AsyncClient()
+        # Ticket d'un autre projet, ticket altéré, JWT en paramètre d'URL
+        for params in ({'ticket': ticket}, {'ticket': ticket + 'x'}, {'token': access}, {}):
+            with self.subTest(params=list(params)):
+                self.assertEqual((await client.get(self.stream_url(), params)).status_code, 401)
+
+    async def test_expired_ticket_is_refused(self):
+        ticket = (await sync_to_async(self.ticket_for)(self.citizen)).json()['ticket']
+        with mock.patch('projects.views.STREAM_TICKET_TTL', -1):
+            response = await AsyncClient().get(self.stream_url(), {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+
+
+class ProjectListTests(ProjectTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.projects = [self.project] + [
+            Project.objects.create(title=f'Projet {i}', description='Description', commune=self.commune,
+                                   created_by=self.ctd)
+            for i in range(24)
+        ]
+        Project.objects.create(title='Ailleurs', description='Autre commune', commune=Commune.objects.get(pk=2),
+                               created_by=self.ctd)
+        latest = self.projects[-1]
+        for i in range(3):
+            Comment.objects.create(project=latest, author=self.citizen, text=f'c{i}')
+        Accountability.objects.create(project=latest, citizen=self.citizen, question='Budget ?')
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(self.citizen).get('/api/projects/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_page_with_counts_in_constant_queries(self):
+        data, queries = self.get()
+        self.assertEqual(data['count'], 25)
+        self.assertEqual(len(data['results']), settings.REST_FRAMEWORK['PAGE_SIZE'])
+        self.assertIsNotNone(data['next'])
+        first = data['results'][0]
+        self.assertEqual((first['id'], first['comments_count'], first['accountability_count']),
+                         (self.projects[-1].pk, 3, 1))
+        _, more_queries = self.get(page_size=25)
+        # COUNT puis la page, quelle que soit sa taille
+        self.assertEqual(queries, 2)
+        self.assertEqual(more_queries, queries)
+
+    def test_light_projection(self):
+        data, queries = self.get(light=1, page_size=100)
+        self.assertEqual(len(data['results']), 25)
+        self.assertEqual(queries, 2)
+        item = data['results'][0]
+        self.assertNotIn('description', item)
+        self.assertEqual((item['commune'], item['created_by']), (self.commune.pk, self.ctd.pk))
+
+
+class ProjectDownloadTests(ProjectTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.data = os.urandom(1000)
+        os.makedirs(os.path.join(self.media_root, 'projects', 'files'))
+        with open(os.path.join(self.media_root, 'projects', 'files', 'plan.pdf'), 'wb') as f:
+            f.write(self.data)
+        Project.objects.filter(pk=self.project.pk).update(file='projects/files/plan.pdf')
+        self.url = f'/api/projects/{self.project.pk}/download/'
+        self.client = self.client_for(self.citizen)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_full_download_is_streamed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_partial_content(self):
+        for header, start, end in (('bytes=100-199', 100, 199), ('bytes=900-', 900, 999), ('bytes=-50', 950, 999),
+                                   ('bytes=990-5000', 990, 999)):
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/1000')
+                self.assertEqual(b''.join(response.streaming_content), self.data[start:end + 1])
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=1000-', 'bytes=500-100', 'bytes=-0'):
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */1000')
+
+    def test_empty_file_has_no_satisfiable_range(self):
+        open(os.path.join(self.media_root, 'projects', 'files', 'plan.pdf'), 'wb').close()
+        for header in ('bytes=-50', 'bytes=0-'):
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_conditional_requests(self):
+        first = self.client.get(self.url)
+        etag, last_modified = first['ETag'], first['Last-Modified']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"autre"').status_code, 200)
+
+    def test_if_range(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+        # Validateur périmé : le fichier entier est renvoyé
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"perime"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(b''.join(stale.streaming_content), self.data)
+
+    def test_offload_to_the_proxy(self):
+        with override_settings(PROTECTED_FILES_OFFLOAD='x-accel-redirect',
+                               PROTECTED_FILES_INTERNAL_URL='/protected-media/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/projects/files/plan.pdf')
+        self.assertEqual(response.content, b'')
+        with override_settings(PROTECTED_FILES_OFFLOAD='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'projects', 'files', 'plan.pdf'))
+
+    def test_other_commune_is_refused(self):
+        outsider = make_user('ailleurs@example.com', 'citoyen', Commune.objects.get(pk=2))
+        self.assertEqual(self.client_for(outsider).get(self.url).status_code, 403)
+
+
+class ProjectPreviewTests(ProjectTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, PROJECT_PREVIEW_SIZE=200)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def attach(self, name, content, project=None):
+        project = project or self.project
+        project.file.save(name, ContentFile(content))
+        return project
+
+    def image_bytes(self, size=(3000, 2000)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def test_image_preview(self):
+        self.attach('plan.jpg', self.image_bytes())
+        preview = generate_preview(self.project.pk)
+        self.assertEqual((preview.status, preview.width, preview.height, preview.page_count), ('READY', 3000, 2000, 1))
+        self.assertEqual(preview.content_type, 'image/jpeg')
+        with preview.image.open('rb') as f:
+            self.assertEqual(Image.open(f).size, (200, 133))
+
+    def test_unsupported_and_broken_files(self):
+        self.attach('budget.xlsx', b'tableur')
+        self.assertEqual(generate_preview(self.project.pk).status, 'UNSUPPORTED')
+        self.attach('plan.png', b'pas une image')
+        preview = generate_preview(self.project.pk)
+        self.assertEqual(preview.status, 'FAILED')
+        self.assertTrue(preview.error)
+
+    def test_file_replaced_during_generation_is_not_recorded(self):
+        self.attach('plan.jpg', self.image_bytes())
+
+        def render_while_replaced(source):
+            Project.objects.filter(pk=self.project.pk).update(file='projects/files/autre.jpg')
+            return Image.new('RGB', (10, 10)), {}
+
+        with mock.patch('projects.previews._render_image', side_effect=render_while_replaced):
+            self.assertIsNone(generate_preview(self.project.pk))
+        self.assertFalse(ProjectPreview.objects.exists())
+
+    def test_created_file_is_scheduled_after_commit(self):
+        upload = SimpleUploadedFile('plan.jpg', self.image_bytes(), 'image/jpeg')
+        with mock.patch('backend.tasks.submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.ctd).post('/api/projects/create/', {
+                'title': 'Voirie', 'description': 'Réfection', 'file': upload,
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        submit.assert_called_once_with(generate_preview, response.json()['id'])
+
+    def test_list_url_command_and_cleanup(self):
+        self.attach('plan.jpg', self.image_bytes())
+        call_command('build_project_previews', stdout=io.StringIO())
+        preview = ProjectPreview.objects.get(pk=self.project.pk)
+        with mock.patch('projects.management.commands.build_project_previews.generate_preview') as generate:
+            call_command('build_project_previews', stdout=io.StringIO())
+        generate.assert_not_called()
+
+        item = self.client_for(self.citizen).get('/api/projects/', {'light': 1}).json()['results'][0]
+        self.assertTrue(item['preview_url'].endswith(preview.image.name.split('/')[-1]))
+
+        path = preview.image.path
+        self.client_for(self.ctd).delete(f'/api/projects/{self.project.pk}/delete/')
+        self.assertFalse(os.path.exists(path))
+
+
+class CommentPaginationTests(ProjectTestMixin, TestCase):
+
+    def add_comments(self, count):
+        authors = [make_user(f'auteur{Comment.objects.count()}-{i}@example.com', 'citoyen', self.commune)
+                   for i in range(3)]
+        Comment.objects.bulk_create([
+            Comment(project=self.project, author=authors[i % 3], text=f'c{Comment.objects.count() + i}')
+            for i in range(count)
+        ])
+
+    def detail(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(self.citizen).get(f'/api/projects/{self.project.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_detail_embeds_the_latest_comments_in_constant_queries(self):
+        self.add_comments(12)
+        _, few = self.detail()
+        self.add_comments(48)
+        data, many = self.detail()
+        self.assertEqual(few, many)
+        self.assertEqual(len(data['comments']), 10)
+        latest = Comment.objects.order_by('-created_at', '-id')[:10]
+        self.assertEqual([comment['id'] for comment in data['comments']], [comment.pk for comment in latest])
+        self.assertTrue(data['comments_url'].endswith(f'/api/projects/{self.project.pk}/comments/'))
+
+    def test_cursor_round_trip(self):
+        self.add_comments(25)
+        client = self.client_for(self.citizen)
+        url, pages = f'/api/projects/{self.project.pk}/comments/?page_size=10', []
+        while url:
+            data = client.get(url).json()
+            pages.append([comment['id'] for comment in data['results']])
+            url = data['next']
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        expected = list(Comment.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(sum(pages, []), expected)
+
+        # Retour en arrière depuis la dernière page
+        previous = client.get(data['previous']).json()
+        self.assertEqual([comment['id'] for comment in previous['results']], pages[1])
+
+    def test_new_comment_comes_first(self):
+        self.add_comments(15)
+        response = self.client_for(self.citizen).post(f'/api/projects/{self.project.pk}/comments/',
+                                                      {'text': 'Dernier avis'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        data, _ = self.detail()
+        self.assertEqual(data['comments'][0]['text'], 'Dernier avis')
+
+
+class AccountabilityListTests(ProjectTestMixin, TestCase):
+
+    def add_requests(self, count):
+        citizens = [make_user(f'demandeur{Accountability.objects.count()}-{i}@example.com', 'citoyen', self.commune)
+                    for i in range(3)]
+        Accountability.objects.bulk_create([
+            Accountability(project=self.project, citizen=citizens[i % 3], question=f'Question {i}')
+            for i in range(count)
+        ])
+
+    def inbox(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(self.ctd).get('/api/projects/accountability/')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_inbox_in_constant_queries_with_a_project_summary(self):
+        self.add_requests(3)
+        _, few = self.inbox()
+        self.add_requests(30)
+        data, many = self.inbox()
+        self.assertEqual(len(data), 33)
+        self.assertEqual(few, many)
+        self.assertEqual(data[0]['project'], {
+            'id': self.project.pk, 'title': 'Reboisement', 'status': self.project.status,
+            'avancement': self.project.avancement, 'commune': self.commune.pk, 'commune_nom': self.commune.nom,
+        })
+
+    def test_citizen_sees_their_own_requests(self):
+        self.add_requests(3)
+        Accountability.objects.create(project=self.project, citizen=self.citizen, question='Calendrier ?')
+        data = self.client_for(self.citizen).get('/api/projects/accountability/').json()
+        self.assertEqual([item['question'] for item in data], ['Calendrier ?'])
+
+    def test_response_keeps_the_other_fields(self):
+        accountability = Accountability.objects.create(project=self.project, citizen=self.citizen, question='Budget ?')
+        response = self.client_for(self.ctd).post(f'/api/projects/accountability/{accountability.pk}/respond/',
+                                                  {'response': 'Voir le rapport'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['responded_by']['email'], self.ctd.email)
+        accountability.refresh_from_db()
+        self.assertEqual((accountability.question, accountability.response, accountability.project_id),
+                         ('Budget ?', 'Voir le rapport', self.project.pk))
+
+    def test_detail_is_limited_to_the_commune(self):
+        accountability = Accountability.objects.create(project=self.project, citizen=self.citizen, question='Budget ?')
+        url = f'/api/projects/accountability/{accountability.pk}/'
+        self.assertEqual(self.client_for(self.ctd).get(url).status_code, 200)
+        other_ctd = make_user('ctd2@example.com', 'ctd', Commune.objects.get(pk=2))
+        self.assertEqual(self.client_for(other_ctd).get(url).status_code, 403)
+
+
+class ProjectSearchTests(ProjectTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        response = self.client_for(self.ctd).post('/api/projects/create/', {
+            'title': 'Réhabilitation du marché central',
+            'description': 'Travaux de <b>rénovation</b> des étals et du réseau d\'évacuation des eaux usées. '
+                           + 'Détails ' * 60 + 'Le marché sera rouvert en mai.',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.market = Project.objects.get(pk=response.json()['id'])
+        self.trees = Project.objects.create(title='Plantation', description='Arbres près du marche',
+                                            commune=self.commune, created_by=self.ctd)
+        Project.objects.create(title='Marché', description='Autre commune', commune=Commune.objects.get(pk=2),
+                               created_by=self.ctd)
+
+    def search(self, text, **params):
+        response = self.client_for(self.citizen).get('/api/projects/', {'search': text, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_accents_prefixes_and_ranking(self):
+        results = self.search('marche')
+        # Le titre pèse plus que la description
+        self.assertEqual([item['id'] for item in results], [self.market.pk, self.trees.pk])
+        self.assertEqual([item['id'] for item in self.search('renov')], [self.market.pk])
+        self.assertEqual([item['id'] for item in self.search('évacuation eaux')], [self.market.pk])
+        self.assertEqual(self.search('évacuation arbres'), [])
+
+    def test_highlights_are_escaped(self):
+        [item] = self.search('renovation', light=1)
+        self.assertIn('&lt;b&gt;<mark>rénovation</mark>&lt;/b&gt;', item['highlight']['description'])
+        [item, _] = self.search('marché')
+        self.assertEqual(item['highlight']['title'], 'Réhabilitation du <mark>marché</mark> central')
+        self.assertTrue(item['highlight']['description'].startswith('…'))
+
+    def test_blank_or_symbol_only_queries(self):
+        self.assertEqual(self.search('"'), [])
+        self.assertEqual(len(self.search('   ')), 3)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.client_for(self.ctd).patch(f'/api/projects/{self.market.pk}/update/',
+                                        {'title': 'Extension de la gare'}, format='json')
+        self.assertEqual([item['id'] for item in self.search('gare')], [self.market.pk])
+        self.assertEqual(self.search('réhabilitation'), [])
+        self.client_for(self.ctd).delete(f'/api/projects/{self.market.pk}/delete/')
+        self.assertEqual(self.search('gare'), [])
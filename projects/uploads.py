@@ -0,0 +1,217 @@
+# projects/uploads.py
+"""
+Envoi par morceaux (reprenable) du fichier d'un projet.
+
+Une session ProjectUpload est créée avec la taille (et, si possible, le SHA-256)
+du fichier. Chaque morceau est lu depuis le corps brut de la requête par blocs,
+écrit dans un fichier partiel propre à la requête, vérifié (X-Chunk-Checksum),
+puis ajouté au fichier temporaire de la session sous verrou, à condition que
+son décalage corresponde aux octets déjà reçus. La finalisation vérifie le
+fichier complet, le recopie dans le stockage puis le rattache au projet dans
+une transaction. Aucun corps de requête n'est jamais chargé en mémoire.
+"""
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Project, ProjectUpload
+from .previews import schedule_preview
+
+READ_BLOCK = 64 * 1024
+
+
+class UploadError(Exception):
+    """Erreur d'envoi à renvoyer au client avec le code HTTP donné"""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+def temp_dir():
+    return getattr(settings, 'PROJECT_UPLOAD_TEMP_DIR', os.path.join(settings.BASE_DIR, 'uploads_tmp'))
+
+
+def temp_path(upload):
+    return os.path.join(temp_dir(), f'{upload.pk}.part')
+
+
+def max_size():
+    return getattr(settings, 'PROJECT_UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'PROJECT_UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def create_upload(project, user, filename, size, checksum=''):
+    """Ouvre une session et son fichier temporaire vide"""
+    os.makedirs(temp_dir(), exist_ok=True)
+    ttl = getattr(settings, 'PROJECT_UPLOAD_TTL', 24 * 3600)
+    upload = ProjectUpload.objects.create(
+        project=project,
+        created_by=user,
+        filename=filename,
+        size=size,
+        checksum=checksum,
+        expires_at=timezone.now() + timedelta(seconds=ttl),
+    )
+    open(temp_path(upload), 'wb').close()
+    return upload
+
+
+def _receive(stream, length, path):
+    """Copie `length` octets du flux dans `path` ; retourne (octets lus, sha256)"""
+    digest = hashlib.sha256()
+    received = 0
+    with open(path, 'wb') as f:
+        while received < length:
+            block = stream.read(min(READ_BLOCK, length - received))
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+            received += len(block)
+    return received, digest.hexdigest()
+
+
+def append_chunk(upload, offset, stream, length, checksum=None):
+    """
+    Ajoute un morceau de `length` octets lu depuis `stream` à la position `offset`.
+    Retourne la session à jour. Un morceau déjà reçu (nouvel essai après une
+    réponse perdue) est ignoré sans erreur.
+    """
+    if upload.status != 'ACTIVE':
+        raise UploadError('Cette session d\'envoi n\'est plus active', 409)
+    if length <= 0:
+        raise UploadError('Morceau vide (Content-Length requis)', 400)
+    if length > max_chunk_size():
+        raise UploadError(f'Morceau trop volumineux (au plus {max_chunk_size()} octets)', 413)
+    if offset + length > upload.size:
+        raise UploadError('Le morceau dépasse la taille annoncée du fichier', 400, upload.offset)
+
+    # Réception hors verrou : le réseau peut être lent
+    part = os.path.join(temp_dir(), f'{upload.pk}.{uuid.uuid4().hex}.chunk')
+    try:
+        received, digest = _receive(stream, length, part)
+        if received != length:
+            raise UploadError('Morceau incomplet, à renvoyer', 400, upload.offset)
+        if checksum and checksum.lower() != digest:
+            raise UploadError('Somme de contrôle du morceau invalide', 400, upload.offset)
+
+        with transaction.atomic():
+            upload = ProjectUpload.objects.select_for_update().get(pk=upload.pk)
+            if upload.status != 'ACTIVE':
+                raise UploadError('Cette session d\'envoi n\'est plus active', 409)
+            if offset + length <= upload.offset:
+                return upload
+            if offset != upload.offset:
+                raise UploadError('Décalage inattendu', 409, upload.offset)
+            with open(part, 'rb') as src, open(temp_path(upload), 'r+b') as dst:
+                dst.seek(offset)
+                dst.truncate()
+                shutil.copyfileobj(src, dst, READ_BLOCK)
+                dst.flush()
+                os.fsync(dst.fileno())
+            upload.offset = offset + length
+            upload.save(update_fields=['offset', 'updated_at'])
+            return upload
+    finally:
+        _remove(part)
+
+
+def finalize_upload(upload):
+    """
+    Vérifie le fichier complet et le rattache au projet. Le fichier temporaire
+    est recopié (et non déplacé) dans le stockage avant la transaction : les
+    verrous ne sont pris que pour rattacher la copie. Si la session a été
+    finalisée entre-temps ou si l'écriture en base échoue, la copie est
+    supprimée et la session garde ses octets. Le fichier temporaire et l'ancien
+    fichier du projet sont supprimés après validation de la transaction.
+    """
+    if upload.status != 'ACTIVE':
+        raise UploadError('Cette session d\'envoi n\'est plus active', 409)
+    if upload.offset != upload.size:
+        raise UploadError('Fichier incomplet', 409, upload.offset)
+    path = temp_path(upload)
+    if not os.path.exists(path) or os.path.getsize(path) != upload.size:
+        raise UploadError('Fichier temporaire introuvable ou tronqué', 409, upload.offset)
+    if upload.checksum and file_sha256(path) != upload.checksum.lower():
+        raise UploadError('Somme de contrôle du fichier invalide', 400)
+
+    # Copie hors verrou : jusqu'à PROJECT_UPLOAD_MAX_SIZE octets
+    project = upload.project
+    field = project.file.field
+    with open(path, 'rb') as f:
+        new_name = field.storage.save(field.generate_filename(project, upload.filename), File(f),
+                                      max_length=field.max_length)
+    storage = field.storage
+
+    try:
+        with transaction.atomic():
+            upload = ProjectUpload.objects.select_for_update().get(pk=upload.pk)
+            if upload.status != 'ACTIVE':
+                raise UploadError('Cette session d\'envoi n\'est plus active', 409)
+            project = Project.objects.select_for_update().get(pk=upload.project_id)
+            old_name = project.file.name if project.file else None
+
+            project.file.name = new_name
+            project.save(update_fields=['file', 'updated_at'])
+            upload.status = 'COMPLETED'
+            upload.save(update_fields=['status', 'updated_at'])
+
+            transaction.on_commit(lambda: _remove(path))
+            if old_name and old_name != new_name:
+                transaction.on_commit(lambda: storage.delete(old_name))
+            schedule_preview(project)
+    except Exception:
+        # La copie ne doit pas rester orpheline ; le fichier temporaire est conservé
+        storage.delete(new_name)
+        raise
+    return project
+
+
+def abort_upload(upload):
+    """Abandonne la session et supprime son fichier temporaire"""
+    with transaction.atomic():
+        upload = ProjectUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == 'ACTIVE':
+            upload.status = 'ABORTED'
+            upload.save(update_fields=['status', 'updated_at'])
+    _remove(temp_path(upload))
+    return upload
+
+
+def purge_uploads(now=None):
+    """Supprime les sessions expirées et leurs fichiers temporaires"""
+    now = now or timezone.now()
+    stale = ProjectUpload.objects.filter(expires_at__lt=now)
+    purged = 0
+    for upload in stale.iterator():
+        _remove(temp_path(upload))
+        purged += 1
+    stale.delete()
+    return purged
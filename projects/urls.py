@@ -10,6 +10,11 @@ urlpatterns = [
     path('<int:id>/update/', views.update_project, name='project-update'),
     path('<int:id>/delete/', views.delete_project, name='project-delete'),
     path('<int:id>/download/', views.download_project_file, name='download-project-file'),
+
+    # Envoi reprenable du fichier d'un projet
+    path('<int:id>/uploads/', views.create_project_upload, name='project-upload-create'),
+    path('uploads/<uuid:upload_id>/', views.project_upload, name='project-upload'),
+    path('uploads/<uuid:upload_id>/complete/', views.complete_project_upload, name='project-upload-complete'),
     
     # Accountability routes
     path('accountability/', views.list_accountability, name='accountability-list'),
@@ -19,6 +24,9 @@ urlpatterns = [
 
 
     path('<int:project_id>/comments/', views.CommentListCreateView.as_view(), name='comment-list-create'),
+    path('<int:project_id>/comments/stream/', views.project_comments_stream, name='comment-stream'),
+    path('<int:project_id>/comments/stream/ticket/', views.create_comments_stream_ticket,
+         name='comment-stream-ticket'),
     
 
     path('<int:project_id>/comments/<int:pk>/', views.CommentDetailView.as_view(), name='comment-detail'),
@@ -3,21 +3,40 @@
 from rest_framework import status, permissions, generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q
+from django.db.models import Prefetch
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 import os
-import mimetypes
-from django.http import HttpResponse, Http404
+import json
+import time
+from urllib.parse import urlencode
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.conf import settings
-from django.utils.encoding import smart_str
-from wsgiref.util import FileWrapper
-from .models import Project, Accountability, Comment # Importez le modèle Comment
+from .models import Project, Accountability, Comment, ProjectUpload # Importez le modèle Comment
 from .serializers import (
-    ProjectListSerializer, ProjectDetailSerializer,
+    ProjectListSerializer, ProjectListLightSerializer, ProjectDetailSerializer,
     AccountabilitySerializer, AccountabilityCreateSerializer,
     AccountabilityResponseSerializer,
-    CommentSerializer # Importez le CommentSerializer
+    CommentSerializer, # Importez le CommentSerializer
+    ProjectSummarySerializer, ProjectUploadSerializer, UserBasicSerializer,
 )
 from django.shortcuts import get_object_or_404 # Assurez-vous que ceci est importé
+from django.urls import reverse
+from backend.downloads import serve_file
+from backend.events import OVERFLOW, get_broker
+from backend.idempotency import idempotent
+from .previews import delete_preview, schedule_preview
+from .search import apply_search
+from .signals import comments_channel
+from .uploads import UploadError, abort_upload, append_chunk, create_upload, finalize_upload
 
 class IsCTDOrReadOnly(permissions.BasePermission):
     """
@@ -52,6 +71,28 @@ class IsCommentAuthorOrReadOnly(permissions.BasePermission):
         return obj.author == request.user
 
 
+class ProjectPagination(PageNumberPagination):
+    """Pagination de la liste des projets (PAGE_SIZE par défaut, ?page_size= jusqu'à 100)"""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CommentCursorPagination(CursorPagination):
+    """
+    Pagination par curseur des commentaires d'un projet, du plus récent au plus
+    ancien : coût constant quelle que soit la profondeur de la discussion.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def latest_comments_prefetch(limit=ProjectDetailSerializer.COMMENTS_LIMIT):
+    """Derniers commentaires de chaque projet avec leur auteur, dans `latest_comments`"""
+    comments = Comment.objects.select_related('author').order_by('-created_at', '-id')[:limit]
+    return Prefetch('comments', queryset=comments, to_attr='latest_comments')
+
+
 # Project views
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated]) # Ajout de cette ligne
@@ -75,28 +116,35 @@ def list_projects(request):
         )
 
     # 3. Filtrer les projets par la commune de l'utilisateur
-    queryset = Project.objects.select_related('commune', 'created_by').filter(commune=user_commune)
+    queryset = Project.objects.select_related('commune', 'created_by', 'preview').filter(commune=user_commune)
     
     # Filtrer par statut si spécifié
     status_param = request.query_params.get('status')
     if status_param:
         queryset = queryset.filter(status=status_param)
     
-    # Recherche par titre ou description
+    # Recherche plein texte sur titre et description, triée par pertinence
     search = request.query_params.get('search')
-    if search:
-        queryset = queryset.filter(
-            Q(title__icontains=search) |
-            Q(description__icontains=search)
-        )
-    
-    queryset = queryset.order_by('-created_at')
-    
-    serializer = ProjectListSerializer(queryset, many=True)
-    return Response(serializer.data)
+    if search and search.strip():
+        queryset = apply_search(queryset, search)
+    else:
+        queryset = queryset.order_by('-created_at', '-id')
+
+    # Projection allégée (?light=1) : ni description ni objets imbriqués
+    if request.query_params.get('light') in ('1', 'true'):
+        serializer_class = ProjectListLightSerializer
+        queryset = queryset.select_related(None).select_related('preview').only(*ProjectListLightSerializer.LOAD_FIELDS)
+    else:
+        serializer_class = ProjectListSerializer
+
+    paginator = ProjectPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([IsCTDOrReadOnly])
+@idempotent
 def create_project(request):
     """Crée un nouveau projet"""
     # Note: ProjectListSerializer est utilisé ici, mais pour la création,
@@ -104,10 +152,12 @@ def create_project(request):
     # comme 'commune' et 'created_by' si non fournis dans le corps de la requête.
     serializer = ProjectListSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(
+        project = serializer.save(
             created_by=request.user,
             commune=request.user.commune # Assurez-vous que l'utilisateur a une 'commune' associée
         )
+        # Aperçu du fichier généré hors du thread de la requête
+        schedule_preview(project)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -116,8 +166,9 @@ def create_project(request):
 def project_detail(request, id):
     """Récupère les détails d'un projet spécifique, en vérifiant la commune de l'utilisateur"""
     try:
-        # Utilise select_related pour les FK et prefetch_related pour les related_name (comme 'comments')
-        project = Project.objects.select_related('commune', 'created_by').prefetch_related('comments').get(pk=id)
+        # Utilise select_related pour les FK et un Prefetch borné pour les derniers commentaires
+        project = Project.objects.select_related('commune', 'created_by', 'preview') \
+            .prefetch_related(latest_comments_prefetch()).get(pk=id)
         
         # Vérification de la commune de l'utilisateur
         if not request.user.is_authenticated or request.user.commune != project.commune:
@@ -126,7 +177,7 @@ def project_detail(request, id):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        serializer = ProjectDetailSerializer(project)
+        serializer = ProjectDetailSerializer(project, context={'request': request})
         return Response(serializer.data)
     except Project.DoesNotExist:
         return Response(
@@ -164,24 +215,8 @@ def download_project_file(request, id):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Déterminer le type MIME
-        content_type, _ = mimetypes.guess_type(file_path)
-        if content_type is None:
-            content_type = 'application/octet-stream'
-        
-        # Créer la réponse HTTP avec le fichier
-        response = HttpResponse(content_type=content_type)
-        
-        # Nom du fichier pour le téléchargement
-        filename = os.path.basename(file_path)
-        response['Content-Disposition'] = f'attachment; filename="{smart_str(filename)}"'
-        response['Content-Length'] = os.path.getsize(file_path)
-        
-        # Lire et retourner le fichier
-        with open(file_path, 'rb') as f:
-            response.write(f.read())
-        
-        return response
+        # Flux, plages (Range), validateurs ETag / Last-Modified et délégation au proxy
+        return serve_file(request, file_path, filename=os.path.basename(file_path))
         
     except Project.DoesNotExist:
         return Response(
@@ -217,7 +252,8 @@ def update_project(request, id):
         serializer = ProjectDetailSerializer( # Utilisez ProjectDetailSerializer pour la mise à jour si vous le souhaitez
             project,
             data=request.data,
-            partial=request.method == 'PATCH'
+            partial=request.method == 'PATCH',
+            context={'request': request}
         )
         
         if serializer.is_valid():
@@ -227,7 +263,9 @@ def update_project(request, id):
                 if os.path.exists(old_file_path):
                     os.remove(old_file_path)
             
-            serializer.save()
+            project = serializer.save()
+            if 'file' in request.FILES:
+                schedule_preview(project)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
@@ -257,6 +295,7 @@ def delete_project(request, id):
             file_path = os.path.join(settings.MEDIA_ROOT, str(project.file))
             if os.path.exists(file_path):
                 os.remove(file_path)
+        delete_preview(project)
         
         project.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -266,7 +305,142 @@ def delete_project(request, id):
             status=status.HTTP_404_NOT_FOUND
         )
 
+# Envoi reprenable du fichier d'un projet (voir projects/uploads.py)
+def _upload_error_response(error):
+    data = {'error': str(error)}
+    response = Response(data, status=error.status_code)
+    if error.offset is not None:
+        data['offset'] = error.offset
+        response['Upload-Offset'] = str(error.offset)
+    return response
+
+
+def _get_own_upload(request, upload_id):
+    """Session de l'utilisateur, toujours CTD de la commune du projet ; None sinon"""
+    upload = get_object_or_404(ProjectUpload.objects.select_related('project'), pk=upload_id)
+    if (upload.created_by_id != request.user.id or request.user.role != 'ctd'
+            or request.user.commune_id != upload.project.commune_id):
+        return None
+    return upload
+
+
+@api_view(['POST'])
+@permission_classes([IsCTDOrReadOnly])
+@idempotent
+def create_project_upload(request, id):
+    """
+    Ouvre une session d'envoi par morceaux pour le fichier d'un projet.
+    Corps : filename, size (octets) et, de préférence, checksum (SHA-256 hexadécimal).
+    """
+    try:
+        project = Project.objects.get(pk=id)
+        if request.user.role != 'ctd' or request.user.commune != project.commune:
+            return Response(
+                {'error': 'Vous n\'êtes pas autorisé à modifier ce projet'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = ProjectUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        upload = create_upload(project, request.user, **serializer.validated_data)
+        response = Response(ProjectUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+        response['Location'] = reverse('project-upload', args=[upload.pk])
+        response['Upload-Offset'] = '0'
+        return response
+
+    except Project.DoesNotExist:
+        return Response(
+            {'error': 'Projet non trouvé'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET', 'PATCH', 'DELETE'])
+@permission_classes([IsCTDOrReadOnly])
+def project_upload(request, upload_id):
+    """
+    GET : état de la session (offset = octets déjà reçus).
+    PATCH : ajoute un morceau. Corps brut (application/octet-stream), en-têtes
+    Upload-Offset (position du morceau) et X-Chunk-Checksum (SHA-256, facultatif).
+    DELETE : abandonne la session.
+    """
+    try:
+        upload = _get_own_upload(request, upload_id)
+        if upload is None:
+            return Response(
+                {'error': 'Vous n\'êtes pas autorisé à accéder à cet envoi'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if request.method == 'DELETE':
+            abort_upload(upload)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if request.method == 'PATCH':
+            try:
+                offset = int(request.headers.get('Upload-Offset', ''))
+                length = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                return Response(
+                    {'error': 'En-têtes Upload-Offset et Content-Length entiers requis'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Corps lu par blocs depuis le flux : request.data n'est jamais évalué
+            upload = append_chunk(upload, offset, request.stream, length,
+                                  request.headers.get('X-Chunk-Checksum'))
+
+        response = Response(ProjectUploadSerializer(upload).data)
+        response['Upload-Offset'] = str(upload.offset)
+        return response
+
+    except UploadError as e:
+        return _upload_error_response(e)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsCTDOrReadOnly])
+def complete_project_upload(request, upload_id):
+    """Vérifie le fichier reçu et le rattache au projet"""
+    try:
+        upload = _get_own_upload(request, upload_id)
+        if upload is None:
+            return Response(
+                {'error': 'Vous n\'êtes pas autorisé à accéder à cet envoi'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        project = finalize_upload(upload)
+        upload.refresh_from_db()
+        return Response({
+            'upload': ProjectUploadSerializer(upload).data,
+            'project': ProjectListSerializer(project, context={'request': request}).data,
+        })
+
+    except UploadError as e:
+        return _upload_error_response(e)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # Accountability views
+def accountability_queryset():
+    """
+    Demandes de comptes avec, dans la même requête, le résumé du projet et sa
+    commune, le citoyen et le répondeur (voir AccountabilitySerializer).
+    """
+    accountability_fields = [field.attname for field in Accountability._meta.concrete_fields]
+    user_fields = [f'{relation}__{name}' for relation in ('citizen', 'responded_by')
+                   for name in UserBasicSerializer.Meta.fields]
+    project_fields = [f'project__{name}' for name in ProjectSummarySerializer.LOAD_FIELDS]
+    return Accountability.objects.select_related(
+        'project__commune', 'citizen', 'responded_by'
+    ).only(*accountability_fields, *project_fields, *user_fields)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def list_accountability(request):
@@ -275,20 +449,21 @@ def list_accountability(request):
     
     # Les CTD voient toutes les demandes de leur commune
     if user.role == 'ctd':
-        queryset = Accountability.objects.filter(
+        queryset = accountability_queryset().filter(
             project__commune=user.commune
-        ).select_related('project', 'citizen', 'responded_by')
+        )
     # Les citoyens ne voient que leurs propres demandes
     else: # Ceci inclut également les utilisateurs sans rôle 'ctd' ou 'citizen' défini si vous avez d'autres rôles
-        queryset = Accountability.objects.filter(
+        queryset = accountability_queryset().filter(
             citizen=user
-        ).select_related('project', 'citizen', 'responded_by')
+        )
     
     serializer = AccountabilitySerializer(queryset, many=True)
     return Response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated]) # Assurez-vous que seul un utilisateur authentifié peut créer une demande
+@idempotent
 def create_accountability(request):
     """Crée une nouvelle demande de comptes"""
     serializer = AccountabilityCreateSerializer(
@@ -305,11 +480,11 @@ def create_accountability(request):
 def accountability_detail(request, id):
     """Récupère les détails d'une demande de comptes"""
     try:
-        accountability = Accountability.objects.get(pk=id)
+        accountability = accountability_queryset().get(pk=id)
         
         # Vérifier les permissions
         if request.user.role == 'ctd':
-            if request.user.commune != accountability.project.commune:
+            if request.user.commune_id != accountability.project.commune_id:
                 return Response(
                     {'error': 'Vous n\'êtes pas autorisé à voir cette demande'},
                     status=status.HTTP_403_FORBIDDEN
@@ -333,10 +508,10 @@ def accountability_detail(request, id):
 def respond_accountability(request, id):
     """Répond à une demande de comptes"""
     try:
-        accountability = Accountability.objects.get(pk=id)
+        accountability = accountability_queryset().get(pk=id)
         
         # Vérifier que l'utilisateur est un CTD de la bonne commune
-        if request.user.role != 'ctd' or request.user.commune != accountability.project.commune:
+        if request.user.role != 'ctd' or request.user.commune_id != accountability.project.commune_id:
             return Response(
                 {'error': 'Vous n\'êtes pas autorisé à répondre à cette demande'},
                 status=status.HTTP_403_FORBIDDEN
@@ -364,6 +539,7 @@ class CommentListCreateView(generics.ListCreateAPIView):
     """
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly] 
+    pagination_class = CommentCursorPagination
 
     def get_queryset(self):
         """
@@ -388,6 +564,11 @@ class CommentListCreateView(generics.ListCreateAPIView):
         # Utiliser select_related('author') pour optimiser la récupération des données de l'auteur.
         return Comment.objects.filter(project=project).select_related('author').order_by('-created_at')
 
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        # Les nouvelles tentatives portant le même Idempotency-Key ne créent pas de second commentaire
+        return super().post(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """
         Associer le commentaire à l'utilisateur connecté et au projet spécifié.
@@ -457,4 +638,123 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
         """
         Passe le contexte de la requête au sérialiseur pour `CommentDetailView` également.
         """
-        return {'request': self.request}
\ No newline at end of file
+        return {'request': self.request}
+
+# Flux temps réel des commentaires (server-sent events, servi par ASGI)
+STREAM_HEARTBEAT = 15
+# Délai (secondes) pour ouvrir le flux avec un ticket
+STREAM_TICKET_TTL = 30
+STREAM_TICKET_SALT = 'projects.comments-stream'
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def create_comments_stream_ticket(request, project_id):
+    """
+    Ticket d'ouverture du flux des commentaires, pour EventSource qui ne peut
+    pas envoyer d'en-tête Authorization : signé, limité à ce projet et à cet
+    utilisateur, valable STREAM_TICKET_TTL secondes. Le JWT ne transite ainsi
+    jamais dans une URL (journaux d'accès, historique).
+    """
+    try:
+        project = Project.objects.only('id', 'commune_id').get(pk=project_id)
+        if request.user.commune_id != project.commune_id:
+            return Response({'error': 'Vous n\'êtes pas autorisé à suivre ce projet'},
+                            status=status.HTTP_403_FORBIDDEN)
+        # Le flux ne survit pas au jeton d'accès qui l'a ouvert
+        if request.auth is not None and 'exp' in request.auth:
+            expires_at = int(request.auth['exp'])
+        else:
+            expires_at = int(time.time() + jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+        ticket = signing.dumps({'u': request.user.pk, 'p': project.pk, 'e': expires_at}, salt=STREAM_TICKET_SALT)
+        return Response({
+            'ticket': ticket,
+            'expires_in': STREAM_TICKET_TTL,
+            'url': request.build_absolute_uri(
+                reverse('comment-stream', args=[project.pk]) + '?' + urlencode({'ticket': ticket})
+            ),
+        }, status=status.HTTP_201_CREATED)
+    except Project.DoesNotExist:
+        return Response({'error': 'Projet non trouvé'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _stream_user(request, project_id):
+    """
+    Utilisateur et expiration (timestamp) du flux, d'après l'en-tête
+    Authorization (JWT) ou le ticket ?ticket= de create_comments_stream_ticket ;
+    (None, None) si aucun n'est valide pour ce projet.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header:
+        try:
+            token = authentication.get_validated_token(authentication.get_raw_token(header))
+            return authentication.get_user(token), token['exp']
+        except (InvalidToken, AuthenticationFailed, TypeError):
+            return None, None
+
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        return None, None
+    try:
+        payload = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=STREAM_TICKET_TTL)
+    except signing.BadSignature:
+        return None, None
+    if payload.get('p') != project_id:
+        return None, None
+    user = get_user_model().objects.filter(pk=payload.get('u'), is_active=True).first()
+    return (user, payload['e']) if user is not None else (None, None)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=JSONEncoder)}\n\n"
+
+
+async def project_comments_stream(request, project_id):
+    """
+    Pousse les commentaires créés, modifiés et supprimés d'un projet
+    (événements created / updated / deleted, données de CommentSerializer).
+    Le flux se ferme à l'expiration du jeton ou si le client ne suit pas
+    (événement overflow) : le client recharge alors la liste et se reconnecte.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Flux disponible uniquement sous ASGI (backend.asgi)'},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+    user, expires_at = await sync_to_async(_stream_user)(request, project_id)
+    if user is None:
+        return JsonResponse({'error': 'Authentification requise'}, status=status.HTTP_401_UNAUTHORIZED)
+    project = await Project.objects.only('id', 'commune_id').filter(pk=project_id).afirst()
+    if project is None:
+        return JsonResponse({'error': 'Projet non trouvé'}, status=status.HTTP_404_NOT_FOUND)
+    if user.commune_id != project.commune_id:
+        return JsonResponse({'error': 'Vous n\'êtes pas autorisé à suivre ce projet'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+    subscription = get_broker().subscribe(comments_channel(project.pk))
+
+    async def events():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                remaining = expires_at - time.time()
+                if remaining <= 0:
+                    yield _sse('expired', None)
+                    return
+                message = await subscription.get(timeout=min(STREAM_HEARTBEAT, remaining))
+                if message is None:
+                    # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                    yield ': ping\n\n'
+                    continue
+                yield _sse(message['event'], message['data'])
+                if message['event'] == OVERFLOW['event']:
+                    return
+        finally:
+            await subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Désactive la mise en tampon de nginx pour ce flux
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,59 @@
+#signalement/bulk.py
+"""
+Mises à jour groupées de signalements. queryset.update() n'émet pas de
+signaux et n'applique pas auto_now : compteurs, carte de chaleur, historique
+des statuts, scores de priorité, traces de sortie de périmètre et updated_at
+sont donc maintenus explicitement.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import counter_key, record_transitions
+from .heatmap import heatmap_key, record_heatmap_transitions
+from .history import record_status_changes
+from .models import Signalement
+from .priority import refresh_priorities
+from .signals import record_scope_exits
+
+TRACKED_COLUMNS = ('id', 'utilisateur_id') + Signalement.TRACKED_FIELDS
+
+
+def update_statut_bulk(ids, statut, user=None, commune_id=None, date_resolution=None):
+    """
+    Passe au statut donné les signalements `ids` (limités à `commune_id` si
+    fourni) en un seul UPDATE. Les signalements déjà dans ce statut ne sont
+    pas réécrits. Retourne la liste triée des ids modifiés.
+    """
+    scope = Signalement.objects.all()
+    if commune_id is not None:
+        scope = scope.filter(commune_id=commune_id)
+
+    values = {'statut': statut, 'updated_at': timezone.now()}
+    if statut == 'traite':
+        values['date_resolution'] = date_resolution or values['updated_at']
+    elif date_resolution is not None:
+        values['date_resolution'] = date_resolution
+
+    with transaction.atomic():
+        # Verrouille les lignes visées pour connaître leurs valeurs avant modification
+        rows = list(
+            scope.filter(id__in=ids).exclude(statut=statut)
+            .select_for_update().order_by('id').values(*TRACKED_COLUMNS)
+        )
+        if not rows:
+            return []
+        affected_ids = [row['id'] for row in rows]
+        scope.filter(id__in=affected_ids).update(**values)
+
+        transitions, heatmap_transitions, changes = [], [], []
+        for row in rows:
+            new_row = dict(row, statut=statut)
+            transitions.append((counter_key(row), counter_key(new_row)))
+            heatmap_transitions.append((heatmap_key(row), heatmap_key(new_row)))
+            changes.append((Signalement(id=row['id'], statut=statut), row['statut']))
+        record_transitions(transitions)
+        record_heatmap_transitions(heatmap_transitions)
+        record_status_changes(changes, user)
+        record_scope_exits(rows)
+        refresh_priorities(affected_ids)
+    return affected_ids
@@ -0,0 +1,116 @@
+#signalement/counters.py
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Signalement, SignalementCompteur
+
+
+def counter_key(values):
+    """Clé (commune_id, statut, type_signalement) à partir d'un dict de valeurs"""
+    return (values.get('commune_id'), values.get('statut'), values.get('type_signalement'))
+
+
+def instance_key(signalement):
+    return (signalement.commune_id, signalement.statut, signalement.type_signalement)
+
+
+def adjust_counter(key, delta):
+    """Incrémente (ou décrémente) atomiquement le compteur d'une clé avec F()"""
+    if not delta:
+        return
+    commune_id, statut, type_signalement = key
+    counters = SignalementCompteur.objects.filter(
+        commune_id=commune_id, statut=statut, type_signalement=type_signalement
+    )
+    if counters.update(total=F('total') + delta):
+        return
+    try:
+        with transaction.atomic():
+            SignalementCompteur.objects.create(
+                commune_id=commune_id, statut=statut,
+                type_signalement=type_signalement, total=delta
+            )
+    except IntegrityError:
+        # Ligne créée entre-temps par une requête concurrente
+        counters.update(total=F('total') + delta)
+
+
+def apply_deltas(deltas):
+    """Applique un ensemble de variations {clé: delta} dans une même transaction"""
+    with transaction.atomic():
+        for key, delta in sorted(deltas.items(), key=lambda item: tuple(str(v) for v in item[0])):
+            adjust_counter(key, delta)
+
+
+def record_transitions(transitions):
+    """
+    Enregistre une liste de transitions (ancienne_clé, nouvelle_clé).
+    Une clé None signifie une création (ancienne) ou une suppression (nouvelle).
+    Les variations sont regroupées pour limiter le nombre d'UPDATE.
+    """
+    deltas = Counter()
+    for old_key, new_key in transitions:
+        if old_key == new_key:
+            continue
+        if old_key is not None:
+            deltas[old_key] -= 1
+        if new_key is not None:
+            deltas[new_key] += 1
+    apply_deltas(deltas)
+
+
+def read_cross_tab(commune=None):
+    """
+    Lit le tableau croisé statut × type depuis les compteurs.
+    Le coût est borné par le nombre de statuts et de types, pas par le volume.
+    """
+    counters = SignalementCompteur.objects.all()
+    if commune is not None:
+        counters = counters.filter(commune=commune)
+    rows = counters.values('statut', 'type_signalement').annotate(n=Sum('total')).order_by()
+    return {(row['statut'], row['type_signalement']): row['n'] for row in rows}
+
+
+def compute_expected_counters():
+    """Recalcule les compteurs attendus directement depuis la table Signalement"""
+    rows = (
+        Signalement.objects.order_by()
+        .values('commune_id', 'statut', 'type_signalement')
+        .annotate(n=Count('id'))
+    )
+    return {counter_key(row): row['n'] for row in rows}
+
+
+def read_counters():
+    rows = (
+        SignalementCompteur.objects.order_by()
+        .values('commune_id', 'statut', 'type_signalement')
+        .annotate(n=Sum('total'))
+    )
+    return {counter_key(row): row['n'] for row in rows if row['n']}
+
+
+def verify_counters():
+    """Retourne les écarts {clé: (attendu, stocké)} entre compteurs et données réelles"""
+    expected = compute_expected_counters()
+    stored = read_counters()
+    return {
+        key: (expected.get(key, 0), stored.get(key, 0))
+        for key in set(expected) | set(stored)
+        if expected.get(key, 0) != stored.get(key, 0)
+    }
+
+
+def rebuild_counters():
+    """Reconstruit entièrement la table des compteurs"""
+    with transaction.atomic():
+        expected = compute_expected_counters()
+        SignalementCompteur.objects.all().delete()
+        SignalementCompteur.objects.bulk_create([
+            SignalementCompteur(commune_id=commune_id, statut=statut,
+                                type_signalement=type_signalement, total=total)
+            for (commune_id, statut, type_signalement), total in expected.items()
+        ])
+    return len(expected)
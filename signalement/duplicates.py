@@ -0,0 +1,162 @@
+#signalement/duplicates.py
+"""
+Détection des quasi-doublons.
+
+Le texte (objet + description) est normalisé puis découpé en 4-grammes de
+caractères ; sa signature MinHash (NUM_PERM valeurs) est découpée en BANDS
+bandes indexées (LSH). Une recherche ne lit que les signalements partageant au
+moins une bande, puis ne retient que ceux du même type, de la même commune,
+créés dans la fenêtre DUPLICATE_WINDOW et situés à moins de DUPLICATE_RADIUS_M
+mètres, dont la similarité estimée atteint DUPLICATE_THRESHOLD.
+"""
+import random
+import re
+import unicodedata
+import zlib
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .geo import haversine_m
+from .models import Signalement, SignalementBande, SignalementEmpreinte
+
+SHINGLE_SIZE = 4
+NUM_PERM = 32
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+DUPLICATE_THRESHOLD = 0.5
+DUPLICATE_WINDOW = timedelta(hours=48)
+DUPLICATE_RADIUS_M = 500
+
+_PRIME = (1 << 61) - 1
+_MASK = 0xFFFFFFFF
+# Permutations fixes : les signatures doivent rester comparables d'une exécution à l'autre
+_rng = random.Random(20240101)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(WORD_RE.findall(text))
+
+
+def shingles(objet, description):
+    text = _normalize(f"{objet or ''} {description or ''}")
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(objet, description):
+    """Signature MinHash (liste de NUM_PERM entiers de 32 bits)"""
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(objet, description)]
+    if not hashes:
+        return [_MASK] * NUM_PERM
+    return [min(((a * h + b) % _PRIME) & _MASK for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def encode_signature(signature):
+    return ''.join('%08x' % value for value in signature)
+
+
+def decode_signature(encoded):
+    return [int(encoded[i:i + 8], 16) for i in range(0, len(encoded), 8)]
+
+
+def band_values(signature):
+    """Une valeur signée 64 bits par bande (ROWS_PER_BAND valeurs de 32 bits)"""
+    values = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        value = zlib.crc32(encode_signature(rows).encode()) << 32 | rows[0]
+        values.append(value - (1 << 64) if value >= 1 << 63 else value)
+    return values
+
+
+def similarity(signature_a, signature_b):
+    """Estimation de la similarité de Jaccard des deux textes"""
+    return sum(a == b for a, b in zip(signature_a, signature_b)) / NUM_PERM
+
+
+def index_signalements(signalements):
+    """(Ré)écrit empreintes et bandes des signalements donnés. Retourne {id: signature}."""
+    signatures = {s.pk: minhash(s.objet, s.description) for s in signalements}
+    if not signatures:
+        return signatures
+    with transaction.atomic():
+        SignalementBande.objects.filter(signalement_id__in=signatures).delete()
+        SignalementEmpreinte.objects.filter(signalement_id__in=signatures).delete()
+        SignalementEmpreinte.objects.bulk_create([
+            SignalementEmpreinte(signalement_id=pk, signature=encode_signature(signature))
+            for pk, signature in signatures.items()
+        ])
+        SignalementBande.objects.bulk_create([
+            SignalementBande(signalement_id=pk, bande=band, valeur=value)
+            for pk, signature in signatures.items()
+            for band, value in enumerate(band_values(signature))
+        ])
+    return signatures
+
+
+def find_duplicate(signalement, signature=None):
+    """
+    Signalement antérieur dont `signalement` est vraisemblablement un doublon,
+    ou None. Requête indexée sur les bandes, filtrée par type, commune et date.
+    """
+    signature = signature or minhash(signalement.objet, signalement.description)
+    bands_q = Q()
+    for band, value in enumerate(band_values(signature)):
+        bands_q |= Q(bande=band, valeur=value)
+
+    reference = signalement.date_signalement or timezone.now()
+    candidates = (
+        Signalement.objects
+        .filter(
+            id__in=SignalementBande.objects.filter(bands_q).values('signalement_id'),
+            type_signalement=signalement.type_signalement,
+            commune_id=signalement.commune_id,
+            date_signalement__gte=reference - DUPLICATE_WINDOW,
+            date_signalement__lte=reference,
+            pk__lt=signalement.pk,
+        )
+        .select_related('empreinte')
+        .only('id', 'doublon_de_id', 'latitude', 'longitude', 'date_signalement', 'empreinte__signature')
+    )
+
+    best, best_score = None, DUPLICATE_THRESHOLD
+    for candidate in candidates:
+        if signalement.latitude is not None and candidate.latitude is not None:
+            distance = haversine_m(signalement.latitude, signalement.longitude,
+                                   candidate.latitude, candidate.longitude)
+            if distance > DUPLICATE_RADIUS_M:
+                continue
+        score = similarity(signature, decode_signature(candidate.empreinte.signature))
+        if score >= best_score:
+            best, best_score = candidate, score
+    return best
+
+
+def attach_duplicate(signalement, candidate):
+    """Rattache `signalement` au groupe de `candidate` (toujours au signalement principal)"""
+    root_id = candidate.doublon_de_id or candidate.pk
+    now = timezone.now()
+    Signalement.objects.filter(pk=signalement.pk).update(doublon_de_id=root_id, updated_at=now)
+    Signalement.objects.filter(pk=root_id).update(nombre_doublons=F('nombre_doublons') + 1, updated_at=now)
+    signalement.doublon_de_id = root_id
+    signalement.updated_at = now
+    return root_id
+
+
+def detect_duplicates(signalements):
+    """Indexe les nouveaux signalements puis rattache ceux qui sont des doublons"""
+    signatures = index_signalements(signalements)
+    with transaction.atomic():
+        for signalement in signalements:
+            candidate = find_duplicate(signalement, signatures[signalement.pk])
+            if candidate is not None:
+                attach_duplicate(signalement, candidate)
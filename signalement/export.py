@@ -0,0 +1,56 @@
+#signalement/export.py
+import csv
+import json
+
+EXPORT_FIELDS = [
+    'id', 'objet', 'description', 'date_signalement', 'date_resolution',
+    'statut', 'type_signalement', 'localisation', 'latitude', 'longitude',
+    'commune_id', 'commune__nom', 'utilisateur_id', 'utilisateur__email',
+]
+CHUNK_SIZE = 2000
+# Premiers caractères interprétés comme une formule par les tableurs
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer renvoie directement la ligne formatée"""
+    def write(self, value):
+        return value
+
+
+def _serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _csv_cell(value):
+    """Neutralise l'injection de formules (CSV injection) dans les textes saisis"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _rows(queryset):
+    """Parcourt le queryset par paquets en ne projetant que les colonnes exportées"""
+    for row in queryset.order_by('id').values(*EXPORT_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+        yield {field: _serialize(row[field]) for field in EXPORT_FIELDS}
+
+
+def stream_csv(queryset):
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM pour l'ouverture correcte des accents dans les tableurs
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in _rows(queryset):
+        yield writer.writerow([_csv_cell(row[field]) for field in EXPORT_FIELDS])
+
+
+def stream_ndjson(queryset):
+    for row in _rows(queryset):
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
@@ -0,0 +1,167 @@
+#signalement/geo.py
+import math
+
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Value
+from django.db.models.functions import Cos, Power, Radians, Sin
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Précision 8 : cellules d'environ 38 m × 19 m
+GEOHASH_PRECISION = 8
+# Nombre maximal de cellules utilisées pour couvrir une zone de recherche
+MAX_COVER_CELLS = 32
+EARTH_RADIUS_M = 6371008.8
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode une position en geohash (cellule de grille indexable par préfixe)"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    code = []
+    bit, char, even = 0, 0, True
+    while len(code) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            char = (char << 1) | 1
+            rng[0] = mid
+        else:
+            char <<= 1
+            rng[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            code.append(GEOHASH_ALPHABET[char])
+            bit, char = 0, 0
+    return ''.join(code)
+
+
+def _cell_size(precision):
+    """Dimensions (hauteur en latitude, largeur en longitude) d'une cellule en degrés"""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def cover_bbox(min_lat, min_lon, max_lat, max_lon):
+    """
+    Liste de préfixes geohash couvrant la boîte, à la précision la plus fine
+    qui reste sous MAX_COVER_CELLS cellules.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(precision)
+        j0 = math.floor((min_lat + 90) / height)
+        j1 = math.floor((min(max_lat, 90 - 1e-9) + 90) / height)
+        i0 = math.floor((min_lon + 180) / width)
+        i1 = math.floor((min(max_lon, 180 - 1e-9) + 180) / width)
+        if (j1 - j0 + 1) * (i1 - i0 + 1) <= MAX_COVER_CELLS:
+            return sorted({
+                encode_geohash(-90 + (j + 0.5) * height, -180 + (i + 0.5) * width, precision)
+                for j in range(j0, j1 + 1)
+                for i in range(i0, i1 + 1)
+            })
+    return []
+
+
+def cells_q(prefixes, field='geo_cell'):
+    """Filtre par plages de préfixes, exploitable par l'index B-tree de la colonne"""
+    q = Q()
+    for prefix in prefixes:
+        upper = prefix + GEOHASH_ALPHABET[-1] * (GEOHASH_PRECISION - len(prefix))
+        q |= Q(**{f'{field}__range': (prefix, upper)})
+    return q
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distance orthodromique en mètres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(latitude, longitude, radius_m):
+    """Boîte englobante (min_lat, min_lon, max_lat, max_lon) d'un cercle"""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    dlon = min(180.0, math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)))
+    return (
+        max(-90.0, latitude - dlat), max(-180.0, longitude - dlon),
+        min(90.0, latitude + dlat), min(180.0, longitude + dlon),
+    )
+
+
+def filter_bbox(queryset, min_lat, min_lon, max_lat, max_lon):
+    """Élague par cellules indexées puis applique le test exact sur les coordonnées"""
+    return queryset.filter(
+        cells_q(cover_bbox(min_lat, min_lon, max_lat, max_lon)),
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lon, max_lon),
+    )
+
+
+def haversine_term(latitude, longitude, lat_field='latitude', lon_field='longitude'):
+    """
+    Expression SQL du terme a = sin²(Δφ/2) + cos φ1 cos φ2 sin²(Δλ/2) de la
+    formule de haversine ; la distance vaut 2R·asin(√a), croissante en a.
+    """
+    phi1, lambda1 = math.radians(latitude), math.radians(longitude)
+    phi2, lambda2 = Radians(F(lat_field)), Radians(F(lon_field))
+    return ExpressionWrapper(
+        Power(Sin((phi2 - Value(phi1)) / Value(2.0)), 2)
+        + Value(math.cos(phi1)) * Cos(phi2) * Power(Sin((lambda2 - Value(lambda1)) / Value(2.0)), 2),
+        output_field=FloatField(),
+    )
+
+
+def filter_radius(queryset, latitude, longitude, radius_m):
+    """
+    Signalements à moins de radius_m mètres du point donné : élagage par
+    cellules et boîte englobante, puis test exact de haversine, le tout en SQL.
+    """
+    candidates = filter_bbox(queryset, *radius_bbox(latitude, longitude, radius_m))
+    # d <= r  <=>  a <= sin²(r / 2R), valable tant que r <= πR
+    threshold = math.sin(min(radius_m / (2 * EARTH_RADIUS_M), math.pi / 2)) ** 2
+    return candidates.alias(
+        haversine_a=haversine_term(latitude, longitude)
+    ).filter(haversine_a__lte=threshold)
+
+
+def _parse_floats(value, count):
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != count or not all(math.isfinite(part) for part in parts):
+        raise ValueError
+    return parts
+
+
+def apply_spatial_filters(queryset, params):
+    """
+    Filtres spatiaux optionnels :
+      ?bbox=min_lon,min_lat,max_lon,max_lat (ordre GeoJSON)
+      ?lat=&lon=&radius=  (rayon en mètres)
+    Lève ValueError si les paramètres sont invalides.
+    """
+    bbox = params.get('bbox')
+    if bbox:
+        try:
+            min_lon, min_lat, max_lon, max_lat = _parse_floats(bbox, 4)
+        except ValueError:
+            raise ValueError('Paramètre bbox invalide (attendu: min_lon,min_lat,max_lon,max_lat)')
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError('Paramètre bbox invalide (bornes inversées)')
+        queryset = filter_bbox(queryset, min_lat, min_lon, max_lat, max_lon)
+
+    radius = params.get('radius')
+    if radius:
+        try:
+            latitude = float(params.get('lat'))
+            longitude = float(params.get('lon'))
+            radius_m = float(radius)
+        except (TypeError, ValueError):
+            raise ValueError('Paramètres lat, lon et radius requis pour une recherche par rayon')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or not 0 < radius_m <= 500000:
+            raise ValueError('Paramètres lat, lon ou radius hors limites')
+        queryset = filter_radius(queryset, latitude, longitude, radius_m)
+
+    return queryset
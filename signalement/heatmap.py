@@ -0,0 +1,173 @@
+#signalement/heatmap.py
+"""
+Pyramide de tuiles pour la carte de chaleur.
+
+Une tuile z/x/y (schéma XYZ web mercator) est découpée en 2^CELL_BITS × 2^CELL_BITS
+cellules, qui sont les tuiles du niveau z + CELL_BITS. Chaque signalement
+géolocalisé est compté dans une cellule par niveau servi ; une tuile se lit
+donc en une requête bornée à (2^CELL_BITS)² cellules × statuts × types.
+"""
+import math
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from .models import HeatmapCell, Signalement
+
+MIN_ZOOM = 0
+MAX_ZOOM = 14
+CELL_BITS = 3
+CELL_ZOOMS = range(MIN_ZOOM + CELL_BITS, MAX_ZOOM + CELL_BITS + 1)
+MAX_LATITUDE = 85.05112878
+# Nombre de cellules par UPDATE (limite de profondeur d'expression de SQLite)
+UPDATE_CHUNK = 100
+
+
+def tile_xy(latitude, longitude, zoom):
+    """Coordonnées de la tuile XYZ contenant le point au niveau donné"""
+    n = 1 << zoom
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    lat_rad = math.radians(latitude)
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def heatmap_key(values):
+    """Clé (latitude, longitude, statut, type_signalement), None sans coordonnées"""
+    if values.get('latitude') is None or values.get('longitude') is None:
+        return None
+    return (values['latitude'], values['longitude'], values.get('statut'), values.get('type_signalement'))
+
+
+def instance_heatmap_key(signalement):
+    return heatmap_key(signalement.__dict__)
+
+
+def cell_deltas(transitions):
+    """Variations {(zoom, x, y, statut, type): delta} pour des transitions (ancienne_clé, nouvelle_clé)"""
+    deltas = Counter()
+    for old_key, new_key in transitions:
+        if old_key == new_key:
+            continue
+        for key, sign in ((old_key, -1), (new_key, 1)):
+            if key is None:
+                continue
+            latitude, longitude, statut, type_signalement = key
+            for zoom in CELL_ZOOMS:
+                x, y = tile_xy(latitude, longitude, zoom)
+                deltas[(zoom, x, y, statut, type_signalement)] += sign
+    return deltas
+
+
+def _cells_q(cells):
+    q = Q()
+    for zoom, x, y in cells:
+        q |= Q(zoom=zoom, x=x, y=y)
+    return q
+
+
+def _adjust_cell(cell, statut, type_signalement, delta):
+    zoom, x, y = cell
+    rows = HeatmapCell.objects.filter(zoom=zoom, x=x, y=y, statut=statut, type_signalement=type_signalement)
+    if rows.update(total=F('total') + delta):
+        return
+    try:
+        with transaction.atomic():
+            HeatmapCell.objects.create(zoom=zoom, x=x, y=y, statut=statut,
+                                       type_signalement=type_signalement, total=delta)
+    except IntegrityError:
+        rows.update(total=F('total') + delta)
+
+
+def apply_cell_deltas(deltas):
+    """
+    Applique les variations avec F() : un UPDATE par (statut, type, delta) et
+    par lot de cellules ; les cellules manquantes sont créées.
+    """
+    groups = defaultdict(list)
+    for (zoom, x, y, statut, type_signalement), delta in deltas.items():
+        if delta:
+            groups[(statut, type_signalement, delta)].append((zoom, x, y))
+
+    with transaction.atomic():
+        for (statut, type_signalement, delta), cells in sorted(groups.items(), key=lambda item: str(item[0])):
+            cells.sort()
+            for start in range(0, len(cells), UPDATE_CHUNK):
+                chunk = cells[start:start + UPDATE_CHUNK]
+                rows = HeatmapCell.objects.filter(statut=statut, type_signalement=type_signalement)
+                if rows.filter(_cells_q(chunk)).update(total=F('total') + delta) == len(chunk):
+                    continue
+                existing = set(rows.filter(_cells_q(chunk)).values_list('zoom', 'x', 'y'))
+                missing = [cell for cell in chunk if cell not in existing]
+                try:
+                    with transaction.atomic():
+                        HeatmapCell.objects.bulk_create([
+                            HeatmapCell(zoom=zoom, x=x, y=y, statut=statut,
+                                        type_signalement=type_signalement, total=delta)
+                            for zoom, x, y in missing
+                        ])
+                except IntegrityError:
+                    # Cellules créées entre-temps par une requête concurrente
+                    for cell in missing:
+                        _adjust_cell(cell, statut, type_signalement, delta)
+
+
+def record_heatmap_transitions(transitions):
+    """Enregistre une liste de transitions (ancienne_clé, nouvelle_clé) ; None = absente"""
+    apply_cell_deltas(cell_deltas(transitions))
+
+
+def read_tile(zoom, x, y, statut=None, type_signalement=None):
+    """
+    Cellules non vides de la tuile z/x/y :
+    [{x, y, total, par_statut, par_type}] (coordonnées au niveau zoom + CELL_BITS).
+    """
+    size = 1 << CELL_BITS
+    rows = HeatmapCell.objects.filter(
+        zoom=zoom + CELL_BITS,
+        x__range=(x * size, x * size + size - 1),
+        y__range=(y * size, y * size + size - 1),
+        total__gt=0,
+    )
+    if statut:
+        rows = rows.filter(statut=statut)
+    if type_signalement:
+        rows = rows.filter(type_signalement=type_signalement)
+
+    cells = {}
+    for cell_x, cell_y, row_statut, row_type, total in rows.order_by().values_list(
+        'x', 'y', 'statut', 'type_signalement', 'total'
+    ):
+        cell = cells.setdefault((cell_x, cell_y), {
+            'x': cell_x, 'y': cell_y, 'total': 0, 'par_statut': {}, 'par_type': {},
+        })
+        cell['total'] += total
+        cell['par_statut'][row_statut] = cell['par_statut'].get(row_statut, 0) + total
+        cell['par_type'][row_type] = cell['par_type'].get(row_type, 0) + total
+    return [cells[key] for key in sorted(cells)]
+
+
+def compute_expected_cells(signalements=None):
+    """Recalcule les cellules attendues à partir des signalements géolocalisés"""
+    signalements = Signalement.objects.all() if signalements is None else signalements
+    rows = signalements.filter(latitude__isnull=False, longitude__isnull=False).order_by().values_list(
+        'latitude', 'longitude', 'statut', 'type_signalement'
+    )
+    return cell_deltas((None, row) for row in rows.iterator(chunk_size=2000))
+
+
+def rebuild_heatmap():
+    """Reconstruit entièrement la pyramide"""
+    with transaction.atomic():
+        expected = compute_expected_cells()
+        HeatmapCell.objects.all().delete()
+        HeatmapCell.objects.bulk_create(
+            [
+                HeatmapCell(zoom=zoom, x=x, y=y, statut=statut, type_signalement=type_signalement, total=total)
+                for (zoom, x, y, statut, type_signalement), total in expected.items()
+            ],
+            batch_size=2000,
+        )
+    return len(expected)
@@ -0,0 +1,129 @@
+#signalement/history.py
+"""
+Historique des statuts et délais de traitement.
+
+Délai de prise en charge : de la création du signalement à sa première sortie
+du statut 'en_attente'. Délai de résolution : de la création au premier passage
+au statut 'traite'. Les médianes et 90e centiles (rang le plus proche) sont
+calculés en SQL par fonctions de fenêtrage, par commune et par type.
+"""
+from django.db import connection
+from django.utils import timezone
+
+from .models import Signalement, SignalementStatutHistorique
+
+HISTORY_TABLE = SignalementStatutHistorique._meta.db_table
+SIGNALEMENT_TABLE = Signalement._meta.db_table
+METRICS = ('prise_en_charge', 'resolution')
+
+
+def record_status_changes(changes, user=None):
+    """
+    Ajoute au journal les transitions [(signalement, ancien_statut)] dont le
+    statut a effectivement changé. À appeler dans la transaction de la mise à jour.
+    """
+    now = timezone.now()
+    user_id = getattr(user, 'pk', None)
+    SignalementStatutHistorique.objects.bulk_create([
+        SignalementStatutHistorique(
+            signalement_id=signalement.pk,
+            ancien_statut=ancien_statut,
+            nouveau_statut=signalement.statut,
+            modifie_par_id=user_id,
+            date_changement=now,
+        )
+        for signalement, ancien_statut in changes
+        if ancien_statut != signalement.statut
+    ])
+
+
+def _seconds_between(end, start):
+    """Expression SQL de la durée en secondes entre deux colonnes date-heure"""
+    if connection.vendor == 'sqlite':
+        return f"(julianday({end}) - julianday({start})) * 86400.0"
+    if connection.vendor == 'postgresql':
+        return f"EXTRACT(EPOCH FROM ({end} - {start}))"
+    return f"TIMESTAMPDIFF(SECOND, {start}, {end})"
+
+
+def compute_delays(commune_id=None, type_signalement=None, date_from=None, date_to=None):
+    """
+    Médiane et 90e centile des délais (en secondes) par (commune, type), sur
+    les signalements créés dans la fenêtre donnée. Une seule requête.
+    Retourne [{commune_id, type_signalement, metrique, nombre, mediane, p90}].
+    """
+    conditions, params = [], []
+    if commune_id is not None:
+        conditions.append("s.commune_id = %s")
+        params.append(commune_id)
+    if type_signalement:
+        conditions.append("s.type_signalement = %s")
+        params.append(type_signalement)
+    if date_from is not None:
+        conditions.append("s.date_signalement >= %s")
+        params.append(connection.ops.adapt_datetimefield_value(date_from))
+    if date_to is not None:
+        conditions.append("s.date_signalement <= %s")
+        params.append(connection.ops.adapt_datetimefield_value(date_to))
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    sql = f"""
+        WITH jalons AS (
+            SELECT signalement_id,
+                   MIN(CASE WHEN ancien_statut = 'en_attente' AND nouveau_statut <> 'en_attente'
+                            THEN date_changement END) AS prise_en_charge,
+                   MIN(CASE WHEN nouveau_statut = 'traite' THEN date_changement END) AS resolution
+            FROM {HISTORY_TABLE}
+            GROUP BY signalement_id
+        ),
+        durees AS (
+            SELECT s.commune_id, s.type_signalement, 'prise_en_charge' AS metrique,
+                   {_seconds_between('j.prise_en_charge', 's.date_signalement')} AS duree
+            FROM {SIGNALEMENT_TABLE} s JOIN jalons j ON j.signalement_id = s.id
+            {where} {'AND' if where else 'WHERE'} j.prise_en_charge IS NOT NULL
+            UNION ALL
+            SELECT s.commune_id, s.type_signalement, 'resolution' AS metrique,
+                   {_seconds_between('j.resolution', 's.date_signalement')} AS duree
+            FROM {SIGNALEMENT_TABLE} s JOIN jalons j ON j.signalement_id = s.id
+            {where} {'AND' if where else 'WHERE'} j.resolution IS NOT NULL
+        ),
+        rangs AS (
+            SELECT commune_id, type_signalement, metrique, duree,
+                   ROW_NUMBER() OVER (PARTITION BY commune_id, type_signalement, metrique ORDER BY duree) AS rn,
+                   COUNT(*) OVER (PARTITION BY commune_id, type_signalement, metrique) AS n
+            FROM durees
+        )
+        SELECT commune_id, type_signalement, metrique, n,
+               MIN(CASE WHEN rn >= 0.5 * n THEN duree END) AS mediane,
+               MIN(CASE WHEN rn >= 0.9 * n THEN duree END) AS p90
+        FROM rangs
+        GROUP BY commune_id, type_signalement, metrique, n
+        ORDER BY commune_id, type_signalement, metrique
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params * 2)
+        return [
+            {
+                'commune_id': commune, 'type_signalement': type_code, 'metrique': metrique,
+                'nombre': n, 'mediane': round(float(mediane), 1), 'p90': round(float(p90), 1),
+            }
+            for commune, type_code, metrique, n, mediane, p90 in cursor.fetchall()
+        ]
+
+
+def format_delays(rows, commune_names=None):
+    """Regroupe les lignes par (commune, type) avec une entrée par métrique"""
+    commune_names = commune_names or {}
+    groups = {}
+    for row in rows:
+        key = (row['commune_id'], row['type_signalement'])
+        group = groups.setdefault(key, {
+            'commune_id': row['commune_id'],
+            'commune_nom': commune_names.get(row['commune_id']),
+            'type_signalement': row['type_signalement'],
+            **{metrique: None for metrique in METRICS},
+        })
+        group[row['metrique']] = {
+            'nombre': row['nombre'], 'mediane_secondes': row['mediane'], 'p90_secondes': row['p90'],
+        }
+    return list(groups.values())
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from photos.models import Photo
+from signalement.heatmap import instance_heatmap_key, record_heatmap_transitions
+from signalement.models import Signalement
+from signalement.priority import refresh_priorities
+
+
+class Command(BaseCommand):
+    help = (
+        "Renseigne latitude/longitude des signalements à partir de leur photo "
+        "et recalcule les cellules geohash manquantes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # 1. Coordonnées reprises des photos liées
+        filled = 0
+        pending = Signalement.objects.filter(latitude__isnull=True, photo_id__isnull=False).order_by('id')
+        last_id = 0
+        while True:
+            batch = list(pending.filter(id__gt=last_id).only('id', 'photo_id', 'statut', 'type_signalement')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            photos = Photo.objects.only('id', 'latitude', 'longitude').in_bulk(
+                {signalement.photo_id for signalement in batch}
+            )
+            updated = []
+            for signalement in batch:
+                photo = photos.get(signalement.photo_id)
+                if photo is None:
+                    continue
+                signalement.latitude = photo.latitude
+                signalement.longitude = photo.longitude
+                signalement.update_geo_cell()
+                # bulk_update n'applique pas auto_now : on signale la modification aux clients
+                signalement.updated_at = timezone.now()
+                updated.append(signalement)
+            Signalement.objects.bulk_update(updated, ['latitude', 'longitude', 'geo_cell', 'updated_at'])
+            # Sans signaux : les signalements nouvellement géolocalisés entrent dans la carte de chaleur
+            record_heatmap_transitions([(None, instance_heatmap_key(signalement)) for signalement in updated])
+            refresh_priorities([signalement.pk for signalement in updated])
+            filled += len(updated)
+
+        # 2. Cellules manquantes pour les signalements déjà géolocalisés
+        recomputed = 0
+        missing = Signalement.objects.filter(latitude__isnull=False, longitude__isnull=False, geo_cell='').order_by('id')
+        last_id = 0
+        while True:
+            batch = list(missing.filter(id__gt=last_id).only('id', 'latitude', 'longitude')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for signalement in batch:
+                signalement.update_geo_cell()
+            Signalement.objects.bulk_update(batch, ['geo_cell'])
+            recomputed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{filled} signalement(s) géolocalisé(s) depuis leur photo, "
+            f"{recomputed} cellule(s) recalculée(s)"
+        ))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from signalement.duplicates import attach_duplicate, find_duplicate, index_signalements
+from signalement.models import Signalement
+
+
+class Command(BaseCommand):
+    help = (
+        "Construit l'index MinHash des signalements existants ; avec --group, "
+        "recalcule aussi les groupes de quasi-doublons"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--group', action='store_true',
+            help="Réinitialise puis recalcule les groupes, dans l'ordre de création"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        group = options['group']
+
+        if group:
+            Signalement.objects.exclude(doublon_de=None, nombre_doublons=0).update(
+                doublon_de=None, nombre_doublons=0, updated_at=timezone.now()
+            )
+
+        indexed = grouped = 0
+        queryset = Signalement.objects.order_by('id').only(
+            'id', 'objet', 'description', 'type_signalement', 'commune_id',
+            'date_signalement', 'latitude', 'longitude'
+        )
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            with transaction.atomic():
+                signatures = index_signalements(batch)
+                indexed += len(batch)
+                if group:
+                    # Les candidats sont toujours antérieurs : un signalement est traité
+                    # avant de pouvoir devenir le principal d'un groupe
+                    for signalement in batch:
+                        candidate = find_duplicate(signalement, signatures[signalement.pk])
+                        if candidate is not None:
+                            attach_duplicate(signalement, candidate)
+                            grouped += 1
+
+        message = f"{indexed} signalement(s) indexé(s)"
+        if group:
+            message += f", {grouped} doublon(s) regroupé(s)"
+        self.stdout.write(self.style.SUCCESS(message))
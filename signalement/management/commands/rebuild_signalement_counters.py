@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from signalement.counters import rebuild_counters, verify_counters
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les compteurs de signalements par commune, statut et type, puis les vérifie"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Vérifie seulement les compteurs sans les reconstruire",
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            total = rebuild_counters()
+            self.stdout.write(f"{total} compteur(s) reconstruit(s)")
+
+        differences = verify_counters()
+        if differences:
+            for (commune_id, statut, type_signalement), (expected, stored) in sorted(
+                differences.items(), key=lambda item: tuple(str(v) for v in item[0])
+            ):
+                self.stderr.write(
+                    f"commune={commune_id} statut={statut} type={type_signalement} : "
+                    f"attendu {expected}, stocké {stored}"
+                )
+            raise CommandError(f"{len(differences)} compteur(s) incohérent(s)")
+
+        self.stdout.write(self.style.SUCCESS("Compteurs cohérents"))
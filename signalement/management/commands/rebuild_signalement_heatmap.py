@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from signalement.heatmap import rebuild_heatmap
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la pyramide de la carte de chaleur à partir des signalements géolocalisés"
+
+    def handle(self, *args, **options):
+        total = rebuild_heatmap()
+        self.stdout.write(self.style.SUCCESS(f"{total} cellule(s) reconstruite(s)"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from signalement.priority import recompute_all_priorities
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le score de priorité des signalements ouverts "
+        "(à planifier périodiquement : la composante d'âge évolue avec le temps)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        updated, closed = recompute_all_priorities(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} signalement(s) ouvert(s) rescoré(s), {closed} score(s) remis à zéro"
+        ))
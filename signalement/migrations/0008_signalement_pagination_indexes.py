@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 04:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communes', '0003_commune_latitude_commune_longitude'),
+        ('signalement', '0007_alter_signalement_statut'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='signalement',
+            index=models.Index(fields=['-date_signalement', '-id'], name='signalement_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalement',
+            index=models.Index(fields=['commune', '-date_signalement', '-id'], name='signalement_commune_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalement',
+            index=models.Index(fields=['utilisateur', '-date_signalement', '-id'], name='signalement_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-17 04:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Signalement = apps.get_model('signalement', 'Signalement')
+    SignalementCompteur = apps.get_model('signalement', 'SignalementCompteur')
+    rows = (
+        Signalement.objects.order_by()
+        .values('commune_id', 'statut', 'type_signalement')
+        .annotate(n=Count('id'))
+    )
+    SignalementCompteur.objects.bulk_create([
+        SignalementCompteur(commune_id=row['commune_id'], statut=row['statut'],
+                            type_signalement=row['type_signalement'], total=row['n'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communes', '0003_commune_latitude_commune_longitude'),
+        ('signalement', '0008_signalement_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignalementCompteur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('traite', 'Traité'), ('rejeté', 'Rejeté'), ('suspendu', 'Suspendu')], max_length=50)),
+                ('type_signalement', models.CharField(choices=[('dechets', 'Déchets'), ('pollution', 'Pollution'), ('climat', 'Climat')], max_length=50)),
+                ('total', models.IntegerField(default=0)),
+                ('commune', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='compteurs_signalements', to='communes.commune')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('commune', 'statut', 'type_signalement'), name='signalement_compteur_unique')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
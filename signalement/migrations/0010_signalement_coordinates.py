@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('signalement', '0009_signalementcompteur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='signalement',
+            name='geo_cell',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='signalement',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='signalement',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
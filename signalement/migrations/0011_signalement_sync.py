@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-17 04:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def init_updated_at(apps, schema_editor):
+    # Les lignes existantes n'ont jamais été suivies : on repart de leur date de création
+    Signalement = apps.get_model('signalement', 'Signalement')
+    Signalement.objects.update(updated_at=F('date_signalement'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communes', '0003_commune_latitude_commune_longitude'),
+        ('signalement', '0010_signalement_coordinates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignalementSuppression',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signalement_id', models.BigIntegerField()),
+                ('utilisateur_id', models.BigIntegerField(blank=True, null=True)),
+                ('commune_id', models.BigIntegerField(blank=True, null=True)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('traite', 'Traité'), ('rejeté', 'Rejeté'), ('suspendu', 'Suspendu')], max_length=50)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='signalement',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(init_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='signalement',
+            index=models.Index(fields=['updated_at', 'id'], name='signalement_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalementsuppression',
+            index=models.Index(fields=['deleted_at', 'id'], name='signalement_suppr_date_idx'),
+        ),
+    ]
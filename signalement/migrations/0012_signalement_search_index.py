@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from signalement.search import drop_search_index, install_search_index
+
+
+def install(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('signalement', '0011_signalement_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,44 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_photo_ids(apps, schema_editor):
+    # Les identifiants existants sont conservés ; ceux qui ne pointent vers
+    # aucune photo ne peuvent pas devenir une clé étrangère et restent vides.
+    Signalement = apps.get_model('signalement', 'Signalement')
+    Photo = apps.get_model('photos', 'Photo')
+    Signalement.objects.filter(
+        legacy_photo_id__in=Photo.objects.values('id')
+    ).update(photo_id=F('legacy_photo_id'))
+
+
+def restore_photo_ids(apps, schema_editor):
+    Signalement = apps.get_model('signalement', 'Signalement')
+    Signalement.objects.update(legacy_photo_id=F('photo_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0001_initial'),
+        ('signalement', '0012_signalement_search_index'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='signalement',
+            old_name='photo_id',
+            new_name='legacy_photo_id',
+        ),
+        migrations.AddField(
+            model_name='signalement',
+            name='photo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='signalements', to='photos.photo'),
+        ),
+        migrations.RunPython(copy_photo_ids, restore_photo_ids),
+        migrations.RemoveField(
+            model_name='signalement',
+            name='legacy_photo_id',
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-17 04:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_resolutions(apps, schema_editor):
+    # Seule la date de résolution était conservée : on reconstitue le passage à
+    # 'traite', sans statut d'origine connu
+    Signalement = apps.get_model('signalement', 'Signalement')
+    SignalementStatutHistorique = apps.get_model('signalement', 'SignalementStatutHistorique')
+    rows = (
+        Signalement.objects.filter(statut='traite', date_resolution__isnull=False)
+        .values_list('id', 'date_resolution')
+    )
+    SignalementStatutHistorique.objects.bulk_create(
+        [
+            SignalementStatutHistorique(signalement_id=pk, ancien_statut=None,
+                                        nouveau_statut='traite', date_changement=date_resolution)
+            for pk, date_resolution in rows.iterator(chunk_size=2000)
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('signalement', '0013_signalement_photo_relation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignalementStatutHistorique',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancien_statut', models.CharField(blank=True, choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('traite', 'Traité'), ('rejeté', 'Rejeté'), ('suspendu', 'Suspendu')], max_length=50, null=True)),
+                ('nouveau_statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('traite', 'Traité'), ('rejeté', 'Rejeté'), ('suspendu', 'Suspendu')], max_length=50)),
+                ('date_changement', models.DateTimeField(default=django.utils.timezone.now)),
+                ('modifie_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='changements_statut', to=settings.AUTH_USER_MODEL)),
+                ('signalement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historique_statuts', to='signalement.signalement')),
+            ],
+            options={
+                'ordering': ['date_changement', 'id'],
+                'indexes': [models.Index(fields=['signalement', 'date_changement'], name='signalement_histo_sig_idx'), models.Index(fields=['nouveau_statut', 'date_changement'], name='signalement_histo_statut_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_resolutions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-17 04:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('signalement', '0014_signalement_statut_historique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignalementEmpreinte',
+            fields=[
+                ('signalement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='empreinte', serialize=False, to='signalement.signalement')),
+                ('signature', models.CharField(max_length=512)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='signalement',
+            name='doublon_de',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='doublons', to='signalement.signalement'),
+        ),
+        migrations.AddField(
+            model_name='signalement',
+            name='nombre_doublons',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SignalementBande',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bande', models.SmallIntegerField()),
+                ('valeur', models.BigIntegerField()),
+                ('signalement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bandes', to='signalement.signalement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bande', 'valeur'], name='signalement_bande_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2 on 2026-10-17 04:44
+
+import math
+
+from django.db import migrations, models
+
+# Copie figée de signalement.heatmap : une migration ne doit pas dépendre du
+# code applicatif, qui peut évoluer. rebuild_signalement_heatmap reconstruit
+# la pyramide avec les paramètres courants.
+MIN_ZOOM = 0
+MAX_ZOOM = 14
+CELL_BITS = 3
+MAX_LATITUDE = 85.05112878
+
+
+def tile_xy(latitude, longitude, zoom):
+    n = 1 << zoom
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    lat_rad = math.radians(latitude)
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def populate_heatmap(apps, schema_editor):
+    Signalement = apps.get_model('signalement', 'Signalement')
+    HeatmapCell = apps.get_model('signalement', 'HeatmapCell')
+    rows = (
+        Signalement.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .order_by().values_list('latitude', 'longitude', 'statut', 'type_signalement')
+    )
+    # Un niveau à la fois : la mémoire reste bornée par les cellules d'un niveau
+    for zoom in range(MIN_ZOOM + CELL_BITS, MAX_ZOOM + CELL_BITS + 1):
+        totals = {}
+        for latitude, longitude, statut, type_signalement in rows.iterator(chunk_size=2000):
+            key = tile_xy(latitude, longitude, zoom) + (statut, type_signalement)
+            totals[key] = totals.get(key, 0) + 1
+        HeatmapCell.objects.bulk_create(
+            [
+                HeatmapCell(zoom=zoom, x=x, y=y, statut=statut, type_signalement=type_signalement, total=total)
+                for (x, y, statut, type_signalement), total in totals.items()
+            ],
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('signalement', '0015_signalement_doublons'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeatmapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.SmallIntegerField()),
+                ('x', models.IntegerField()),
+                ('y', models.IntegerField()),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('traite', 'Traité'), ('rejeté', 'Rejeté'), ('suspendu', 'Suspendu')], max_length=50)),
+                ('type_signalement', models.CharField(choices=[('dechets', 'Déchets'), ('pollution', 'Pollution'), ('climat', 'Climat')], max_length=50)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'x', 'y', 'statut', 'type_signalement'), name='signalement_heatmap_cell_unique')],
+            },
+        ),
+        migrations.RunPython(populate_heatmap, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 04:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communes', '0003_commune_latitude_commune_longitude'),
+        ('photos', '0001_initial'),
+        ('signalement', '0016_heatmapcell'),
+        ('zones', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='signalement',
+            name='score_priorite',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='signalement',
+            index=models.Index(condition=models.Q(('statut__in', ['en_attente', 'en_cours'])), fields=['commune', '-score_priorite', '-id'], name='signalement_triage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalement',
+            index=models.Index(condition=models.Q(('statut__in', ['en_attente', 'en_cours'])), fields=['-score_priorite', '-id'], name='signalement_triage_all_idx'),
+        ),
+        # Pas de calcul ici : il dépend du code applicatif (signalement.priority).
+        # Lancer recompute_signalement_priorities après la migration ; d'ici là
+        # les signalements existants ont un score nul.
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 05:26
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def merge_duplicate_counters(apps, schema_editor):
+    """Fusionne les lignes sans commune en double avant de poser la contrainte"""
+    SignalementCompteur = apps.get_model('signalement', 'SignalementCompteur')
+    rows = SignalementCompteur.objects.filter(commune__isnull=True)
+    keys = rows.values('statut', 'type_signalement').annotate(total_sum=Sum('total')).order_by()
+    for key in keys:
+        duplicates = list(rows.filter(statut=key['statut'], type_signalement=key['type_signalement']).order_by('id'))
+        if len(duplicates) > 1:
+            SignalementCompteur.objects.filter(pk__in=[row.pk for row in duplicates[1:]]).delete()
+            SignalementCompteur.objects.filter(pk=duplicates[0].pk).update(total=key['total_sum'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communes', '0003_commune_latitude_commune_longitude'),
+        ('signalement', '0017_signalement_score_priorite'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_counters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='signalementcompteur',
+            constraint=models.UniqueConstraint(condition=models.Q(('commune__isnull', True)), fields=('statut', 'type_signalement'), name='signalement_compteur_sans_commune_unique'),
+        ),
+    ]
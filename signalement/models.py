@@ -1,7 +1,10 @@
 #signalement/models.py
 from django.db import models
+from django.utils import timezone
 from accounts.models import User
 from communes.models import Commune
+from photos.models import Photo
+from .geo import encode_geohash
 
 class Signalement(models.Model):
     TYPE_SIGNALLEMENT_CHOICES = [
@@ -22,15 +25,209 @@ class Signalement(models.Model):
     description = models.TextField()
     date_signalement = models.DateTimeField(auto_now_add=True)
     date_resolution = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     statut = models.CharField(max_length=50, choices=STATUT_CHOICES, default='en_attente')
     localisation = models.CharField(max_length=255)
     type_signalement = models.CharField(max_length=50, choices=TYPE_SIGNALLEMENT_CHOICES)
     utilisateur = models.ForeignKey(User, on_delete=models.CASCADE)
-    photo_id = models.IntegerField(null=True, blank=True)
+    photo = models.ForeignKey(Photo, on_delete=models.SET_NULL, null=True, blank=True, related_name='signalements')
     commune = models.ForeignKey(Commune, on_delete=models.SET_NULL, null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Cellule geohash dérivée de (latitude, longitude), indexée pour les recherches spatiales
+    geo_cell = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+    # Regroupement des quasi-doublons (voir duplicates.py) : un doublon pointe vers
+    # le signalement principal du groupe, qui tient le nombre de doublons rattachés
+    doublon_de = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='doublons', editable=False)
+    nombre_doublons = models.IntegerField(default=0, editable=False)
+    # Score de la file de triage, maintenu par priority.py
+    score_priorite = models.FloatField(default=0, editable=False)
     
     class Meta:
         ordering = ['-date_signalement']
+        indexes = [
+            # Clés de pagination par curseur (date_signalement, id)
+            models.Index(fields=['-date_signalement', '-id'], name='signalement_date_id_idx'),
+            models.Index(fields=['commune', '-date_signalement', '-id'], name='signalement_commune_date_idx'),
+            models.Index(fields=['utilisateur', '-date_signalement', '-id'], name='signalement_user_date_idx'),
+            # Flux de synchronisation par clé (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='signalement_updated_id_idx'),
+            # File de triage : signalements ouverts par score décroissant
+            models.Index(fields=['commune', '-score_priorite', '-id'], name='signalement_triage_idx',
+                         condition=models.Q(statut__in=['en_attente', 'en_cours'])),
+            models.Index(fields=['-score_priorite', '-id'], name='signalement_triage_all_idx',
+                         condition=models.Q(statut__in=['en_attente', 'en_cours'])),
+        ]
     
+    def update_geo_cell(self):
+        if self.latitude is not None and self.longitude is not None:
+            self.geo_cell = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geo_cell = ''
+
+    # Écrits uniquement par duplicates.py et priority.py (update() ciblés)
+    DERIVED_FIELDS = ('doublon_de', 'nombre_doublons', 'score_priorite')
+
+    def save(self, *args, **kwargs):
+        self.update_geo_cell()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # Une sauvegarde complète ne réécrit pas les champs dérivés : la
+            # valeur chargée en mémoire peut être périmée
+            deferred = self.get_deferred_fields()
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+                and field.attname not in deferred
+            ]
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geo_cell'}
+        super().save(*args, **kwargs)
+
+    # Champs dont la valeur en base est mémorisée au chargement, afin que les
+    # signaux post_save puissent détecter les changements (compteurs, carte de chaleur)
+    TRACKED_FIELDS = ('statut', 'type_signalement', 'commune_id', 'latitude', 'longitude')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_tracked_values()
+        return instance
+
+    def remember_tracked_values(self):
+        self._tracked_values = {
+            field: self.__dict__[field] for field in self.TRACKED_FIELDS if field in self.__dict__
+        }
+
+    def get_tracked_values(self):
+        """Valeurs des champs suivis telles que chargées depuis la base"""
+        return getattr(self, '_tracked_values', {})
+
+    def __str__(self):
+        return f"{self.objet} - {self.type_signalement} ({self.get_statut_display()})"
+
+
+class SignalementSuppression(models.Model):
+    """
+    Trace (tombstone) d'un signalement supprimé ou sorti d'un périmètre de
+    visibilité (commune ou statut modifié), pour que les clients mobiles
+    puissent retirer la ligne lors d'une synchronisation incrémentale.
+    Les champs de visibilité, avant modification, sont copiés pour appliquer
+    les mêmes règles d'accès.
+    """
+    signalement_id = models.BigIntegerField()
+    utilisateur_id = models.BigIntegerField(null=True, blank=True)
+    commune_id = models.BigIntegerField(null=True, blank=True)
+    statut = models.CharField(max_length=50, choices=Signalement.STATUT_CHOICES)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='signalement_suppr_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Signalement {self.signalement_id} supprimé le {self.deleted_at}"
+
+
+class SignalementCompteur(models.Model):
+    """
+    Compteurs dénormalisés du nombre de signalements par (commune, statut, type),
+    maintenus par les signaux de Signalement (voir signals.py).
+    """
+    commune = models.ForeignKey(Commune, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='compteurs_signalements')
+    statut = models.CharField(max_length=50, choices=Signalement.STATUT_CHOICES)
+    type_signalement = models.CharField(max_length=50, choices=Signalement.TYPE_SIGNALLEMENT_CHOICES)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['commune', 'statut', 'type_signalement'],
+                                    name='signalement_compteur_unique'),
+            # NULL étant distinct de NULL, la contrainte précédente n'empêche pas
+            # les doublons des signalements sans commune
+            models.UniqueConstraint(fields=['statut', 'type_signalement'],
+                                    condition=models.Q(commune__isnull=True),
+                                    name='signalement_compteur_sans_commune_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.commune_id} / {self.statut} / {self.type_signalement} : {self.total}"
+
+class SignalementStatutHistorique(models.Model):
+    """
+    Journal des changements de statut (ajout seul), écrit dans la même
+    transaction que la modification du signalement. Sert au calcul des délais
+    de prise en charge et de résolution (voir history.py).
+    """
+    signalement = models.ForeignKey(Signalement, on_delete=models.CASCADE, related_name='historique_statuts')
+    # Vide pour les transitions reconstituées dont le statut d'origine est inconnu
+    ancien_statut = models.CharField(max_length=50, choices=Signalement.STATUT_CHOICES, null=True, blank=True)
+    nouveau_statut = models.CharField(max_length=50, choices=Signalement.STATUT_CHOICES)
+    modifie_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='changements_statut')
+    date_changement = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['date_changement', 'id']
+        indexes = [
+            models.Index(fields=['signalement', 'date_changement'], name='signalement_histo_sig_idx'),
+            models.Index(fields=['nouveau_statut', 'date_changement'], name='signalement_histo_statut_idx'),
+        ]
+
+    def __str__(self):
+        return f"Signalement {self.signalement_id} : {self.ancien_statut} → {self.nouveau_statut}"
+
+
+class SignalementEmpreinte(models.Model):
+    """Signature MinHash de objet + description (voir duplicates.py)"""
+    signalement = models.OneToOneField(Signalement, on_delete=models.CASCADE, primary_key=True,
+                                       related_name='empreinte')
+    signature = models.CharField(max_length=512)
+
+    def __str__(self):
+        return f"Empreinte du signalement {self.signalement_id}"
+
+
+class SignalementBande(models.Model):
+    """
+    Bandes LSH d'une signature MinHash : deux signalements partageant une
+    bande sont candidats au statut de doublon. Recherche par l'index (bande, valeur).
+    """
+    signalement = models.ForeignKey(Signalement, on_delete=models.CASCADE, related_name='bandes')
+    bande = models.SmallIntegerField()
+    valeur = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bande', 'valeur'], name='signalement_bande_idx'),
+        ]
+
+    def __str__(self):
+        return f"Signalement {self.signalement_id} / bande {self.bande}"
+
+
+class HeatmapCell(models.Model):
+    """
+    Nombre de signalements géolocalisés par cellule de la pyramide de tuiles
+    (coordonnées de tuile web mercator au niveau `zoom`), par statut et par type.
+    Maintenu de façon incrémentale (voir heatmap.py).
+    """
+    zoom = models.SmallIntegerField()
+    x = models.IntegerField()
+    y = models.IntegerField()
+    statut = models.CharField(max_length=50, choices=Signalement.STATUT_CHOICES)
+    type_signalement = models.CharField(max_length=50, choices=Signalement.TYPE_SIGNALLEMENT_CHOICES)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['zoom', 'x', 'y', 'statut', 'type_signalement'],
+                                    name='signalement_heatmap_cell_unique'),
+        ]
+
     def __str__(self):
-        return f"{self.objet} - {self.type_signalement} ({self.get_statut_display()})"
\ No newline at end of file
+        return f"{self.zoom}/{self.x}/{self.y} {self.statut} / {self.type_signalement} : {self.total}"
@@ -0,0 +1,157 @@
+#signalement/pagination.py
+import base64
+import json
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+MAX_PAGE_SIZE = 200
+
+
+class CurseurInvalide(ValueError):
+    """Levée quand le curseur transmis par le client ne peut pas être décodé"""
+
+
+def encode_cursor(signalement, direction):
+    """
+    Encode la clé (date_signalement, id) d'une ligne en curseur opaque,
+    précédée de search_rank pour les résultats d'une recherche (?q=)
+    """
+    payload = {
+        'd': signalement.date_signalement.isoformat(),
+        'i': signalement.id,
+        'r': direction,
+    }
+    if hasattr(signalement, 'search_rank'):
+        payload['s'] = signalement.search_rank
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Décode un curseur en (search_rank ou None, date_signalement, id, direction)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        date = parse_datetime(payload['d'])
+        direction = payload.get('r', 'next')
+        rank = payload.get('s')
+        if date is None or direction not in ('next', 'prev'):
+            raise ValueError
+        return (float(rank) if rank is not None else None), date, int(payload['i']), direction
+    except (ValueError, KeyError, TypeError, json.JSONDecodeError):
+        raise CurseurInvalide('Curseur invalide')
+
+
+def _keyset_filter(rank, date, pk, direction, ranked):
+    """Lignes strictement après (next) ou avant (prev) la clé dans l'ordre décroissant"""
+    op = 'lt' if direction == 'next' else 'gt'
+    condition = Q(**{f'date_signalement__{op}': date}) | Q(date_signalement=date, **{f'id__{op}': pk})
+    if ranked:
+        condition = Q(**{f'search_rank__{op}': rank}) | (Q(search_rank=rank) & condition)
+    return condition
+
+
+def is_cursor_request(request):
+    """Le mode curseur est activé par ?cursor= ou ?pagination=cursor"""
+    return 'cursor' in request.GET or request.GET.get('pagination') == 'cursor'
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        page_size = DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def estimate_count(queryset):
+    """
+    Estimation du nombre de lignes sans COUNT(*).
+    Sur PostgreSQL on lit l'estimation du planificateur, ailleurs on renvoie
+    None et l'appelant se rabat sur le comptage exact.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def paginate_signalements(request, queryset, serializer_class, context=None):
+    """
+    Pagination par clé (date_signalement, id) : chaque page est une lecture
+    d'index bornée, quelle que soit la profondeur de navigation. Les résultats
+    d'une recherche (annotation search_rank, voir search.py) gardent leur
+    ordre de pertinence : la clé devient (search_rank, date_signalement, id).
+
+    Retourne l'enveloppe habituelle {'count', 'signalements'} complétée par
+    'next_cursor' / 'previous_cursor'. Le comptage est contrôlé par ?count= :
+    'exact' (COUNT(*)), 'none' (pas de comptage) ou 'estimate' (défaut ;
+    exact hors PostgreSQL, faute d'estimation du planificateur).
+    """
+    page_size = get_page_size(request)
+    cursor = request.GET.get('cursor')
+
+    ranked = 'search_rank' in queryset.query.annotations
+    ordering = ['search_rank', 'date_signalement', 'id'] if ranked else ['date_signalement', 'id']
+
+    direction = 'next'
+    page = queryset
+    if cursor:
+        rank, date, pk, direction = decode_cursor(cursor)
+        if (rank is not None) != ranked:
+            raise CurseurInvalide('Curseur invalide pour cette recherche')
+        page = page.filter(_keyset_filter(rank, date, pk, direction, ranked))
+
+    if direction == 'next':
+        page = page.order_by(*('-' + field for field in ordering))
+    else:
+        page = page.order_by(*ordering)
+
+    rows = list(page[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'prev':
+        rows.reverse()
+
+    if direction == 'next':
+        has_next, has_prev = has_more, bool(cursor)
+    else:
+        has_next, has_prev = True, has_more
+
+    next_cursor = encode_cursor(rows[-1], 'next') if rows and has_next else None
+    previous_cursor = encode_cursor(rows[0], 'prev') if rows and has_prev else None
+
+    count_mode = request.GET.get('count', 'estimate')
+    count_exact = True
+    if count_mode == 'exact':
+        count = queryset.count()
+    elif count_mode == 'none':
+        count, count_exact = None, False
+    elif not cursor and not has_more:
+        # Une seule page : le nombre exact est connu sans requête supplémentaire
+        count = len(rows)
+    else:
+        count = estimate_count(queryset)
+        if count is None:
+            count = queryset.count()
+        else:
+            count_exact = False
+
+    serializer = serializer_class(rows, many=True, context=context or {})
+    return {
+        'count': count,
+        'count_exact': count_exact,
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
+        'signalements': serializer.data,
+    }
@@ -0,0 +1,211 @@
+#signalement/priority.py
+"""
+Score de priorité des signalements ouverts, stocké dans la colonne indexée
+score_priorite afin que la file de triage soit un simple parcours d'index.
+
+score = poids du type
+      + poids_age_par_jour × âge en jours (plafonné à age_max_jours)
+      + poids_voisin × signalements ouverts à moins de rayon_voisins_m (plafonné à voisins_max)
+      + poids_zone_risque si le signalement est situé dans une zones.RiskZone
+
+Le score est recalculé à l'écriture (signalement et voisins concernés) et
+périodiquement par la commande recompute_signalement_priorities, l'âge
+évoluant avec le temps. Les signalements fermés ont un score nul.
+"""
+import math
+
+from django.conf import settings
+from django.utils import timezone
+
+from zones.models import RiskZone
+
+from .geo import haversine_m, radius_bbox
+from .models import Signalement
+
+OPEN_STATUTS = ('en_attente', 'en_cours')
+SCORE_COLUMNS = ('id', 'statut', 'type_signalement', 'date_signalement', 'latitude', 'longitude', 'score_priorite')
+
+DEFAULT_CONFIG = {
+    'poids_type': {'pollution': 30, 'dechets': 20, 'climat': 10},
+    'poids_age_par_jour': 2,
+    'age_max_jours': 30,
+    'poids_voisin': 5,
+    'voisins_max': 10,
+    'rayon_voisins_m': 500,
+    'poids_zone_risque': 25,
+}
+# Taille des cases de la grille de recherche des voisins, en degrés (~1,1 km)
+GRID_STEP = 0.01
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'SIGNALEMENT_PRIORITE', {})}
+
+
+def _point_in_ring(latitude, longitude, ring):
+    """Test du rayon (ray casting) sur un anneau GeoJSON [[lon, lat], ...]"""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > latitude) != (yj > latitude) and longitude < (xj - xi) * (latitude - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def parse_polygons(coordinates_list):
+    """
+    Prépare les polygones des zones à risque (coordonnées GeoJSON Polygon :
+    anneau extérieur puis trous) avec leur boîte englobante.
+    """
+    polygons = []
+    for coordinates in coordinates_list:
+        try:
+            rings = [[(float(point[0]), float(point[1])) for point in ring] for ring in coordinates]
+        except (TypeError, ValueError, IndexError):
+            continue
+        if not rings or len(rings[0]) < 3:
+            continue
+        lons = [point[0] for point in rings[0]]
+        lats = [point[1] for point in rings[0]]
+        polygons.append(((min(lats), min(lons), max(lats), max(lons)), rings))
+    return polygons
+
+
+def in_risk_zone(latitude, longitude, polygons):
+    for (min_lat, min_lon, max_lat, max_lon), rings in polygons:
+        if not (min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon):
+            continue
+        if _point_in_ring(latitude, longitude, rings[0]) and not any(
+            _point_in_ring(latitude, longitude, hole) for hole in rings[1:]
+        ):
+            return True
+    return False
+
+
+def _grid_cell(latitude, longitude):
+    return math.floor(latitude / GRID_STEP), math.floor(longitude / GRID_STEP)
+
+
+def score_rows(rows, pool, polygons, now=None, config=None):
+    """
+    Scores {id: score} des lignes `rows` (dicts SCORE_COLUMNS). `pool` contient
+    les signalements ouverts géolocalisés parmi lesquels compter les voisins.
+    """
+    now = now or timezone.now()
+    config = config or get_config()
+    radius = config['rayon_voisins_m']
+    reach = math.ceil(math.degrees(radius / 6371008.8) / GRID_STEP)
+
+    grid = {}
+    for other in pool:
+        grid.setdefault(_grid_cell(other['latitude'], other['longitude']), []).append(other)
+
+    scores = {}
+    for row in rows:
+        if row['statut'] not in OPEN_STATUTS:
+            scores[row['id']] = 0.0
+            continue
+        score = float(config['poids_type'].get(row['type_signalement'], 0))
+        age_days = max(0.0, (now - row['date_signalement']).total_seconds() / 86400)
+        score += config['poids_age_par_jour'] * min(age_days, config['age_max_jours'])
+
+        latitude, longitude = row['latitude'], row['longitude']
+        if latitude is not None and longitude is not None:
+            cell_lat, cell_lon = _grid_cell(latitude, longitude)
+            # Portée en longitude élargie avec la latitude
+            lon_reach = math.ceil(reach / max(math.cos(math.radians(latitude)), 1e-6))
+            neighbours = 0
+            for i in range(cell_lat - reach, cell_lat + reach + 1):
+                for j in range(cell_lon - lon_reach, cell_lon + lon_reach + 1):
+                    for other in grid.get((i, j), ()):
+                        if other['id'] != row['id'] and haversine_m(
+                            latitude, longitude, other['latitude'], other['longitude']
+                        ) <= radius:
+                            neighbours += 1
+            score += config['poids_voisin'] * min(neighbours, config['voisins_max'])
+            if in_risk_zone(latitude, longitude, polygons):
+                score += config['poids_zone_risque']
+        scores[row['id']] = round(score, 3)
+    return scores
+
+
+def _open_located(queryset):
+    return queryset.filter(statut__in=OPEN_STATUTS, latitude__isnull=False, longitude__isnull=False)
+
+
+def load_polygons():
+    return parse_polygons(RiskZone.objects.values_list('coordinates', flat=True))
+
+
+def _write_scores(scores, rows):
+    """
+    Enregistre les scores modifiés. updated_at n'est pas avancé : un simple
+    recalcul de score ne doit pas renvoyer le signalement au flux de
+    synchronisation (le recalcul périodique toucherait tous les ouverts).
+    """
+    current = {row['id']: row['score_priorite'] for row in rows}
+    Signalement.objects.bulk_update(
+        [Signalement(id=pk, score_priorite=score) for pk, score in scores.items() if current.get(pk) != score],
+        ['score_priorite'], batch_size=500,
+    )
+
+
+def refresh_priorities(ids=(), points=()):
+    """
+    Recalcule le score des signalements `ids` et des signalements ouverts
+    voisins de leurs positions et des `points` (lat, lon) supplémentaires,
+    par exemple l'ancienne position d'un signalement déplacé ou supprimé.
+    Retourne {id: score}.
+    """
+    ids = set(ids)
+    rows = list(Signalement.objects.filter(id__in=ids).values(*SCORE_COLUMNS)) if ids else []
+    centres = list(points) + [
+        (row['latitude'], row['longitude']) for row in rows if row['latitude'] is not None
+    ]
+    config = get_config()
+    radius = config['rayon_voisins_m']
+
+    pool = []
+    if centres:
+        # Voisins à rescorer (à moins d'un rayon) et leurs propres voisins (deux rayons)
+        boxes = [radius_bbox(latitude, longitude, 2 * radius) for latitude, longitude in centres]
+        pool = list(_open_located(Signalement.objects).filter(
+            latitude__range=(min(box[0] for box in boxes), max(box[2] for box in boxes)),
+            longitude__range=(min(box[1] for box in boxes), max(box[3] for box in boxes)),
+        ).values(*SCORE_COLUMNS))
+        rows += [
+            other for other in pool
+            if other['id'] not in ids and any(
+                haversine_m(latitude, longitude, other['latitude'], other['longitude']) <= radius
+                for latitude, longitude in centres
+            )
+        ]
+    if not rows:
+        return {}
+
+    scores = score_rows(rows, pool, load_polygons(), config=config)
+    _write_scores(scores, rows)
+    return scores
+
+
+def recompute_all_priorities(batch_size=2000):
+    """Recalcule le score de tous les signalements ouverts et remet à zéro les autres"""
+    config = get_config()
+    polygons = load_polygons()
+    now = timezone.now()
+    pool = list(_open_located(Signalement.objects).values(*SCORE_COLUMNS))
+    updated = 0
+    open_rows = Signalement.objects.filter(statut__in=OPEN_STATUTS).order_by('id').values(*SCORE_COLUMNS)
+    last_id = 0
+    while True:
+        rows = list(open_rows.filter(id__gt=last_id)[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        _write_scores(score_rows(rows, pool, polygons, now=now, config=config), rows)
+        updated += len(rows)
+    closed = Signalement.objects.exclude(statut__in=OPEN_STATUTS).exclude(score_priorite=0).update(score_priorite=0)
+    return updated, closed
@@ -0,0 +1,32 @@
+#signalement/search.py
+"""
+Recherche plein texte sur objet + description (index : backend/fulltext.py).
+L'objet pèse plus que la description ; les moteurs sans index se rabattent
+sur un filtre icontains.
+"""
+from backend.fulltext import FullTextIndex, is_indexed
+
+INDEX = FullTextIndex('signalement_signalement', ('objet', 'description'), 'signalement')
+
+
+def install_search_index(connection=None):
+    """Crée (ou complète) l'index plein texte ; voir FullTextIndex.install"""
+    INDEX.install(connection)
+
+
+def drop_search_index(connection=None):
+    INDEX.drop(connection)
+
+
+def apply_search(queryset, text):
+    """
+    Restreint le queryset aux signalements correspondant à la recherche et
+    annote 'search_rank' (plus grand = plus pertinent). Le queryset retourné est
+    trié par pertinence ; les filtres de visibilité déjà appliqués sont conservés.
+    """
+    text = (text or '').strip()
+    if not text:
+        return queryset
+    if not is_indexed():
+        return queryset.filter(INDEX.icontains(text))
+    return INDEX.apply(queryset, text).order_by('-search_rank', '-date_signalement', '-id')
@@ -1,13 +1,28 @@
 #signalement/serializers.py
+from django.db import transaction
 from rest_framework import serializers
 from .models import Signalement
+from .history import record_status_changes
 from accounts.models import User
+from photos.models import Photo
+from photos.serializers import PhotoSerializer
+
+
+def photo_id_field():
+    """Référence à une photo par son id, validée lors de la désérialisation"""
+    return serializers.PrimaryKeyRelatedField(
+        source='photo', queryset=Photo.objects.all(), required=False, allow_null=True,
+        error_messages={'does_not_exist': 'Photo non trouvée'}
+    )
 
 class SignalementSerializer(serializers.ModelSerializer):
     utilisateur_nom = serializers.CharField(source='utilisateur.username', read_only=True)
     utilisateur_email = serializers.CharField(source='utilisateur.email', read_only=True)
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
     type_signalement_display = serializers.CharField(source='get_type_signalement_display', read_only=True)
+    photo_id = serializers.IntegerField(read_only=True)
+    # Photo embarquée (URL et coordonnées), chargée via select_related('photo')
+    photo = PhotoSerializer(read_only=True)
     
     class Meta:
         model = Signalement
@@ -15,17 +30,35 @@ class SignalementSerializer(serializers.ModelSerializer):
             'id', 'objet', 'description', 'date_signalement', 'date_resolution',
             'statut', 'statut_display', 'localisation', 'type_signalement',
             'type_signalement_display', 'utilisateur', 'utilisateur_nom', 'utilisateur_email',
-            'photo_id', 'commune'
+            'photo_id', 'photo', 'commune', 'latitude', 'longitude',
+            'doublon_de', 'nombre_doublons', 'score_priorite'
         ]
-        read_only_fields = ['id', 'date_signalement', 'utilisateur']
+        read_only_fields = ['id', 'date_signalement', 'utilisateur', 'doublon_de', 'nombre_doublons', 'score_priorite']
+
+COORDINATES_EXTRA_KWARGS = {
+    'latitude': {'min_value': -90, 'max_value': 90},
+    'longitude': {'min_value': -180, 'max_value': 180},
+}
+
+def validate_coordinates(attrs, instance=None):
+    """La latitude et la longitude doivent être fournies ensemble"""
+    latitude = attrs.get('latitude', getattr(instance, 'latitude', None))
+    longitude = attrs.get('longitude', getattr(instance, 'longitude', None))
+    if (latitude is None) != (longitude is None):
+        raise serializers.ValidationError("La latitude et la longitude doivent être fournies ensemble")
+    return attrs
 
 class SignalementCreateSerializer(serializers.ModelSerializer):
     """Serializer pour la création de signalements - Accessible à tous les utilisateurs authentifiés"""
+    photo_id = photo_id_field()
+
     class Meta:
         model = Signalement
         fields = [
-            'objet', 'description', 'localisation', 'type_signalement', 'photo_id', 'commune'
+            'objet', 'description', 'localisation', 'type_signalement', 'photo_id', 'commune',
+            'latitude', 'longitude'
         ]
+        extra_kwargs = COORDINATES_EXTRA_KWARGS
     
     def validate_type_signalement(self, value):
         valid_types = [choice[0] for choice in Signalement.TYPE_SIGNALLEMENT_CHOICES]
@@ -33,13 +66,33 @@ class SignalementCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(f"Type de signalement invalide. Choisissez parmi: {valid_types}")
         return value
 
+    def validate(self, attrs):
+        return validate_coordinates(attrs)
+
+class SignalementBatchItemSerializer(SignalementCreateSerializer):
+    """
+    Élément d'une soumission groupée : la commune est celle de l'utilisateur
+    et l'existence des photos est vérifiée en une seule requête par la vue.
+    """
+    photo_id = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta(SignalementCreateSerializer.Meta):
+        fields = [
+            'objet', 'description', 'localisation', 'type_signalement', 'photo_id',
+            'latitude', 'longitude'
+        ]
+
 class SignalementUpdateSerializer(serializers.ModelSerializer):
     """Serializer pour la modification par les citoyens (propriétaires) - Champs limités"""
+    photo_id = photo_id_field()
+
     class Meta:
         model = Signalement
         fields = [
-            'objet', 'description', 'localisation', 'type_signalement', 'photo_id'
+            'objet', 'description', 'localisation', 'type_signalement', 'photo_id',
+            'latitude', 'longitude'
         ]
+        extra_kwargs = COORDINATES_EXTRA_KWARGS
     
     def validate_type_signalement(self, value):
         valid_types = [choice[0] for choice in Signalement.TYPE_SIGNALLEMENT_CHOICES]
@@ -50,16 +103,32 @@ class SignalementUpdateSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         # Les citoyens ne peuvent pas modifier le statut ou la date de résolution
         # Ces champs sont automatiquement exclus du Meta.fields
-        return attrs
+        return validate_coordinates(attrs, self.instance)
+
+class StatutHistoriqueMixin:
+    """
+    Journalise le changement de statut dans la même transaction que la mise à
+    jour. L'auteur est l'utilisateur de la requête passée dans le contexte.
+    """
+    def update(self, instance, validated_data):
+        ancien_statut = instance.statut
+        request = self.context.get('request')
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            record_status_changes([(instance, ancien_statut)], getattr(request, 'user', None))
+        return instance
 
-class SignalementAdminUpdateSerializer(serializers.ModelSerializer):
+class SignalementAdminUpdateSerializer(StatutHistoriqueMixin, serializers.ModelSerializer):
     """Serializer pour la modification par les ctdet administrateurs - Tous les champs"""
+    photo_id = photo_id_field()
+
     class Meta:
         model = Signalement
         fields = [
             'objet', 'description', 'localisation', 'type_signalement',
-            'statut', 'date_resolution', 'photo_id', 'commune'
+            'statut', 'date_resolution', 'photo_id', 'commune', 'latitude', 'longitude'
         ]
+        extra_kwargs = COORDINATES_EXTRA_KWARGS
     
     def validate_statut(self, value):
         valid_statuts = [choice[0] for choice in Signalement.STATUT_CHOICES]
@@ -72,6 +141,9 @@ class SignalementAdminUpdateSerializer(serializers.ModelSerializer):
         if value not in valid_types:
             raise serializers.ValidationError(f"Type de signalement invalide. Choisissez parmi: {valid_types}")
         return value
+
+    def validate(self, attrs):
+        return validate_coordinates(attrs, self.instance)
     
     def update(self, instance, validated_data):
         # Mise à jour automatique de la date de résolution si le statut passe à "traité"
@@ -80,7 +152,7 @@ class SignalementAdminUpdateSerializer(serializers.ModelSerializer):
             validated_data['date_resolution'] = timezone.now()
         return super().update(instance, validated_data)
 
-class SignalementStatutSerializer(serializers.ModelSerializer):
+class SignalementStatutSerializer(StatutHistoriqueMixin, serializers.ModelSerializer):
     """Serializer spécialement pour la modification du statut uniquement - ctd et administrateurs"""
     class Meta:
         model = Signalement
@@ -99,6 +171,12 @@ class SignalementStatutSerializer(serializers.ModelSerializer):
             validated_data['date_resolution'] = timezone.now()
         return super().update(instance, validated_data)
 
+class SignalementStatutBatchSerializer(serializers.Serializer):
+    """Modification groupée du statut - ctd et administrateurs"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    statut = serializers.ChoiceField(choices=Signalement.STATUT_CHOICES)
+    date_resolution = serializers.DateTimeField(required=False, allow_null=True)
+
 class SignalementListSerializer(serializers.ModelSerializer):
     """Serializer optimisé pour les listes de signalements"""
     utilisateur_nom = serializers.CharField(source='utilisateur.username', read_only=True)
@@ -110,7 +188,8 @@ class SignalementListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'objet', 'date_signalement', 'statut', 'statut_display', 
             'type_signalement', 'type_signalement_display', 'utilisateur_nom', 
-            'commune', 'localisation'
+            'commune', 'localisation', 'latitude', 'longitude', 'doublon_de', 'nombre_doublons',
+            'score_priorite'
         ]
 
 class SignalementStatsSerializer(serializers.Serializer):
@@ -120,7 +199,11 @@ class SignalementStatsSerializer(serializers.Serializer):
     en_cours = serializers.IntegerField()
     traite = serializers.IntegerField()
     rejete = serializers.IntegerField()
+    suspendu = serializers.IntegerField()
+    par_statut = serializers.DictField()
     par_type = serializers.DictField()
+    par_statut_type = serializers.DictField()
+    serie = serializers.ListField(child=serializers.DictField(), required=False)
     par_commune = serializers.DictField(required=False)
     
 class SignalementFilterSerializer(serializers.Serializer):
@@ -0,0 +1,131 @@
+#signalement/signals.py
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from communes.models import Commune
+
+from .counters import apply_deltas, counter_key, instance_key, record_transitions
+from .heatmap import heatmap_key, instance_heatmap_key, record_heatmap_transitions
+from .models import Signalement, SignalementSuppression
+from .priority import OPEN_STATUTS, refresh_priorities
+
+# Champs dont la modification change le score de priorité
+PRIORITY_FIELDS = ('statut', 'type_signalement', 'latitude', 'longitude')
+# Champs de visibilité modifiables (voir views._visibility_q) : leur
+# changement peut retirer le signalement du périmètre d'un client
+SCOPE_FIELDS = ('commune_id', 'statut')
+
+
+@receiver(post_save, sender=Signalement)
+def signalement_saved(sender, instance, created, **kwargs):
+    """Maintient compteurs et carte de chaleur à jour lors d'une création ou d'un changement de clé"""
+    if created:
+        old_key = old_heatmap_key = None
+    else:
+        tracked = instance.get_tracked_values()
+        old_key = counter_key(tracked) if tracked else instance_key(instance)
+        old_heatmap_key = heatmap_key(tracked) if tracked else instance_heatmap_key(instance)
+    record_transitions([(old_key, instance_key(instance))])
+    record_heatmap_transitions([(old_heatmap_key, instance_heatmap_key(instance))])
+
+    tracked = {} if created else instance.get_tracked_values()
+    if any(tracked.get(field) != getattr(instance, field) for field in SCOPE_FIELDS if field in tracked):
+        # Le signalement peut sortir du périmètre de certains clients
+        record_scope_exits([{
+            'id': instance.pk, 'utilisateur_id': instance.utilisateur_id,
+            **{field: tracked.get(field, getattr(instance, field)) for field in SCOPE_FIELDS},
+        }])
+    if created or any(tracked.get(field) != getattr(instance, field) for field in PRIORITY_FIELDS if field in tracked):
+        # Score du signalement et de ses voisins, y compris autour de son ancienne position
+        points = []
+        if tracked.get('latitude') is not None and tracked.get('longitude') is not None:
+            points.append((tracked['latitude'], tracked['longitude']))
+        scores = refresh_priorities([instance.pk], points)
+        instance.score_priorite = scores.get(instance.pk, instance.score_priorite)
+    instance.remember_tracked_values()
+
+
+@receiver(pre_delete, sender=Signalement)
+def signalement_deleting(sender, instance, **kwargs):
+    # Le SET_NULL de doublon_de est une mise à jour SQL qui n'avance pas
+    # updated_at : les doublons détachés ne seraient pas resynchronisés
+    Signalement.objects.filter(doublon_de_id=instance.pk).update(doublon_de=None, updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Signalement)
+def signalement_deleted(sender, instance, **kwargs):
+    tracked = instance.get_tracked_values()
+    old_key = counter_key(tracked) if tracked else instance_key(instance)
+    record_transitions([(old_key, None)])
+    record_heatmap_transitions([(heatmap_key(tracked) if tracked else instance_heatmap_key(instance), None)])
+
+    # Les voisins ouverts perdent un voisin
+    values = tracked or instance.__dict__
+    if values.get('statut') in OPEN_STATUTS and values.get('latitude') is not None \
+            and values.get('longitude') is not None:
+        refresh_priorities(points=[(values['latitude'], values['longitude'])])
+
+    # Trace de suppression pour la synchronisation incrémentale des clients
+    commune_id, statut, _ = old_key
+    SignalementSuppression.objects.create(
+        signalement_id=instance.pk,
+        utilisateur_id=instance.utilisateur_id,
+        commune_id=commune_id,
+        statut=statut,
+    )
+
+    # Le signalement principal perd un doublon
+    if instance.doublon_de_id:
+        Signalement.objects.filter(pk=instance.doublon_de_id).update(
+            nombre_doublons=F('nombre_doublons') - 1, updated_at=timezone.now()
+        )
+
+
+def record_scope_exits(rows):
+    """
+    Trace de sortie de périmètre pour chaque ligne {id, utilisateur_id,
+    commune_id, statut} (valeurs avant modification) : les clients qui
+    voyaient le signalement reçoivent son id dans 'deleted', sauf s'il leur
+    reste visible (voir sync.collect_changes).
+    """
+    SignalementSuppression.objects.bulk_create([
+        SignalementSuppression(
+            signalement_id=row['id'],
+            utilisateur_id=row['utilisateur_id'],
+            commune_id=row['commune_id'],
+            statut=row['statut'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+def signalements_bulk_created(signalements):
+    """
+    Équivalent de post_save pour les créations par bulk_create, qui
+    n'émettent pas de signaux : compteurs, carte de chaleur et scores de
+    priorité sont ajustés en une passe.
+    """
+    record_transitions([(None, instance_key(signalement)) for signalement in signalements])
+    record_heatmap_transitions([(None, instance_heatmap_key(signalement)) for signalement in signalements])
+    scores = refresh_priorities([signalement.pk for signalement in signalements])
+    for signalement in signalements:
+        signalement.score_priorite = scores.get(signalement.pk, signalement.score_priorite)
+    for signalement in signalements:
+        signalement.remember_tracked_values()
+
+
+@receiver(pre_delete, sender=Commune)
+def commune_deleting(sender, instance, **kwargs):
+    """
+    Les signalements de la commune sont détachés (SET_NULL) par une mise à
+    jour SQL sans signaux : leurs compteurs passent sur la clé sans commune
+    (ceux de la commune sont supprimés en cascade), les ctd de la commune
+    reçoivent une trace de sortie et updated_at avance pour la synchronisation.
+    """
+    signalements = Signalement.objects.filter(commune=instance)
+    rows = signalements.order_by().values('statut', 'type_signalement').annotate(n=Count('id'))
+    apply_deltas({(None, row['statut'], row['type_signalement']): row['n'] for row in rows})
+    record_scope_exits(signalements.order_by().values('id', 'utilisateur_id', 'commune_id', 'statut').iterator())
+    signalements.update(commune=None, updated_at=timezone.now())
@@ -0,0 +1,95 @@
+#signalement/stats.py
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import Signalement
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def _statuts():
+    return [choice[0] for choice in Signalement.STATUT_CHOICES]
+
+
+def _types():
+    return [choice[0] for choice in Signalement.TYPE_SIGNALLEMENT_CHOICES]
+
+
+def format_statistics(cross_tab):
+    """
+    Construit la réponse du tableau de bord à partir d'un tableau croisé
+    {(statut, type): nombre} : total, répartition par statut, par type et croisée.
+    """
+    statuts = _statuts()
+    types = _types()
+
+    par_statut_type = {
+        statut: {type_code: cross_tab.get((statut, type_code), 0) for type_code in types}
+        for statut in statuts
+    }
+    par_statut = {statut: sum(par_statut_type[statut].values()) for statut in statuts}
+    par_type = {type_code: sum(par_statut_type[statut][type_code] for statut in statuts) for type_code in types}
+    return {
+        'total': sum(par_statut.values()),
+        # Clés historiques conservées pour le tableau de bord
+        'en_attente': par_statut['en_attente'],
+        'en_cours': par_statut['en_cours'],
+        'traite': par_statut['traite'],
+        'rejete': par_statut['rejeté'],
+        'suspendu': par_statut['suspendu'],
+        'par_statut': par_statut,
+        'par_type': par_type,
+        'par_statut_type': par_statut_type,
+    }
+
+
+def compute_statistics(signalements):
+    """
+    Calcule le tableau croisé statut × type en une seule requête
+    (agrégation conditionnelle), puis en dérive les totaux.
+    """
+    statuts = _statuts()
+    types = _types()
+
+    aggregates = {}
+    for i, statut in enumerate(statuts):
+        for j, type_code in enumerate(types):
+            aggregates[f's{i}t{j}'] = Count('id', filter=Q(statut=statut, type_signalement=type_code))
+
+    row = signalements.order_by().aggregate(**aggregates)
+    return format_statistics({
+        (statut, type_code): row[f's{i}t{j}']
+        for i, statut in enumerate(statuts)
+        for j, type_code in enumerate(types)
+    })
+
+
+def compute_time_series(signalements, bucket):
+    """
+    Série temporelle du nombre de signalements par période (jour, semaine ou mois),
+    ventilée par statut, en une requête GROUP BY.
+    """
+    statuts = _statuts()
+    aggregates = {'total': Count('id')}
+    for i, statut in enumerate(statuts):
+        aggregates[f's{i}'] = Count('id', filter=Q(statut=statut))
+
+    rows = (
+        signalements.order_by()
+        .annotate(periode=BUCKETS[bucket]('date_signalement'))
+        .values('periode')
+        .annotate(**aggregates)
+        .order_by('periode')
+    )
+    return [
+        {
+            'periode': row['periode'].date().isoformat() if hasattr(row['periode'], 'date') else str(row['periode']),
+            'total': row['total'],
+            'par_statut': {statut: row[f's{i}'] for i, statut in enumerate(statuts)},
+        }
+        for row in rows
+    ]
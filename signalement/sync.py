@@ -0,0 +1,108 @@
+#signalement/sync.py
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+class JetonInvalide(ValueError):
+    """Levée quand le jeton de synchronisation ne peut pas être décodé"""
+
+
+def encode_token(position):
+    """
+    Encode les positions atteintes dans les deux flux (modifications et
+    suppressions) : {'u': [updated_at, id], 'd': [deleted_at, id]}.
+    """
+    payload = {
+        key: [value[0].isoformat(), value[1]]
+        for key, value in position.items() if value is not None
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    if not token:
+        return {'u': None, 'd': None}
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position = {'u': None, 'd': None}
+        for key in position:
+            if key in payload:
+                date = parse_datetime(payload[key][0])
+                if date is None:
+                    raise ValueError
+                position[key] = (date, int(payload[key][1]))
+        return position
+    except (ValueError, KeyError, TypeError, IndexError, json.JSONDecodeError):
+        raise JetonInvalide('Jeton de synchronisation invalide')
+
+
+def _after(queryset, date_field, position):
+    """Lignes strictement après la position (date, id), ordonnées par clé"""
+    if position is not None:
+        date, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__gt': date}) | Q(**{date_field: date, 'id__gt': pk})
+        )
+    return queryset.order_by(date_field, 'id')
+
+
+def safety_lag():
+    """
+    Marge (secondes) de relecture du dernier jeton : updated_at / deleted_at
+    sont fixés avant la validation de la transaction, une écriture encore en
+    cours peut donc apparaître plus tard avec une date antérieure au jeton.
+    """
+    return getattr(settings, 'SIGNALEMENT_SYNC_SAFETY_LAG', 60)
+
+
+def collect_changes(signalements, suppressions, token, limit=None):
+    """
+    Retourne les signalements créés ou modifiés et les ids à retirer
+    (suppressions et sorties du périmètre visible : changement de commune ou
+    de statut) postérieurs au jeton, ainsi que le jeton à utiliser la fois suivante.
+    Chaque flux est lu par plage d'index (date, id) et borné à `limit` lignes.
+
+    Sur la dernière page, le jeton ne dépasse pas maintenant - safety_lag() :
+    les lignes récentes sont renvoyées à l'appel suivant et le client les
+    applique par id (mise à jour idempotente).
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    position = decode_token(token)
+    horizon = (timezone.now() - timedelta(seconds=safety_lag()), 0)
+
+    changed = list(_after(signalements, 'updated_at', position['u'])[:limit + 1])
+    # Une trace de sortie de périmètre est ignorée si le signalement reste visible
+    deleted = list(
+        _after(suppressions.exclude(signalement_id__in=signalements.values('id')), 'deleted_at', position['d'])
+        .values('id', 'signalement_id', 'deleted_at')[:limit + 1]
+    )
+    has_more = len(changed) > limit or len(deleted) > limit
+    changed = changed[:limit]
+    deleted = deleted[:limit]
+
+    if changed:
+        position['u'] = (changed[-1].updated_at, changed[-1].id)
+    if deleted:
+        position['d'] = (deleted[-1]['deleted_at'], deleted[-1]['id'])
+    if not has_more:
+        # Pages intermédiaires : le jeton avance toujours, sans boucle possible
+        for key, value in position.items():
+            if value is not None and value > horizon:
+                position[key] = horizon
+
+    return {
+        'changed': changed,
+        'deleted': [row['signalement_id'] for row in deleted],
+        'token': encode_token(position),
+        'has_more': has_more,
+    }
@@ -1,3 +1,1104 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from backend.idempotency import _cache_key
+from communes.models import Commune
+from photos.models import Photo
+from zones.models import RiskZone
+
+from .counters import read_cross_tab, rebuild_counters, verify_counters
+from .export import EXPORT_FIELDS
+from .geo import encode_geohash, filter_radius, haversine_m
+from .heatmap import CELL_BITS, MAX_ZOOM, compute_expected_cells, rebuild_heatmap, tile_xy
+from .models import (
+    HeatmapCell, Signalement, SignalementCompteur, SignalementStatutHistorique, SignalementSuppression,
+)
+from .serializers import SignalementUpdateSerializer
+from .sync import decode_token, safety_lag
+
+
+def make_user(email, role, commune=None):
+    return User.objects.create_user(
+        email=email, password='secret', nom='Nom', prenom='Prénom',
+        role=role, commune=commune, is_active=True,
+    )
+
+
+class SignalementTestMixin:
+    """Commune, utilisateurs et fabrique de signalements communs aux tests"""
+
+    def setUp(self):
+        self.commune = Commune.objects.get(pk=1)
+        self.other_commune = Commune.objects.get(pk=2)
+        self.citizen = make_user('citoyen@example.com', 'citoyen', self.commune)
+        self.ctd = make_user('ctd@example.com', 'ctd', self.commune)
+        self.admin = make_user('admin@example.com', 'admin')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def make_signalement(self, **values):
+        values.setdefault('objet', 'Dépôt sauvage')
+        values.setdefault('description', 'Déchets au bord de la route')
+        values.setdefault('localisation', 'Marché A')
+        values.setdefault('type_signalement', 'dechets')
+        values.setdefault('utilisateur', self.citizen)
+        values.setdefault('commune', self.commune)
+        return Signalement.objects.create(**values)
+
+    def post_signalement(self, user=None, **values):
+        data = {
+            'objet': 'Dépôt sauvage', 'description': 'Déchets au bord de la route',
+            'localisation': 'Marché A', 'type_signalement': 'dechets',
+        }
+        data.update(values)
+        return self.client_for(user or self.citizen).post('/api/signalements/create/', data, format='json')
+
+
+class DerivedFieldsTests(SignalementTestMixin, TestCase):
+
+    def test_update_keeps_concurrent_duplicate_count_and_priority(self):
+        signalement = self.make_signalement(latitude=5.47, longitude=10.42)
+        stale = Signalement.objects.get(pk=signalement.pk)
+        # Doublon rattaché et score recalculé pendant que le client édite
+        Signalement.objects.filter(pk=signalement.pk).update(nombre_doublons=2, score_priorite=42.0)
+
+        serializer = SignalementUpdateSerializer(stale, data={'objet': 'Dépôt sauvage (suite)'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        signalement.refresh_from_db()
+        self.assertEqual(signalement.objet, 'Dépôt sauvage (suite)')
+        self.assertEqual(signalement.nombre_doublons, 2)
+        self.assertEqual(signalement.score_priorite, 42.0)
+
+    def test_update_view(self):
+        signalement = self.make_signalement()
+        response = self.client_for(self.citizen).put(
+            f'/api/signalements/update/{signalement.pk}/', {'objet': 'Dépôt sauvage (suite)'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['signalement']['objet'], 'Dépôt sauvage (suite)')
+
+    def test_full_save_keeps_derived_fields(self):
+        signalement = self.make_signalement()
+        stale = Signalement.objects.get(pk=signalement.pk)
+        Signalement.objects.filter(pk=signalement.pk).update(nombre_doublons=1)
+        stale.description = 'Plus de détails'
+        stale.save()
+        signalement.refresh_from_db()
+        self.assertEqual((signalement.description, signalement.nombre_doublons), ('Plus de détails', 1))
+
+    def test_moving_a_signalement_updates_its_geo_cell(self):
+        signalement = self.make_signalement(latitude=5.47, longitude=10.42)
+        cell = signalement.geo_cell
+        signalement.latitude = 4.05
+        signalement.save(update_fields=['latitude'])
+        signalement.refresh_from_db()
+        self.assertNotEqual(signalement.geo_cell, cell)
+
+
+class SyncChangesTests(SignalementTestMixin, TestCase):
+
+    def sync(self, token=None, limit=None):
+        params = {'scope': 'mine'}
+        if token:
+            params['since'] = token
+        if limit:
+            params['limit'] = limit
+        response = self.client_for(self.citizen).get('/api/signalements/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def sync_all(self, token=None, limit=None):
+        """Rejoue le flux jusqu'à has_more=False ; retourne (ids modifiés, ids supprimés, jeton)"""
+        changed, deleted = [], []
+        for _ in range(20):
+            page = self.sync(token, limit)
+            changed += [row['id'] for row in page['signalements']]
+            deleted += page['deleted']
+            token = page['token']
+            if not page['has_more']:
+                return changed, deleted, token
+        self.fail('Le flux ne se termine pas')
+
+    @override_settings(SIGNALEMENT_SYNC_SAFETY_LAG=0)
+    def test_pages_cover_every_row_once(self):
+        ids = [self.make_signalement(objet=f'Signalement {i}').pk for i in range(7)]
+        changed, deleted, token = self.sync_all(limit=3)
+        self.assertEqual(changed, ids)
+        self.assertEqual(deleted, [])
+
+        Signalement.objects.get(pk=ids[2]).delete()
+        signalement = Signalement.objects.get(pk=ids[4])
+        signalement.objet = 'Modifié'
+        signalement.save()
+        changed, deleted, _ = self.sync_all(token, limit=3)
+        self.assertEqual(changed, [ids[4]])
+        self.assertEqual(deleted, [ids[2]])
+
+    def test_late_commit_is_not_skipped(self):
+        first = self.make_signalement()
+        changed, _, token = self.sync_all()
+        self.assertEqual(changed, [first.pk])
+
+        # Écriture validée après la lecture précédente, mais datée d'avant
+        late = self.make_signalement(objet='Tardif')
+        Signalement.objects.filter(pk=late.pk).update(updated_at=first.updated_at - timedelta(seconds=1))
+        changed, _, _ = self.sync_all(token)
+        self.assertIn(late.pk, changed)
+
+    def test_final_page_token_stays_behind_the_safety_lag(self):
+        self.make_signalement()
+        token = self.sync()['token']
+        self.assertLessEqual(decode_token(token)['u'][0], timezone.now() - timedelta(seconds=safety_lag() - 1))
+
+    def test_invalid_token(self):
+        response = self.client_for(self.citizen).get('/api/signalements/changes/', {'since': 'invalide'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(SIGNALEMENT_SYNC_SAFETY_LAG=0)
+    def test_priority_refresh_stays_out_of_the_stream(self):
+        existing = self.make_signalement(latitude=5.47, longitude=10.42)
+        score = Signalement.objects.get(pk=existing.pk).score_priorite
+        _, _, token = self.sync_all()
+        neighbour = self.make_signalement(latitude=5.4705, longitude=10.42)
+        changed, _, token = self.sync_all(token)
+        self.assertEqual(changed, [neighbour.pk])
+        self.assertGreater(Signalement.objects.get(pk=existing.pk).score_priorite, score)
+
+        call_command('recompute_signalement_priorities', stdout=io.StringIO())
+        changed, _, _ = self.sync_all(token)
+        self.assertEqual(changed, [])
+
+    @override_settings(SIGNALEMENT_SYNC_SAFETY_LAG=0)
+    def test_detached_duplicates_reach_the_stream(self):
+        root = self.make_signalement()
+        duplicate = self.make_signalement(objet='Doublon')
+        Signalement.objects.filter(pk=duplicate.pk).update(doublon_de=root)
+        _, _, token = self.sync_all()
+
+        root_id = root.pk
+        root.delete()
+        changed, deleted, _ = self.sync_all(token)
+        self.assertEqual(changed, [duplicate.pk])
+        self.assertEqual(deleted, [root_id])
+        self.assertIsNone(Signalement.objects.get(pk=duplicate.pk).doublon_de_id)
+
+
+class SyncScopeTests(SignalementTestMixin, TestCase):
+    """Signalements sortis du périmètre d'un client (commune ou statut modifié)"""
+
+    def sync_all(self, user, token=None):
+        changed, deleted = [], []
+        while True:
+            params = {'since': token} if token else {}
+            page = self.client_for(user).get('/api/signalements/changes/', params).json()
+            changed += [row['id'] for row in page['signalements']]
+            deleted += page['deleted']
+            token = page['token']
+            if not page['has_more']:
+                return changed, deleted, token
+
+    @override_settings(SIGNALEMENT_SYNC_SAFETY_LAG=0)
+    def test_commune_change_removes_the_row_for_the_old_commune(self):
+        signalement = self.make_signalement()
+        _, _, ctd_token = self.sync_all(self.ctd)
+        _, _, citizen_token = self.sync_all(self.citizen)
+
+        response = self.client_for(self.admin).put(f'/api/signalements/update/{signalement.pk}/',
+                                                   {'commune': self.other_commune.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sync_all(self.ctd, ctd_token)[:2], ([], [signalement.pk]))
+        # Toujours visible par son auteur : modifié, pas retiré
+        self.assertEqual(self.sync_all(self.citizen, citizen_token)[:2], ([signalement.pk], []))
+
+    @override_settings(SIGNALEMENT_SYNC_SAFETY_LAG=0)
+    def test_commune_deletion_leaves_a_trace_for_the_old_commune(self):
+        commune = Commune.objects.create(nom='Commune temporaire', region='Ouest')
+        signalement = self.make_signalement(commune=commune)
+        commune_id = commune.pk
+        _, _, token = self.sync_all(self.admin)
+        commune.delete()
+        self.assertTrue(SignalementSuppression.objects.filter(signalement_id=signalement.pk,
+                                                              commune_id=commune_id).exists())
+        # L'administrateur voit toujours le signalement, désormais sans commune
+        self.assertEqual(self.sync_all(self.admin, token)[:2], ([signalement.pk], []))
+
+    @override_settings(SIGNALEMENT_SYNC_SAFETY_LAG=0)
+    def test_status_filtered_clients_lose_the_row(self):
+        public = make_user('public@example.com', 'partenaire', self.commune)
+        signalement = self.make_signalement(statut='en_cours')
+        changed, _, token = self.sync_all(public)
+        self.assertEqual(changed, [signalement.pk])
+        self.client_for(self.admin).patch('/api/signalements/update-statut/batch/',
+                                          {'ids': [signalement.pk], 'statut': 'traite'}, format='json')
+        self.assertEqual(self.sync_all(public, token)[:2], ([], [signalement.pk]))
+
+
+class CountersTests(SignalementTestMixin, TestCase):
+
+    def assertCountersConsistent(self):
+        self.assertEqual(verify_counters(), {})
+
+    def test_counters_follow_create_update_delete(self):
+        signalement = self.make_signalement()
+        self.make_signalement(commune=None, type_signalement='pollution')
+        self.assertEqual(read_cross_tab(self.commune), {('en_attente', 'dechets'): 1})
+        self.assertCountersConsistent()
+
+        signalement.statut = 'en_cours'
+        signalement.commune = self.other_commune
+        signalement.save()
+        self.assertEqual(read_cross_tab(self.other_commune).get(('en_cours', 'dechets')), 1)
+        self.assertCountersConsistent()
+
+        signalement.delete()
+        self.assertCountersConsistent()
+
+    def test_counters_follow_bulk_operations(self):
+        ids = [self.make_signalement().pk for _ in range(3)]
+        response = self.client_for(self.ctd).patch(
+            '/api/signalements/update-statut/batch/', {'ids': ids, 'statut': 'traite'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(read_cross_tab(self.commune).get(('traite', 'dechets')), 3)
+        self.assertCountersConsistent()
+
+        Signalement.objects.filter(pk__in=ids[:2]).delete()
+        self.assertCountersConsistent()
+
+    def test_counters_without_commune_are_unique(self):
+        self.make_signalement(commune=None)
+        self.make_signalement(commune=None)
+        self.assertEqual(SignalementCompteur.objects.filter(commune__isnull=True).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SignalementCompteur.objects.create(commune=None, statut='en_attente', type_signalement='dechets')
+
+    def test_deleting_a_commune_moves_its_counters(self):
+        self.make_signalement(commune=None)
+        signalement = self.make_signalement(commune=self.other_commune)
+        self.make_signalement(commune=self.other_commune, statut='traite')
+        self.other_commune.delete()
+
+        self.assertIsNone(Signalement.objects.get(pk=signalement.pk).commune_id)
+        self.assertCountersConsistent()
+        cross_tab = read_cross_tab()
+        self.assertEqual((cross_tab[('en_attente', 'dechets')], cross_tab[('traite', 'dechets')]), (2, 1))
+
+    def test_rebuild_repairs_drift(self):
+        self.make_signalement()
+        SignalementCompteur.objects.update(total=5)
+        self.assertNotEqual(verify_counters(), {})
+        rebuild_counters()
+        self.assertCountersConsistent()
+
+
+class CursorPaginationTests(SignalementTestMixin, TestCase):
+
+    def page(self, **params):
+        params.setdefault('pagination', 'cursor')
+        params.setdefault('page_size', 3)
+        response = self.client_for(self.admin).get('/api/signalements/liste/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, page):
+        return [row['id'] for row in page['signalements']]
+
+    def test_next_and_previous_round_trip(self):
+        ids = [self.make_signalement(objet=f'Signalement {i}').pk for i in range(7)]
+        newest_first = sorted(ids, reverse=True)
+
+        first = self.page()
+        self.assertEqual(self.ids(first), newest_first[:3])
+        self.assertIsNone(first['previous_cursor'])
+        second = self.page(cursor=first['next_cursor'])
+        self.assertEqual(self.ids(second), newest_first[3:6])
+        third = self.page(cursor=second['next_cursor'])
+        self.assertEqual(self.ids(third), newest_first[6:])
+        self.assertIsNone(third['next_cursor'])
+
+        back = self.page(cursor=third['previous_cursor'])
+        self.assertEqual(self.ids(back), self.ids(second))
+        self.assertEqual(back['next_cursor'], second['next_cursor'])
+        start = self.page(cursor=back['previous_cursor'])
+        self.assertEqual(self.ids(start), self.ids(first))
+        self.assertIsNone(start['previous_cursor'])
+
+    def test_default_count_is_exact_without_planner_estimate(self):
+        for i in range(5):
+            self.make_signalement(objet=f'Signalement {i}')
+        page = self.page(page_size=2)
+        self.assertEqual((page['count'], page['count_exact']), (5, True))
+        page = self.page(page_size=2, count='none')
+        self.assertEqual((page['count'], page['count_exact']), (None, False))
+
+    def test_invalid_cursor(self):
+        response = self.client_for(self.admin).get('/api/signalements/liste/', {'cursor': 'invalide'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchCursorTests(SignalementTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Pertinences distinctes et ex aequo, dans un ordre de création sans rapport
+        for objet, description in [
+            ('Plastique', 'Plastique dans le caniveau'),
+            ('Plastique plastique', 'Sacs plastique et bouteilles plastique'),
+            ('Bruit', 'Plastique brûlé la nuit'),
+            ('Plastique', 'Plastique dans le caniveau'),
+            ('Fumée', 'Usine'),
+            ('Plastique plastique', 'Plastique'),
+            ('Plastique', 'Plastique dans le caniveau'),
+        ]:
+            self.make_signalement(objet=objet, description=description)
+
+    def get(self, **params):
+        response = self.client_for(self.admin).get('/api/signalements/liste/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_cursor_pages_keep_relevance_order(self):
+        expected = [row['id'] for row in self.get(q='plastique')['signalements']]
+        self.assertEqual(len(expected), 6)
+
+        pages, cursor = [], None
+        while True:
+            params = {'q': 'plastique', 'pagination': 'cursor', 'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            page = self.get(**params)
+            pages.append([row['id'] for row in page['signalements']])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(sum(pages, []), expected)
+
+        back = self.get(q='plastique', pagination='cursor', page_size=2, cursor=page['previous_cursor'])
+        self.assertEqual([row['id'] for row in back['signalements']], pages[-2])
+
+    def test_cursor_must_match_the_search(self):
+        page = self.get(pagination='cursor', page_size=2)
+        response = self.client_for(self.admin).get(
+            '/api/signalements/liste/', {'q': 'plastique', 'cursor': page['next_cursor']},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class IdempotencyTests(SignalementTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+
+    def post(self, key, user=None, **values):
+        data = {
+            'objet': 'Dépôt sauvage', 'description': 'Déchets au bord de la route',
+            'localisation': 'Marché A', 'type_signalement': 'dechets',
+        }
+        data.update(values)
+        return self.client_for(user or self.citizen).post(
+            '/api/signalements/create/', data, format='json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post('cle-1')
+        self.assertEqual(first.status_code, 201)
+        retry = self.post('cle-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Signalement.objects.count(), 1)
+
+    def test_same_key_with_another_payload_is_rejected(self):
+        self.assertEqual(self.post('cle-1').status_code, 201)
+        response = self.post('cle-1', objet='Autre chose')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Signalement.objects.count(), 1)
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.post('cle-1')
+        other = make_user('autre@example.com', 'citoyen', self.commune)
+        response = self.post('cle-1', user=other)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Signalement.objects.count(), 2)
+
+    def test_errors_are_not_replayed(self):
+        self.assertEqual(self.post('cle-1', type_signalement='inconnu').status_code, 400)
+        self.assertEqual(self.post('cle-1').status_code, 201)
+
+    def test_concurrent_duplicate_gets_a_conflict(self):
+        # Requête de même clé toujours en cours : verrou posé, aucune réponse conservée
+        pending = SimpleNamespace(user=self.citizen, method='POST', path='/api/signalements/create/')
+        caches['default'].add(_cache_key(pending, 'cle-1') + ':verrou', 1)
+        with mock.patch('backend.idempotency.WAIT_TIMEOUT', 0.2):
+            response = self.post('cle-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Retry-After', response)
+
+
+class StatistiquesTests(SignalementTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for statut, type_signalement in [
+            ('en_attente', 'dechets'), ('rejeté', 'pollution'), ('traite', 'climat'), ('rejeté', 'dechets'),
+        ]:
+            self.make_signalement(statut=statut, type_signalement=type_signalement)
+        self.make_signalement(commune=self.other_commune, type_signalement='pollution')
+
+    def test_ctd_statistics_for_their_commune(self):
+        response = self.client_for(self.ctd).get('/api/signalements/statistiques/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total'], 4)
+        self.assertEqual((data['en_attente'], data['traite'], data['rejete']), (1, 1, 2))
+        self.assertEqual(data['par_type'], {'dechets': 2, 'pollution': 1, 'climat': 1})
+        self.assertEqual(data['par_statut_type']['rejeté'], {'dechets': 1, 'pollution': 1, 'climat': 0})
+
+    def test_admin_sees_every_commune(self):
+        data = self.client_for(self.admin).get('/api/signalements/statistiques/').json()
+        self.assertEqual(data['total'], 5)
+
+    def test_time_series_in_one_aggregate_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(self.ctd).get(
+                '/api/signalements/statistiques/', {'bucket': 'week', 'from': '2020-01-01', 'to': '2099-01-01'},
+            )
+        self.assertEqual(response.status_code, 200)
+        serie = response.json()['serie']
+        self.assertEqual(sum(point['total'] for point in serie), 4)
+        # Authentification de l'utilisateur exclue : agrégats + série
+        self.assertLessEqual(len(queries), 2)
+
+    def test_date_only_bounds_cover_the_whole_day(self):
+        today = timezone.localdate().isoformat()
+        data = self.client_for(self.ctd).get('/api/signalements/statistiques/', {'from': today, 'to': today}).json()
+        self.assertEqual(data['total'], 4)
+
+    def test_invalid_bucket_and_citizen_access(self):
+        self.assertEqual(
+            self.client_for(self.ctd).get('/api/signalements/statistiques/', {'bucket': 'year'}).status_code, 400,
+        )
+        self.assertEqual(self.client_for(self.citizen).get('/api/signalements/statistiques/').status_code, 403)
+
+
+class SpatialFilterTests(SignalementTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Grille régulière de 15 × 15 points autour de (5.5, 10.4), pas de ~1 km
+        self.points = [(5.43 + 0.01 * i, 10.33 + 0.01 * j) for i in range(15) for j in range(15)]
+        Signalement.objects.bulk_create([
+            Signalement(
+                objet='Dépôt', description='d', localisation='l', type_signalement='dechets',
+                utilisateur=self.citizen, commune=self.commune, latitude=lat, longitude=lon,
+                geo_cell=encode_geohash(lat, lon),
+            )
+            for lat, lon in self.points
+        ])
+
+    def liste(self, params):
+        return self.client_for(self.admin).get('/api/signalements/liste/', params)
+
+    def test_geohash_reference_value(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_radius_matches_haversine(self):
+        for radius in (500, 2500, 6000):
+            with self.subTest(radius=radius):
+                expected = sum(1 for lat, lon in self.points if haversine_m(5.5, 10.4, lat, lon) <= radius)
+                response = self.liste({'lat': 5.5, 'lon': 10.4, 'radius': radius})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['count'], expected)
+
+    def test_radius_is_checked_in_sql(self):
+        queryset = filter_radius(Signalement.objects.all(), 5.5, 10.4, 6000)
+        with CaptureQueriesContext(connection) as queries:
+            ids = set(queryset.values_list('id', flat=True))
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(' IN (', queries[0]['sql'])
+        self.assertEqual(ids, set(
+            Signalement.objects.filter(id__in=[
+                pk for pk, lat, lon in Signalement.objects.values_list('id', 'latitude', 'longitude')
+                if haversine_m(5.5, 10.4, lat, lon) <= 6000
+            ]).values_list('id', flat=True)
+        ))
+
+    def test_bbox_matches_bounds(self):
+        expected = sum(1 for lat, lon in self.points if 5.455 <= lat <= 5.555 and 10.355 <= lon <= 10.455)
+        response = self.liste({'bbox': '10.355,5.455,10.455,5.555'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], expected)
+
+    def test_invalid_parameters(self):
+        for params in ({'bbox': 'a,b'}, {'bbox': '10.5,5.5,10.4,5.4'}, {'radius': 100},
+                       {'lat': 5.5, 'lon': 10.4, 'radius': 0}):
+            with self.subTest(params=params):
+                self.assertEqual(self.liste(params).status_code, 400)
+
+    def test_coordinates_come_from_the_photo(self):
+        photo = Photo.objects.create(image='photos/terrain.jpg', latitude=5.0, longitude=10.0)
+        response = self.post_signalement(photo_id=photo.pk)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['signalement']['latitude'], 5.0)
+        self.assertEqual(self.post_signalement(latitude=3).status_code, 400)
+
+    def test_backfill_command(self):
+        photo = Photo.objects.create(image='photos/terrain.jpg', latitude=5.0, longitude=10.0)
+        signalement = self.make_signalement(photo_id=photo.pk)
+        call_command('backfill_signalement_coordinates', stdout=io.StringIO())
+        signalement.refresh_from_db()
+        self.assertEqual((signalement.latitude, signalement.longitude), (5.0, 10.0))
+        self.assertEqual(signalement.geo_cell, encode_geohash(5.0, 10.0))
+
+
+class BatchCreateTests(SignalementTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.photo = Photo.objects.create(image='photos/terrain.jpg', latitude=5.0, longitude=10.0)
+
+    def item(self, index, **values):
+        # Positions éloignées : pas de détection de doublons entre éléments
+        data = {
+            'objet': f'Dépôt {index}', 'description': 'Déchets', 'localisation': 'Marché',
+            'type_signalement': 'dechets', 'client_id': f'c{index}',
+            'latitude': 4.0 + index, 'longitude': 9.0 + index,
+        }
+        data.update(values)
+        return data
+
+    def post_batch(self, items):
+        return self.client_for(self.citizen).post('/api/signalements/create/batch/', {'signalements': items},
+                                                  format='json')
+
+    def test_all_items_created_in_one_insert(self):
+        items = [self.item(i, photo_id=self.photo.pk if i % 2 else None) for i in range(10)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_batch(items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 10)
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(sum(1 for q in sql if q.startswith('INSERT INTO "signalement_signalement"')), 1)
+        self.assertEqual(sum(1 for q in sql if 'FROM "photos_photo"' in q), 1)
+        self.assertEqual(Signalement.objects.filter(commune=self.commune).count(), 10)
+        self.assertEqual(verify_counters(), {})
+
+    def test_partial_failure_is_reported_per_item(self):
+        items = [
+            self.item(0),
+            self.item(1, type_signalement='inconnu'),
+            self.item(2, photo_id=999999),
+            'pas un objet',
+            self.item(4, photo_id=self.photo.pk, latitude=None, longitude=None),
+        ]
+        response = self.post_batch(items)
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'error', 'error', 'error', 'created'])
+        self.assertEqual(results[1]['client_id'], 'c1')
+        self.assertIn('type_signalement', results[1]['errors'])
+        self.assertIn('photo_id', results[2]['errors'])
+        self.assertEqual(results[4]['signalement']['latitude'], 5.0)
+        self.assertEqual(Signalement.objects.count(), 2)
+
+    def test_rejected_batches(self):
+        self.assertEqual(self.post_batch([]).status_code, 400)
+        self.assertEqual(self.post_batch([self.item(0, type_signalement='inconnu')]).status_code, 400)
+        with mock.patch('signalement.views.MAX_BATCH_SIZE', 2):
+            self.assertEqual(self.post_batch([self.item(i) for i in range(3)]).status_code, 400)
+        self.assertFalse(Signalement.objects.exists())
+
+
+class ExportTests(SignalementTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            self.make_signalement(objet=f'Dépôt, "{i}"', description='Sur deux\nlignes',
+                                  type_signalement='climat' if i % 2 else 'dechets')
+        self.make_signalement(commune=self.other_commune)
+
+    def export(self, user, **params):
+        return self.client_for(user).get('/api/signalements/export/', params)
+
+    def test_csv_is_streamed_and_escaped(self):
+        response = self.export(self.admin, type='climat')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Disposition'].endswith('.csv"'))
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], EXPORT_FIELDS)
+        self.assertEqual([row[1] for row in rows[1:]], ['Dépôt, "1"', 'Dépôt, "3"'])
+        self.assertEqual(rows[1][2], 'Sur deux\nlignes')
+
+    def test_csv_neutralizes_formulas(self):
+        for i, objet in enumerate(['=HYPERLINK("http://x")', '+1', '-1', '@SUM(A1)']):
+            self.make_signalement(objet=objet, description=f'Formule {i}', type_signalement='pollution')
+        response = self.export(self.admin, type='pollution')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual([row[1] for row in rows[1:]], ["'=HYPERLINK(\"http://x\")", "'+1", "'-1", "'@SUM(A1)"])
+        # Le NDJSON n'est pas ouvert dans un tableur : valeurs inchangées
+        response = self.export(self.admin, type='pollution', output='ndjson')
+        first = json.loads(b''.join(response.streaming_content).splitlines()[0])
+        self.assertEqual(first['objet'], '=HYPERLINK("http://x")')
+
+    def test_ndjson_respects_the_commune_scope(self):
+        response = self.export(self.ctd, output='ndjson')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({row['commune_id'] for row in rows}, {self.commune.pk})
+
+    def test_rows_are_read_in_chunks(self):
+        with mock.patch('signalement.export.CHUNK_SIZE', 2), \
+                mock.patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as iterator:
+            response = self.export(self.admin, output='ndjson')
+            self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 5)
+        self.assertEqual(iterator.call_args.kwargs, {'chunk_size': 2})
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.export(self.admin, output='xml').status_code, 400)
+        self.assertEqual(self.export(self.admin, statut='inconnu').status_code, 400)
+        self.assertEqual(self.export(self.citizen).status_code, 403)
+
+
+class PhotoRelationTests(SignalementTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.photo = Photo.objects.create(image='photos/terrain.jpg', latitude=5.0, longitude=10.0)
+
+    def add_signalements(self, count):
+        for i in range(count):
+            user = make_user(f'auteur{Signalement.objects.count()}@example.com', 'citoyen', self.commune)
+            photo = Photo.objects.create(image=f'photos/p{i}.jpg', latitude=5.0, longitude=10.0)
+            self.make_signalement(utilisateur=user, photo=photo, latitude=4.0 + i, longitude=9.0 + i)
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(self.admin).get('/api/signalements/liste/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_list_query_count_is_constant(self):
+        self.add_signalements(2)
+        few, _ = self.list_queries()
+        self.add_signalements(10)
+        many, data = self.list_queries()
+        self.assertEqual(data['count'], 12)
+        self.assertEqual(few, many)
+        embedded = data['signalements'][0]['photo']
+        self.assertEqual((embedded['latitude'], embedded['longitude']), (5.0, 10.0))
+        self.assertTrue(embedded['image'].endswith('.jpg'))
+
+    def test_photo_reference_is_validated(self):
+        response = self.post_signalement(photo_id=self.photo.pk)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['signalement']['photo_id'], self.photo.pk)
+        response = self.post_signalement(photo_id=999999)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('photo_id', response.json()['errors'])
+
+    def test_photo_can_be_detached(self):
+        signalement = self.make_signalement(photo=self.photo)
+        response = self.client_for(self.citizen).put(
+            f'/api/signalements/update/{signalement.pk}/', {'photo_id': None}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['signalement']['photo'])
+
+    def test_deleting_the_photo_keeps_the_signalement(self):
+        signalement = self.make_signalement(photo=self.photo)
+        self.photo.delete()
+        signalement.refresh_from_db()
+        self.assertIsNone(signalement.photo_id)
+
+
+class CreateWithPhotoTests(SignalementTestMixin, TestCase):
+    """Création de la photo et du signalement en une requête multipart"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().tearDown()
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media_root) for name in names]
+
+    def post_with_photo(self, with_image=True, **values):
+        data = {
+            'objet': 'Dépôt sauvage', 'description': 'Déchets au bord de la route',
+            'localisation': 'Marché A', 'type_signalement': 'dechets',
+            'latitude': '5.47', 'longitude': '10.42',
+        }
+        data.update(values)
+        if with_image:
+            buffer = io.BytesIO()
+            Image.new('RGB', (40, 30), 'green').save(buffer, 'JPEG')
+            data['image'] = SimpleUploadedFile('terrain.jpg', buffer.getvalue(), content_type='image/jpeg')
+        with mock.patch('signalement.views.submit_on_commit') as submit:
+            response = self.client_for(self.citizen).post('/api/signalements/create/with-photo/', data)
+        return response, submit
+
+    def test_photo_and_signalement_are_created_together(self):
+        response, submit = self.post_with_photo()
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        signalement = Signalement.objects.get(pk=data['signalement']['id'])
+        self.assertEqual(signalement.photo_id, data['photo']['id'])
+        self.assertEqual((signalement.latitude, signalement.longitude), (5.47, 10.42))
+        self.assertEqual((signalement.utilisateur, signalement.commune), (self.citizen, self.commune))
+        self.assertEqual(data['signalement']['photo']['id'], data['photo']['id'])
+        self.assertEqual(len(self.stored_files()), 1)
+        submit.assert_called_once()
+        self.assertEqual(submit.call_args.args[1], data['photo']['id'])
+
+    def test_missing_image_or_bad_coordinates_are_rejected(self):
+        cases = (
+            ('image', {'with_image': False}),
+            ('latitude', {'latitude': '95'}),
+            ('longitude', {'longitude': 'est'}),
+        )
+        for field, values in cases:
+            with self.subTest(field=field):
+                response, submit = self.post_with_photo(**values)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.json()['errors'])
+                submit.assert_not_called()
+        self.assertEqual((Photo.objects.count(), Signalement.objects.count()), (0, 0))
+        self.assertEqual(self.stored_files(), [])
+
+    def test_invalid_signalement_creates_no_photo(self):
+        response, _ = self.post_with_photo(type_signalement='inconnu')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('type_signalement', response.json()['errors'])
+        self.assertEqual(Photo.objects.count(), 0)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_failed_save_rolls_back_the_photo_and_its_file(self):
+        with mock.patch('signalement.views.detect_duplicates', side_effect=IntegrityError('conflit')), \
+                mock.patch('signalement.views.traceback.print_exc'):
+            response, submit = self.post_with_photo()
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual((Photo.objects.count(), Signalement.objects.count()), (0, 0))
+        self.assertEqual(self.stored_files(), [])
+        submit.assert_not_called()
+
+
+class StatusHistoryTests(SignalementTestMixin, TestCase):
+
+    def delais(self, user, **params):
+        return self.client_for(user).get('/api/signalements/statistiques/delais/', params)
+
+    def test_status_changes_are_logged(self):
+        signalement = self.make_signalement()
+        response = self.client_for(self.ctd).patch(f'/api/signalements/update-statut/{signalement.pk}/',
+                                                   {'statut': 'en_cours'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        admin = self.client_for(self.admin)
+        admin.put(f'/api/signalements/update/{signalement.pk}/', {'statut': 'traite'}, format='json')
+        # Sans changement de statut : aucune ligne ajoutée
+        admin.put(f'/api/signalements/update/{signalement.pk}/', {'objet': 'Autre objet'}, format='json')
+        history = list(SignalementStatutHistorique.objects.filter(signalement=signalement)
+                       .values_list('ancien_statut', 'nouveau_statut', 'modifie_par'))
+        self.assertEqual(history, [('en_attente', 'en_cours', self.ctd.pk), ('en_cours', 'traite', self.admin.pk)])
+
+    def test_median_and_p90(self):
+        start = timezone.now() - timedelta(days=2)
+        for hours in range(1, 11):
+            signalement = self.make_signalement()
+            Signalement.objects.filter(pk=signalement.pk).update(date_signalement=start)
+            SignalementStatutHistorique.objects.bulk_create([
+                SignalementStatutHistorique(signalement=signalement, ancien_statut='en_attente',
+                                            nouveau_statut='en_cours', date_changement=start + timedelta(hours=hours)),
+                SignalementStatutHistorique(signalement=signalement, ancien_statut='en_cours',
+                                            nouveau_statut='traite', date_changement=start + timedelta(days=1)),
+            ])
+        response = self.delais(self.ctd)
+        self.assertEqual(response.status_code, 200)
+        [row] = response.json()['resultats']
+        self.assertEqual((row['commune_id'], row['type_signalement']), (self.commune.pk, 'dechets'))
+        self.assertEqual(row['prise_en_charge'], {'nombre': 10, 'mediane_secondes': 18000.0, 'p90_secondes': 32400.0})
+        self.assertEqual(row['resolution']['mediane_secondes'], 86400.0)
+
+    def test_date_only_bounds_cover_the_whole_day(self):
+        signalement = self.make_signalement()
+        SignalementStatutHistorique.objects.create(signalement=signalement, ancien_statut='en_attente',
+                                                   nouveau_statut='en_cours')
+        today = timezone.localdate().isoformat()
+        self.assertEqual(len(self.delais(self.admin, to=today).json()['resultats']), 1)
+        yesterday = (timezone.localdate() - timedelta(days=1)).isoformat()
+        self.assertEqual(self.delais(self.admin, to=yesterday).json()['resultats'], [])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.delais(self.citizen).status_code, 403)
+        self.assertEqual(self.delais(self.admin, **{'from': 'hier'}).status_code, 400)
+        self.assertEqual(self.delais(self.admin, type_signalement='inconnu').status_code, 400)
+
+
+class DuplicateDetectionTests(SignalementTestMixin, TestCase):
+    INCENDIE = ('Incendie à la décharge de Kamkop', 'La décharge brûle depuis ce matin, fumée noire')
+
+    def post_incident(self, objet=INCENDIE[0], description=INCENDIE[1], **values):
+        values.setdefault('latitude', 5.47)
+        values.setdefault('longitude', 10.42)
+        response = self.post_signalement(objet=objet, description=description, **values)
+        self.assertEqual(response.status_code, 201)
+        return response.json()['signalement']
+
+    def test_near_duplicates_are_grouped(self):
+        root = self.post_incident()
+        copy = self.post_incident('Incendie decharge Kamkop', 'La decharge brule depuis ce matin, fumee noire!')
+        other = self.post_incident('Nid de poule', 'Route abîmée près du marché')
+        far = self.post_incident(latitude=5.6)
+        other_type = self.post_incident(type_signalement='pollution')
+        self.assertEqual(copy['doublon_de'], root['id'])
+        for signalement in (root, other, far, other_type):
+            self.assertIsNone(signalement['doublon_de'])
+        self.assertEqual(Signalement.objects.get(pk=root['id']).nombre_doublons, 1)
+
+    def test_duplicates_outside_the_window_are_ignored(self):
+        root = self.post_incident()
+        Signalement.objects.filter(pk=root['id']).update(date_signalement=timezone.now() - timedelta(days=3))
+        self.assertIsNone(self.post_incident()['doublon_de'])
+
+    def test_lists_collapse_groups(self):
+        root = self.post_incident()
+        self.post_incident()
+        self.post_incident()
+        client = self.client_for(self.ctd)
+        data = client.get('/api/signalements/liste/').json()
+        self.assertEqual([(item['id'], item['nombre_doublons']) for item in data['signalements']], [(root['id'], 2)])
+        self.assertEqual(client.get('/api/signalements/liste/', {'doublon_de': root['id']}).json()['count'], 3)
+        self.assertEqual(client.get('/api/signalements/commune/', {'doublons': 1}).json()['count'], 3)
+        self.assertEqual(client.get('/api/signalements/liste/', {'doublon_de': 'x'}).status_code, 400)
+
+    def test_duplicate_of_another_citizens_report_stays_listed(self):
+        neighbour = make_user('voisin@example.com', 'citoyen', self.commune)
+        root = self.post_signalement(neighbour, objet=self.INCENDIE[0], description=self.INCENDIE[1],
+                                     latitude=5.47, longitude=10.42).json()['signalement']
+        own = self.post_incident()
+        self.assertEqual(own['doublon_de'], root['id'])
+        client = self.client_for(self.citizen)
+        self.assertEqual([item['id'] for item in client.get('/api/signalements/liste/').json()['signalements']],
+                         [own['id']])
+        self.assertEqual(client.get('/api/signalements/mes-signalements/').json()['count'], 1)
+        # Le ctd voit le groupe replié sur le principal
+        data = self.client_for(self.ctd).get('/api/signalements/liste/').json()
+        self.assertEqual([item['id'] for item in data['signalements']], [root['id']])
+
+    def test_duplicate_whose_root_is_filtered_out_stays_listed(self):
+        root = self.post_incident()
+        duplicate = self.post_incident()
+        Signalement.objects.filter(pk=root['id']).update(statut='traite')
+        data = self.client_for(self.ctd).get('/api/signalements/liste/', {'statut': 'en_attente'}).json()
+        self.assertEqual([item['id'] for item in data['signalements']], [duplicate['id']])
+
+    def test_deleting_a_duplicate_updates_the_count(self):
+        root = self.post_incident()
+        copy = self.post_incident()
+        self.client_for(self.citizen).delete(f'/api/signalements/delete/{copy["id"]}/')
+        self.assertEqual(Signalement.objects.get(pk=root['id']).nombre_doublons, 0)
+
+    def test_index_command_rebuilds_groups(self):
+        for _ in range(3):
+            self.make_signalement(objet=self.INCENDIE[0], description=self.INCENDIE[1], latitude=5.47, longitude=10.42)
+        call_command('build_signalement_duplicates_index', '--group', stdout=io.StringIO())
+        rows = list(Signalement.objects.order_by('id').values_list('id', 'doublon_de', 'nombre_doublons'))
+        root_id = rows[0][0]
+        self.assertEqual(rows, [(root_id, None, 2), (root_id + 1, root_id, 0), (root_id + 2, root_id, 0)])
+
+
+class HeatmapTests(SignalementTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ids = [
+            self.post_signalement(objet=f'Dépôt {i}', description=f'Texte {i} ' * 3,
+                                  latitude=5.47 + i * 0.01, longitude=10.42).json()['signalement']['id']
+            for i in range(4)
+        ]
+
+    def assertConsistent(self):
+        stored = {
+            (cell.zoom, cell.x, cell.y, cell.statut, cell.type_signalement): cell.total
+            for cell in HeatmapCell.objects.filter(total__gt=0)
+        }
+        self.assertEqual(stored, {key: total for key, total in compute_expected_cells().items() if total})
+
+    def tile(self, z, x, y, **params):
+        return self.client_for(self.admin).get(f'/api/signalements/heatmap/{z}/{x}/{y}/', params)
+
+    def test_cells_follow_every_change(self):
+        self.assertConsistent()
+        self.client_for(self.ctd).patch(f'/api/signalements/update-statut/{self.ids[0]}/',
+                                        {'statut': 'traite'}, format='json')
+        self.client_for(self.admin).put(f'/api/signalements/update/{self.ids[1]}/',
+                                        {'latitude': 4.0, 'longitude': 9.7}, format='json')
+        self.client_for(self.citizen).delete(f'/api/signalements/delete/{self.ids[2]}/')
+        self.client_for(self.citizen).post('/api/signalements/create/batch/', [
+            {'objet': 'Fumée', 'description': 'Fumée épaisse', 'localisation': 'l', 'type_signalement': 'climat',
+             'latitude': 5.5, 'longitude': 10.4},
+        ] * 2, format='json')
+        self.assertConsistent()
+
+    def test_tile_is_read_in_one_query(self):
+        x, y = tile_xy(5.47, 10.42, 8)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.tile(8, x, y)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        data = response.json()
+        self.assertEqual((data['cell_zoom'], data['total']), (8 + CELL_BITS, 4))
+        self.assertEqual(sum(cell['par_type']['dechets'] for cell in data['cells']), 4)
+        self.assertEqual(self.tile(0, 0, 0).json()['total'], 4)
+        self.assertEqual(self.tile(8, x, y, statut='traite').json()['total'], 0)
+
+    def test_invalid_tiles(self):
+        self.assertEqual(self.tile(MAX_ZOOM + 1, 0, 0).status_code, 400)
+        self.assertEqual(self.tile(1, 5, 0).status_code, 400)
+
+    def test_rebuild_command(self):
+        HeatmapCell.objects.all().delete()
+        call_command('rebuild_signalement_heatmap', stdout=io.StringIO())
+        self.assertConsistent()
+
+
+class BulkStatusTests(SignalementTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ids = [
+            self.make_signalement(commune=self.commune if i < 4 else self.other_commune,
+                                  latitude=5.4, longitude=10.4).pk
+            for i in range(6)
+        ]
+        Signalement.objects.filter(pk=self.ids[0]).update(statut='traite')
+        rebuild_counters()
+        rebuild_heatmap()
+
+    def patch(self, user, data):
+        return self.client_for(user).patch('/api/signalements/update-statut/batch/', data, format='json')
+
+    def test_ctd_closes_their_commune_in_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(self.ctd, {'ids': self.ids + [999999], 'statut': 'traite'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['updated_ids'], self.ids[1:4])
+        self.assertEqual(data['ignored_ids'], [self.ids[0]] + self.ids[4:] + [999999])
+        status_updates = [q['sql'] for q in queries.captured_queries
+                          if q['sql'].startswith('UPDATE "signalement_signalement"') and '"date_resolution"' in q['sql']]
+        self.assertEqual(len(status_updates), 1)
+
+        self.assertEqual(Signalement.objects.filter(pk__in=self.ids[1:4], date_resolution__isnull=False).count(), 3)
+        self.assertEqual(Signalement.objects.filter(commune=self.other_commune, statut='en_attente').count(), 2)
+        self.assertEqual(SignalementStatutHistorique.objects.filter(modifie_par=self.ctd).count(), 3)
+        self.assertEqual(verify_counters(), {})
+        stored = {
+            (cell.zoom, cell.x, cell.y, cell.statut, cell.type_signalement): cell.total
+            for cell in HeatmapCell.objects.filter(total__gt=0)
+        }
+        self.assertEqual(stored, {key: total for key, total in compute_expected_cells().items() if total})
+
+    def test_updated_rows_appear_in_the_sync_feed(self):
+        before = timezone.now()
+        self.patch(self.admin, {'ids': self.ids, 'statut': 'en_cours'})
+        self.assertEqual(Signalement.objects.filter(updated_at__gte=before).count(), 6)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.patch(self.citizen, {'ids': self.ids, 'statut': 'traite'}).status_code, 403)
+        response = self.patch(self.admin, {'ids': [], 'statut': 'inconnu'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'ids', 'statut'})
+
+
+class PriorityTests(SignalementTestMixin, TestCase):
+
+    def post_open(self, type_signalement='dechets', latitude=5.47, longitude=10.42, objet=None):
+        objet = objet or f'Signalement {Signalement.objects.count()}'
+        response = self.post_signalement(objet=objet, description=f'{objet} : description propre',
+                                         type_signalement=type_signalement, latitude=latitude, longitude=longitude)
+        self.assertEqual(response.status_code, 201)
+        return response.json()['signalement']['id']
+
+    def score(self, pk):
+        return Signalement.objects.get(pk=pk).score_priorite
+
+    def test_score_terms(self):
+        pollution = self.post_open('pollution')
+        self.assertAlmostEqual(self.score(pollution), 30, places=1)
+        # Un voisin à ~100 m : +5 pour chacun des deux signalements
+        dechets = self.post_open('dechets', latitude=5.471)
+        self.assertAlmostEqual(self.score(dechets), 25, places=1)
+        self.assertAlmostEqual(self.score(pollution), 35, places=1)
+        isolated = self.post_open('climat', latitude=4.0, longitude=9.0)
+        self.assertAlmostEqual(self.score(isolated), 10, places=1)
+
+    def test_risk_zone_and_age(self):
+        RiskZone.objects.create(name='Berge', type='cours d\'eau', description='Berge inondable',
+                                coordinates=[[[9.9, 3.9], [10.1, 3.9], [10.1, 4.1], [9.9, 4.1], [9.9, 3.9]]])
+        pk = self.post_open('climat', latitude=4.0, longitude=10.0)
+        self.assertAlmostEqual(self.score(pk), 35, places=1)
+        Signalement.objects.filter(pk=pk).update(date_signalement=timezone.now() - timedelta(days=100))
+        call_command('recompute_signalement_priorities', stdout=io.StringIO())
+        # Âge plafonné à 30 jours
+        self.assertAlmostEqual(self.score(pk), 35 + 2 * 30, places=1)
+
+    def test_closing_resets_the_score_and_rescored_neighbours(self):
+        first = self.post_open('pollution')
+        second = self.post_open('dechets', latitude=5.471)
+        self.client_for(self.ctd).patch(f'/api/signalements/update-statut/{second}/', {'statut': 'traite'},
+                                        format='json')
+        self.assertEqual(self.score(second), 0)
+        self.assertAlmostEqual(self.score(first), 30, places=1)
+
+    def test_triage_queue(self):
+        low = self.post_open('climat', latitude=4.0, longitude=9.0)
+        high = self.post_open('pollution', latitude=4.5, longitude=9.5)
+        middle = self.post_open('dechets', latitude=3.0, longitude=8.0)
+        closed = self.post_open('pollution', latitude=3.5, longitude=8.5)
+        Signalement.objects.filter(pk=closed).update(statut='traite', score_priorite=0)
+        self.make_signalement(commune=self.other_commune, type_signalement='pollution', score_priorite=99)
+
+        response = self.client_for(self.ctd).get('/api/signalements/triage/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json()['signalements']], [high, middle, low])
+        limited = self.client_for(self.ctd).get('/api/signalements/triage/', {'limit': 1}).json()
+        self.assertEqual([item['id'] for item in limited['signalements']], [high])
+        self.assertEqual(self.client_for(self.citizen).get('/api/signalements/triage/').status_code, 403)
+        self.assertEqual(self.client_for(self.ctd).get('/api/signalements/triage/', {'limit': 'x'}).status_code, 400)
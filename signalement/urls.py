@@ -5,15 +5,25 @@ from . import views
 urlpatterns = [
     # CREATE
     path('create/', views.create_signalement, name='create-signalement'),
+    path('create/with-photo/', views.create_signalement_with_photo, name='create-signalement-with-photo'),
+    path('create/batch/', views.create_signalements_batch, name='create-signalements-batch'),
     
     # READ
     path('liste/', views.list_signalements, name='list-signalements'),
     path('detail/<int:id>/', views.detail_signalement, name='detail-signalement'),
     path('mes-signalements/', views.mes_signalements, name='mes-signalements'),
+    path('commune/', views.signalements_commune, name='signalements-commune'),
+    path('triage/', views.triage_signalements, name='triage-signalements'),
+    path('changes/', views.changes_signalements, name='changes-signalements'),
+    path('export/', views.export_signalements, name='export-signalements'),
+    path('statistiques/', views.statistiques_signalements, name='statistiques-signalements'),
+    path('heatmap/<int:z>/<int:x>/<int:y>/', views.heatmap_tile, name='heatmap-signalements'),
+    path('statistiques/delais/', views.delais_signalements, name='delais-signalements'),
     
     # UPDATE
     path('update/<int:id>/', views.update_signalement, name='update-signalement'),
     path('update-statut/<int:id>/', views.update_signalement_statut, name='update-signalement-statut'),
+    path('update-statut/batch/', views.update_signalements_statut_batch, name='update-signalements-statut-batch'),
     
     # DELETE
     path('delete/<int:id>/', views.delete_signalement, name='delete-signalement'),
@@ -1,43 +1,147 @@
 # signalement/views.py
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework import status
 from photos.models import Photo
-from .models import Signalement
+from photos.processing import process_photo
+from photos.serializers import PhotoSerializer
+from .models import Signalement, SignalementSuppression
+from .priority import OPEN_STATUTS
+from .pagination import CurseurInvalide, is_cursor_request, paginate_signalements
+from .bulk import update_statut_bulk
+from .counters import read_cross_tab
+from .export import FORMATS as EXPORT_FORMATS
+from .duplicates import detect_duplicates, index_signalements
+from .geo import apply_spatial_filters
+from .heatmap import CELL_BITS, MAX_ZOOM, MIN_ZOOM, read_tile
+from .search import apply_search
+from .sync import JetonInvalide, collect_changes
+from .history import compute_delays, format_delays
+from .stats import BUCKETS, compute_statistics, compute_time_series, format_statistics
+from .signals import signalements_bulk_created
 from .serializers import (
     SignalementSerializer, 
     SignalementCreateSerializer, 
+    SignalementBatchItemSerializer,
     SignalementUpdateSerializer,
     SignalementStatutSerializer,
-    SignalementAdminUpdateSerializer
+    SignalementStatutBatchSerializer,
+    SignalementAdminUpdateSerializer,
+    SignalementListSerializer,
+    SignalementFilterSerializer
 )
 from accounts.models import User
+from backend.idempotency import idempotent
+from backend.tasks import submit_on_commit
+from communes.models import Commune
 import traceback
 
+# Nombre maximal de signalements par soumission groupée
+MAX_BATCH_SIZE = 200
+
+
+def _base_queryset():
+    """
+    Queryset de base des lectures : utilisateur, commune et photo sont chargés
+    par jointure, la sérialisation d'une liste coûte donc un nombre constant de requêtes.
+    """
+    return Signalement.objects.select_related('utilisateur', 'commune', 'photo')
+
+
+def _visibility_q(user):
+    """
+    Filtre de visibilité des signalements selon le rôle de l'utilisateur.
+    Il porte sur utilisateur_id, commune_id et statut, et s'applique donc
+    aussi bien aux signalements qu'à leurs traces de suppression.
+    Retourne None si l'utilisateur ne doit rien voir.
+    """
+    if user.is_authenticated:
+        if user.role == 'citoyen':
+            # Les citoyens ne voient que leurs propres signalements
+            return Q(utilisateur_id=user.id)
+        elif user.role == 'ctd':
+            # Les ctd municipaux voient les signalements de leur commune
+            if hasattr(user, 'commune') and user.commune:
+                return Q(commune_id=user.commune_id)
+            # Si le CTD n'a pas de commune assignée, ne rien retourner
+            return None
+        elif user.role == 'admin':
+            # Les administrateurs voient tous les signalements (pas de filtre)
+            return Q()
+        # Rôle non reconnu - traiter comme un utilisateur non authentifié
+        return Q(statut='en_cours')
+    # Utilisateurs non authentifiés : signalements publics seulement
+    return Q(statut='en_cours')
+
+
+def _group_duplicates(request, signalements):
+    """
+    Les doublons sont repliés sur leur signalement principal, qui porte
+    nombre_doublons, sauf avec ?doublons=1. ?doublon_de=<id> liste un groupe.
+    Un doublon dont le principal n'est pas dans la liste (invisible pour
+    l'utilisateur ou exclu par les filtres) y figure comme son propre groupe.
+    Lève ValueError si l'identifiant de groupe est invalide.
+    """
+    groupe = request.GET.get('doublon_de')
+    if groupe:
+        if not groupe.isdigit():
+            raise ValueError('Paramètre doublon_de invalide')
+        return signalements.filter(Q(pk=groupe) | Q(doublon_de=groupe))
+    if request.GET.get('doublons') in ('1', 'true'):
+        return signalements
+    return signalements.filter(Q(doublon_de__isnull=True) | ~Q(doublon_de__in=signalements.values('id')))
+
+
+def _signalements_response(request, signalements):
+    """Sérialise une liste de signalements, paginée par curseur si demandé"""
+    if is_cursor_request(request):
+        try:
+            payload = paginate_signalements(request, signalements, SignalementSerializer,
+                                            context={'request': request})
+        except CurseurInvalide as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(payload, status=status.HTTP_200_OK)
+
+    serializer = SignalementSerializer(signalements, many=True, context={'request': request})
+    data = serializer.data
+    # Le queryset est déjà évalué : pas besoin d'un second COUNT(*)
+    return Response({
+        'count': len(data),
+        'signalements': data
+    }, status=status.HTTP_200_OK)
+
 # CREATE - Création d'un signalement
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @authentication_classes([JWTAuthentication])
+@idempotent
 def create_signalement(request):
     try:
         serializer = SignalementCreateSerializer(data=request.data)
         if serializer.is_valid():
-            photo_id = request.data.get('photo_id')
-            if photo_id:
-                try:
-                    Photo.objects.get(id=photo_id)
-                except Photo.DoesNotExist:
-                    return Response({'error': 'Photo non trouvée'}, status=status.HTTP_400_BAD_REQUEST)
+            # La photo a déjà été chargée et validée par le serializer
+            photo = serializer.validated_data.get('photo')
+            extra = {}
+            if photo is not None and serializer.validated_data.get('latitude') is None:
+                # Sans coordonnées explicites, on reprend celles de la photo
+                extra = {'latitude': photo.latitude, 'longitude': photo.longitude}
             
             
             commune_user = getattr(request.user, 'commune', None)
             
             # Créer le signalement avec utilisateur et commune si disponible
-            signalement = serializer.save(utilisateur=request.user, commune=commune_user)
+            with transaction.atomic():
+                signalement = serializer.save(utilisateur=request.user, commune=commune_user, **extra)
+                # Rattachement à un signalement existant s'il s'agit d'un quasi-doublon
+                detect_duplicates([signalement])
             
             response_serializer = SignalementSerializer(signalement)
             return Response({
@@ -51,34 +155,150 @@ def create_signalement(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# CREATE - Création d'un signalement avec sa photo (une seule requête multipart)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+@idempotent
+def create_signalement_with_photo(request):
+    """
+    Créer la photo et le signalement en une requête multipart :
+    image, latitude, longitude (position de la photo et du signalement),
+    objet, description, localisation, type_signalement.
+    La photo et le signalement sont créés dans la même transaction ; le
+    traitement de l'image est exécuté après validation, hors de la requête.
+    """
+    try:
+        photo_serializer = PhotoSerializer(data={
+            'image': request.FILES.get('image'),
+            'latitude': request.data.get('latitude'),
+            'longitude': request.data.get('longitude'),
+        })
+        serializer = SignalementCreateSerializer(data={
+            field: request.data.get(field)
+            for field in ('objet', 'description', 'localisation', 'type_signalement', 'latitude', 'longitude')
+            if field in request.data
+        })
+        photo_valid = photo_serializer.is_valid()
+        if not (serializer.is_valid() and photo_valid):
+            return Response({'errors': {**serializer.errors, **photo_serializer.errors}},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        commune_user = getattr(request.user, 'commune', None)
+        photo = None
+        try:
+            with transaction.atomic():
+                photo = photo_serializer.save()
+                signalement = serializer.save(utilisateur=request.user, commune=commune_user, photo=photo)
+                detect_duplicates([signalement])
+                submit_on_commit(process_photo, photo.id)
+        except Exception:
+            # Transaction annulée : le fichier déjà écrit ne doit pas rester orphelin
+            if photo is not None and photo.image:
+                photo.image.storage.delete(photo.image.name)
+            raise
+
+        context = {'request': request}
+        return Response({
+            'message': 'Signalement créé avec succès',
+            'signalement': SignalementSerializer(signalement, context=context).data,
+            'photo': PhotoSerializer(photo, context=context).data
+        }, status=status.HTTP_201_CREATED)
+    except Exception as e:
+        traceback.print_exc()
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# CREATE - Soumission groupée (synchronisation hors ligne)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+@idempotent
+def create_signalements_batch(request):
+    """
+    Créer plusieurs signalements en une requête.
+    Corps : {"signalements": [...]} ou directement une liste.
+    Chaque élément est validé séparément ; les éléments valides sont insérés
+    en un seul bulk_create et le résultat est rapporté élément par élément.
+    """
+    try:
+        items = request.data.get('signalements') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Une liste non vide de signalements est requise'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_BATCH_SIZE:
+            return Response({'error': f'Au plus {MAX_BATCH_SIZE} signalements par requête'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            client_id = item.get('client_id') if isinstance(item, dict) else None
+            serializer = SignalementBatchItemSerializer(data=item if isinstance(item, dict) else {})
+            if serializer.is_valid():
+                valid.append((index, client_id, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'client_id': client_id,
+                                  'status': 'error', 'errors': serializer.errors}
+
+        # Vérification de toutes les photos référencées en une seule requête IN
+        photo_ids = {data['photo_id'] for _, _, data in valid if data.get('photo_id')}
+        photos = Photo.objects.in_bulk(photo_ids) if photo_ids else {}
+
+        commune_user = getattr(request.user, 'commune', None)
+        to_create = []
+        for index, client_id, data in valid:
+            photo_id = data.get('photo_id')
+            if photo_id and photo_id not in photos:
+                results[index] = {'index': index, 'client_id': client_id,
+                                  'status': 'error', 'errors': {'photo_id': ['Photo non trouvée']}}
+                continue
+            signalement = Signalement(utilisateur=request.user, commune=commune_user, **data)
+            if photo_id:
+                signalement.photo = photos[photo_id]
+                if signalement.latitude is None:
+                    signalement.latitude, signalement.longitude = photos[photo_id].latitude, photos[photo_id].longitude
+            signalement.update_geo_cell()
+            to_create.append((index, client_id, signalement))
+
+        if to_create:
+            with transaction.atomic():
+                created = Signalement.objects.bulk_create([signalement for _, _, signalement in to_create])
+                signalements_bulk_created(created)
+                detect_duplicates(created)
+            created_data = SignalementSerializer(created, many=True).data
+            for (index, client_id, _), data in zip(to_create, created_data):
+                results[index] = {'index': index, 'client_id': client_id,
+                                  'status': 'created', 'id': data['id'], 'signalement': data}
+
+        created_count = len(to_create)
+        if created_count == len(items):
+            response_status = status.HTTP_201_CREATED
+        elif created_count:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'message': f'{created_count} signalement(s) créé(s) sur {len(items)}',
+            'created': created_count,
+            'failed': len(items) - created_count,
+            'results': results
+        }, status=response_status)
+    except Exception as e:
+        traceback.print_exc()
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # READ - Liste de tous les signalements
 @api_view(['GET'])
 def list_signalements(request):
     """Lister les signalements avec filtres selon le rôle de l'utilisateur"""
     try:
-        signalements = Signalement.objects.all()
-        
         # Filtrage selon le rôle de l'utilisateur
-        if request.user.is_authenticated:
-            if request.user.role == 'citoyen':
-                # Les citoyens ne voient que leurs propres signalements
-                signalements = signalements.filter(utilisateur=request.user)
-            elif request.user.role == 'ctd':
-                # Les ctd municipaux voient les signalements de leur commune
-                if hasattr(request.user, 'commune') and request.user.commune:
-                    signalements = signalements.filter(commune=request.user.commune)
-                else:
-                    # Si le CTD n'a pas de commune assignée, retourner une liste vide
-                    signalements = signalements.none()
-            elif request.user.role == 'admin':
-                # Les administrateurs voient tous les signalements (pas de filtre)
-                pass
-            else:
-                # Rôle non reconnu - traiter comme un utilisateur non authentifié
-                signalements = signalements.filter(statut='en_cours')
+        visibility = _visibility_q(request.user)
+        if visibility is None:
+            signalements = Signalement.objects.none()
         else:
-            # Utilisateurs non authentifiés : signalements publics seulement
-            signalements = signalements.filter(statut='en_cours')
+            signalements = _base_queryset().filter(visibility)
         
         # Filtres optionnels
         statut = request.GET.get('statut')
@@ -95,11 +315,16 @@ def list_signalements(request):
         if commune and (request.user.is_authenticated and request.user.role in ['admin', 'ctd']):
             signalements = signalements.filter(commune=commune)
             
-        serializer = SignalementSerializer(signalements, many=True)
-        return Response({
-            'count': signalements.count(),
-            'signalements': serializer.data
-        }, status=status.HTTP_200_OK)
+        try:
+            signalements = apply_spatial_filters(signalements, request.GET)
+            signalements = _group_duplicates(request, signalements)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Recherche plein texte classée par pertinence (?q=)
+        signalements = apply_search(signalements, request.GET.get('q'))
+            
+        return _signalements_response(request, signalements)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -108,7 +333,7 @@ def list_signalements(request):
 def detail_signalement(request, id):
     """Obtenir les détails d'un signalement selon les permissions de rôle"""
     try:
-        signalement = Signalement.objects.get(pk=id)
+        signalement = _base_queryset().get(pk=id)
         
         # Vérification des permissions de lecture
         if request.user.is_authenticated:
@@ -141,7 +366,7 @@ def detail_signalement(request, id):
             if signalement.statut != 'en_cours':
                 return Response({'error': 'Accès non autorisé'}, status=status.HTTP_403_FORBIDDEN)
         
-        serializer = SignalementSerializer(signalement)
+        serializer = SignalementSerializer(signalement, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Signalement.DoesNotExist:
         return Response({'error': 'Signalement non trouvé'}, status=status.HTTP_404_NOT_FOUND)
@@ -155,7 +380,7 @@ def detail_signalement(request, id):
 def update_signalement(request, id):
     """Modifier un signalement selon les permissions de rôle."""
     try:
-        signalement = Signalement.objects.get(pk=id)
+        signalement = _base_queryset().get(pk=id)
 
         # Cas 1 : Utilisateur CTD
         if request.user.role == 'ctd':
@@ -182,7 +407,8 @@ def update_signalement(request, id):
 
         # Cas 3 : Administrateur
         elif request.user.role == 'admin':
-            serializer = SignalementAdminUpdateSerializer(signalement, data=request.data, partial=True)
+            serializer = SignalementAdminUpdateSerializer(signalement, data=request.data, partial=True,
+                                                          context={'request': request})
 
         # Cas 4 : Rôle inconnu
         else:
@@ -190,14 +416,9 @@ def update_signalement(request, id):
 
         # Vérification des données
         if serializer.is_valid():
-            photo_id = request.data.get('photo_id')
-            if photo_id:
-                try:
-                    Photo.objects.get(id=photo_id)
-                except Photo.DoesNotExist:
-                    return Response({'error': 'Photo non trouvée'}, status=status.HTTP_400_BAD_REQUEST)
-
             signalement = serializer.save()
+            if {'objet', 'description'} & set(serializer.validated_data):
+                index_signalements([signalement])
             response_serializer = SignalementSerializer(signalement)
             return Response({
                 'message': 'Signalement modifié avec succès',
@@ -219,7 +440,7 @@ def update_signalement(request, id):
 def update_signalement_statut(request, id):
     """Modifier le statut d'un signalement - Réservé aux ctd et administrateurs"""
     try:
-        signalement = Signalement.objects.get(pk=id)
+        signalement = _base_queryset().get(pk=id)
         
         # Vérification des permissions - Seuls les CTD et administrateurs peuvent modifier le statut
         if request.user.role == 'citoyen':
@@ -239,7 +460,8 @@ def update_signalement_statut(request, id):
         else:
             return Response({'error': 'Rôle non autorisé'}, status=status.HTTP_403_FORBIDDEN)
         
-        serializer = SignalementStatutSerializer(signalement, data=request.data, partial=True)
+        serializer = SignalementStatutSerializer(signalement, data=request.data, partial=True,
+                                                 context={'request': request})
         if serializer.is_valid():
             signalement = serializer.save()
             response_serializer = SignalementSerializer(signalement)
@@ -254,6 +476,49 @@ def update_signalement_statut(request, id):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# UPDATE - Modification groupée du statut
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def update_signalements_statut_batch(request):
+    """
+    Modifier le statut de plusieurs signalements en une requête - Réservé aux ctd et administrateurs.
+    Corps : {"ids": [...], "statut": "...", "date_resolution": optionnelle}.
+    Les ctd ne modifient que les signalements de leur commune ; les ids hors
+    périmètre, inexistants ou déjà dans ce statut sont ignorés.
+    """
+    try:
+        if request.user.role == 'ctd':
+            if not (hasattr(request.user, 'commune') and request.user.commune):
+                return Response({'error': 'Aucune commune assignée'}, status=status.HTTP_403_FORBIDDEN)
+            commune_id = request.user.commune_id
+        elif request.user.role == 'admin':
+            commune_id = None
+        elif request.user.role == 'citoyen':
+            return Response({'error': 'Vous n\'êtes pas autorisé à modifier le statut'},
+                          status=status.HTTP_403_FORBIDDEN)
+        else:
+            return Response({'error': 'Rôle non autorisé'}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = SignalementStatutBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = sorted(set(serializer.validated_data['ids']))
+        updated_ids = update_statut_bulk(
+            ids, serializer.validated_data['statut'], user=request.user, commune_id=commune_id,
+            date_resolution=serializer.validated_data.get('date_resolution'),
+        )
+        updated = set(updated_ids)
+        return Response({
+            'message': f'{len(updated_ids)} signalement(s) modifié(s)',
+            'statut': serializer.validated_data['statut'],
+            'updated_ids': updated_ids,
+            'ignored_ids': [pk for pk in ids if pk not in updated]
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 # DELETE - Suppression d’un signalement
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
@@ -290,7 +555,7 @@ def get_signalement_choices(request):
 def mes_signalements(request):
     """Lister les signalements de l'utilisateur connecté"""
     try:
-        signalements = Signalement.objects.filter(utilisateur=request.user)
+        signalements = _base_queryset().filter(utilisateur=request.user)
         
         # Filtres optionnels
         statut = request.GET.get('statut')
@@ -301,11 +566,15 @@ def mes_signalements(request):
         if type_signalement:
             signalements = signalements.filter(type_signalement=type_signalement)
             
-        serializer = SignalementSerializer(signalements, many=True)
-        return Response({
-            'count': signalements.count(),
-            'signalements': serializer.data
-        }, status=status.HTTP_200_OK)
+        try:
+            signalements = apply_spatial_filters(signalements, request.GET)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Recherche plein texte classée par pertinence (?q=)
+        signalements = apply_search(signalements, request.GET.get('q'))
+            
+        return _signalements_response(request, signalements)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -323,14 +592,14 @@ def signalements_commune(request):
             # Les ctd voient les signalements de leur commune
             if not (hasattr(request.user, 'commune') and request.user.commune):
                 return Response({'error': 'Aucune commune assignée'}, status=status.HTTP_400_BAD_REQUEST)
-            signalements = Signalement.objects.filter(commune=request.user.commune)
+            signalements = _base_queryset().filter(commune=request.user.commune)
         elif request.user.role == 'admin':
             # Les administrateurs peuvent spécifier une commune ou voir tous
             commune = request.GET.get('commune')
             if commune:
-                signalements = Signalement.objects.filter(commune=commune)
+                signalements = _base_queryset().filter(commune=commune)
             else:
-                signalements = Signalement.objects.all()
+                signalements = _base_queryset()
         else:
             return Response({'error': 'Rôle non autorisé'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -343,14 +612,165 @@ def signalements_commune(request):
         if type_signalement:
             signalements = signalements.filter(type_signalement=type_signalement)
             
-        serializer = SignalementSerializer(signalements, many=True)
+        try:
+            signalements = apply_spatial_filters(signalements, request.GET)
+            signalements = _group_duplicates(request, signalements)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Recherche plein texte classée par pertinence (?q=)
+        signalements = apply_search(signalements, request.GET.get('q'))
+            
+        return _signalements_response(request, signalements)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# READ - File de triage par priorité (pour les administrateurs et ctd)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def triage_signalements(request):
+    """
+    Signalements ouverts (en attente ou en cours) classés par score de priorité
+    décroissant, lu dans l'index partiel de la colonne score_priorite.
+    Les doublons sont représentés par leur signalement principal.
+    Paramètres : ?limit= (50 par défaut, 200 au plus), ?type=, ?commune= (administrateurs).
+    """
+    try:
+        if request.user.role == 'ctd':
+            if not (hasattr(request.user, 'commune') and request.user.commune):
+                return Response({'error': 'Aucune commune assignée'}, status=status.HTTP_400_BAD_REQUEST)
+            signalements = Signalement.objects.filter(commune=request.user.commune)
+        elif request.user.role == 'admin':
+            signalements = Signalement.objects.all()
+            commune = request.GET.get('commune')
+            if commune:
+                signalements = signalements.filter(commune=commune)
+        else:
+            return Response({'error': 'Accès non autorisé'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response({'error': 'Paramètre limit invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+        signalements = signalements.filter(statut__in=OPEN_STATUTS, doublon_de__isnull=True)
+        type_signalement = request.GET.get('type')
+        if type_signalement:
+            signalements = signalements.filter(type_signalement=type_signalement)
+        signalements = (
+            signalements.select_related('utilisateur')
+            .order_by('-score_priorite', '-id')[:limit]
+        )
+        serializer = SignalementListSerializer(signalements, many=True)
         return Response({
-            'count': signalements.count(),
+            'count': len(serializer.data),
             'signalements': serializer.data
         }, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# READ - Export en flux (CSV / NDJSON) pour les administrateurs et ctd
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def export_signalements(request):
+    """
+    Exporter les signalements en CSV (?output=csv, défaut) ou NDJSON (?output=ndjson).
+    Filtres : statut, type, commune, date_debut, date_fin.
+    Les lignes sont lues par paquets et écrites au fil de l'eau : la mémoire
+    utilisée reste constante quel que soit le volume exporté.
+    """
+    try:
+        if request.user.role not in ('admin', 'ctd'):
+            return Response({'error': 'Accès non autorisé'}, status=status.HTTP_403_FORBIDDEN)
+
+        output = request.GET.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({'error': f'Format invalide. Choisissez parmi: {list(EXPORT_FORMATS)}'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        params = request.GET.dict()
+        if 'type' in params:
+            params['type_signalement'] = params.pop('type')
+        filters = SignalementFilterSerializer(data=params)
+        if not filters.is_valid():
+            return Response({'errors': filters.errors}, status=status.HTTP_400_BAD_REQUEST)
+        data = filters.validated_data
+
+        visibility = _visibility_q(request.user)
+        if visibility is None:
+            return Response({'error': 'Aucune commune assignée'}, status=status.HTTP_400_BAD_REQUEST)
+        signalements = Signalement.objects.filter(visibility)
+
+        if data.get('statut'):
+            signalements = signalements.filter(statut=data['statut'])
+        if data.get('type_signalement'):
+            signalements = signalements.filter(type_signalement=data['type_signalement'])
+        if data.get('commune'):
+            signalements = signalements.filter(commune=data['commune'])
+        if data.get('utilisateur'):
+            signalements = signalements.filter(utilisateur_id=data['utilisateur'])
+        if data.get('date_debut'):
+            signalements = signalements.filter(date_signalement__gte=data['date_debut'])
+        if data.get('date_fin'):
+            signalements = signalements.filter(date_signalement__lte=data['date_fin'])
+
+        generator, content_type = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(generator(signalements), content_type=content_type)
+        filename = f"signalements-{timezone.now():%Y%m%d-%H%M%S}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# READ - Flux de synchronisation incrémentale (clients mobiles)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def changes_signalements(request):
+    """
+    Retourner les signalements créés, modifiés ou supprimés depuis ?since=<jeton>.
+    Sans jeton, le flux commence au début de l'historique.
+    ?scope=mine limite le flux aux signalements de l'utilisateur connecté.
+    'deleted' liste les signalements supprimés ou sortis du périmètre visible.
+    score_priorite y est indicatif : un recalcul de score seul ne renvoie pas
+    le signalement, la file de triage fait foi.
+    Le client applique 'signalements' puis 'deleted' et rappelle avec 'token'
+    tant que 'has_more' est vrai.
+    """
+    try:
+        if request.GET.get('scope') == 'mine':
+            visibility = Q(utilisateur_id=request.user.id)
+        else:
+            visibility = _visibility_q(request.user)
+        if visibility is None:
+            signalements = Signalement.objects.none()
+            suppressions = SignalementSuppression.objects.none()
+        else:
+            signalements = _base_queryset().filter(visibility)
+            suppressions = SignalementSuppression.objects.filter(visibility)
+
+        try:
+            limit = int(request.GET.get('limit', 0)) or None
+        except ValueError:
+            limit = None
+
+        try:
+            changes = collect_changes(signalements, suppressions, request.GET.get('since'), limit)
+        except JetonInvalide as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = SignalementSerializer(changes['changed'], many=True, context={'request': request})
+        return Response({
+            'signalements': serializer.data,
+            'deleted': changes['deleted'],
+            'token': changes['token'],
+            'has_more': changes['has_more']
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 # READ - Statistiques des signalements (pour les administrateurs et ctd)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -372,23 +792,124 @@ def statistiques_signalements(request):
         else:
             return Response({'error': 'Rôle non autorisé'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Calcul des statistiques
-        stats = {
-            'total': signalements.count(),
-            'en_attente': signalements.filter(statut='en_attente').count(),
-            'en_cours': signalements.filter(statut='en_cours').count(),
-            'traite': signalements.filter(statut='traite').count(),
-            'rejete': signalements.filter(statut='rejete').count(),
-        }
-        
-        # Statistiques par type
-        types_stats = {}
-        for type_choice in Signalement.TYPE_SIGNALLEMENT_CHOICES:
-            type_code = type_choice[0]
-            types_stats[type_code] = signalements.filter(type_signalement=type_code).count()
-        
-        stats['par_type'] = types_stats
+        # Fenêtre temporelle optionnelle (?from=&to=, dates ou dates-heures ISO)
+        windowed = False
+        for param, lookup in (('from', 'gte'), ('to', 'lte')):
+            value = request.GET.get(param)
+            if not value:
+                continue
+            windowed = True
+            # Une date seule couvre toute la journée (parse_datetime l'accepterait comme minuit)
+            date_value = parse_date(value)
+            if date_value is not None:
+                signalements = signalements.filter(**{f'date_signalement__date__{lookup}': date_value})
+                continue
+            date_value = parse_datetime(value)
+            if date_value is None:
+                return Response({'error': f'Date invalide pour le paramètre {param}'},
+                              status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(date_value):
+                date_value = timezone.make_aware(date_value)
+            signalements = signalements.filter(**{f'date_signalement__{lookup}': date_value})
+
+        bucket = request.GET.get('bucket')
+        if bucket and bucket not in BUCKETS:
+            return Response({'error': f'Période invalide. Choisissez parmi: {list(BUCKETS)}'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        if windowed:
+            # Fenêtre temporelle : une seule requête d'agrégation conditionnelle
+            stats = compute_statistics(signalements)
+        else:
+            # Sans fenêtre : lecture directe des compteurs dénormalisés
+            commune = request.user.commune if request.user.role == 'ctd' else None
+            stats = format_statistics(read_cross_tab(commune))
+        if bucket:
+            stats['serie'] = compute_time_series(signalements, bucket)
         
         return Response(stats, status=status.HTTP_200_OK)
     except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# READ - Délais de prise en charge et de résolution (pour les administrateurs et ctd)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def delais_signalements(request):
+    """
+    Médiane et 90e centile des délais de prise en charge et de résolution,
+    par commune et par type, calculés à partir de l'historique des statuts.
+    Filtres optionnels : ?from=&to= (date de création), ?type_signalement=,
+    ?commune= (administrateurs uniquement).
+    """
+    try:
+        if request.user.role == 'ctd':
+            if not (hasattr(request.user, 'commune') and request.user.commune):
+                return Response({'error': 'Aucune commune assignée'}, status=status.HTTP_400_BAD_REQUEST)
+            commune_id = request.user.commune_id
+        elif request.user.role == 'admin':
+            commune_id = request.GET.get('commune') or None
+            if commune_id is not None and not commune_id.isdigit():
+                return Response({'error': 'Paramètre commune invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            return Response({'error': 'Accès non autorisé'}, status=status.HTTP_403_FORBIDDEN)
+
+        type_signalement = request.GET.get('type_signalement') or None
+        valid_types = [choice[0] for choice in Signalement.TYPE_SIGNALLEMENT_CHOICES]
+        if type_signalement and type_signalement not in valid_types:
+            return Response({'error': f'Type de signalement invalide. Choisissez parmi: {valid_types}'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        # Fenêtre sur la date de création (dates ou dates-heures ISO)
+        bounds = {}
+        for param, day_time in (('from', time.min), ('to', time.max)):
+            value = request.GET.get(param)
+            if not value:
+                continue
+            # Une date seule couvre toute la journée (parse_datetime l'accepterait comme minuit)
+            day = parse_date(value)
+            date_value = datetime.combine(day, day_time) if day is not None else parse_datetime(value)
+            if date_value is None:
+                return Response({'error': f'Date invalide pour le paramètre {param}'},
+                              status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(date_value):
+                date_value = timezone.make_aware(date_value)
+            bounds[param] = date_value
+
+        rows = compute_delays(commune_id=commune_id, type_signalement=type_signalement,
+                              date_from=bounds.get('from'), date_to=bounds.get('to'))
+        commune_names = dict(
+            Commune.objects.filter(id__in={row['commune_id'] for row in rows}).values_list('id', 'nom')
+        )
+        return Response({'resultats': format_delays(rows, commune_names)}, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# READ - Tuile de carte de chaleur (comptages par cellule, statut et type)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def heatmap_tile(request, z, x, y):
+    """
+    Comptages agrégés de la tuile z/x/y (schéma XYZ), lus dans la pyramide
+    précalculée : le coût ne dépend pas du nombre de signalements.
+    Filtres optionnels : ?statut=, ?type=
+    """
+    try:
+        if not MIN_ZOOM <= z <= MAX_ZOOM:
+            return Response({'error': f'Niveau de zoom entre {MIN_ZOOM} et {MAX_ZOOM}'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if not (0 <= x < 1 << z and 0 <= y < 1 << z):
+            return Response({'error': 'Tuile hors limites'}, status=status.HTTP_400_BAD_REQUEST)
+
+        cells = read_tile(z, x, y, statut=request.GET.get('statut'),
+                          type_signalement=request.GET.get('type'))
+        return Response({
+            'z': z, 'x': x, 'y': y,
+            'cell_zoom': z + CELL_BITS,
+            'total': sum(cell['total'] for cell in cells),
+            'cells': cells
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)